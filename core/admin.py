@@ -1,6 +1,9 @@
 # -*- coding: utf-8 -*-
 from django.contrib import admin
-from .models import Categoria, Producto, Cliente, Usuario, Rol, Pedido, DetallePedido, Carrito, DetalleCarrito
+from .models import (
+    Categoria, Producto, Cliente, Usuario, Rol, Pedido, DetallePedido, Carrito, DetalleCarrito,
+    VentaDiaria, VentaDiariaProducto, VentaDiariaRepartidor, EventoNotificacion
+)
 
 
 @admin.register(Categoria)
@@ -64,3 +67,30 @@ class CarritoAdmin(admin.ModelAdmin):
 class DetalleCarritoAdmin(admin.ModelAdmin):
     list_display = ['carrito', 'producto', 'cantidad']
     search_fields = ['carrito__cliente__nombre', 'producto__nombre']
+
+
+@admin.register(VentaDiaria)
+class VentaDiariaAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'cantidad_pedidos', 'total_ventas']
+    ordering = ['-fecha']
+
+
+@admin.register(VentaDiariaProducto)
+class VentaDiariaProductoAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'producto_nombre', 'cantidad', 'total_ventas']
+    search_fields = ['producto_nombre']
+    ordering = ['-fecha']
+
+
+@admin.register(VentaDiariaRepartidor)
+class VentaDiariaRepartidorAdmin(admin.ModelAdmin):
+    list_display = ['fecha', 'repartidor', 'cantidad_pedidos', 'total_ventas']
+    list_filter = ['repartidor']
+    ordering = ['-fecha']
+
+
+@admin.register(EventoNotificacion)
+class EventoNotificacionAdmin(admin.ModelAdmin):
+    list_display = ['id', 'grupo', 'estado', 'intentos', 'disponible_desde', 'fecha_creacion']
+    list_filter = ['estado']
+    search_fields = ['grupo', 'ultimo_error']
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        # Registrar señales (invalidación de caches)
+        from . import signals  # noqa: F401
@@ -1,222 +1,360 @@
 # -*- coding: utf-8 -*-
 """
 WebSocket Consumer para actualizaciones de pedidos en tiempo real
+Cada evento incluye el snapshot completo y versionado del pedido (clave 'pedido')
+y, si lo publicó el despachador, su grupo y número de secuencia ('grupo', 'seq')
+para reanudar tras una reconexión (core/services/reanudacion.py).
 """
 import json
 import logging
+from time import perf_counter
+from urllib.parse import parse_qs
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.exceptions import DenyConnection
+from core.services import metricas
+from core.services.notificaciones import ROLES_REPARTO, ROLES_VENTAS, grupo_ventas_rol
+from core.services.personal import obtener_personal
+from core.services.reanudacion import eventos_desde
 
 logger = logging.getLogger(__name__)
 
 
-class PedidoConsumer(AsyncWebsocketConsumer):
+class ConsumerBase(AsyncWebsocketConsumer):
+    """
+    Base de los consumers. Los grupos no salen de la URL: se resuelven en el
+    servidor desde la sesión de Django del scope (grupos_autorizados) y, si no
+    hay ninguno, el socket se rechaza antes de accept(). Un socket puede
+    unirse a varios grupos. También lleva las métricas de conexiones y envíos
+    (core/services/metricas.py) y sale de los grupos al desconectarse.
+    """
+    grupos = ()
+    # Grupos ya sumados a ws_conexiones; solo se restan esos al desconectar
+    grupos_contados = ()
+
     async def connect(self):
-        """Conectar al WebSocket"""
+        """Conectar al WebSocket con los grupos autorizados por la sesión"""
         try:
-            self.cliente_id = self.scope['url_route']['kwargs']['cliente_id']
-            self.room_group_name = f'pedidos_cliente_{self.cliente_id}'
-
-            # Unirse al grupo del cliente
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
-
-            await self.accept()
-            logger.info(f"Cliente {self.cliente_id} conectado al WebSocket")
+            grupos = await database_sync_to_async(self.grupos_autorizados)(self.scope.get('session') or {})
         except Exception as e:
-            logger.error(f"Error al conectar WebSocket: {e}")
-            raise DenyConnection("Error en la conexión")
-
-    async def disconnect(self, close_code):
-        """Desconectar del WebSocket"""
+            self.rechazar(e)
+        if not grupos:
+            metricas.ws_conexiones_rechazadas.inc(type(self).__name__)
+            logger.debug('%s: socket no autorizado rechazado', type(self).__name__)
+            raise DenyConnection('No autorizado')
         try:
-            # Salir del grupo
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
-            logger.info(f"Cliente {self.cliente_id} desconectado del WebSocket")
+            await self.unirse(*grupos)
         except Exception as e:
-            logger.error(f"Error al desconectar WebSocket: {e}")
+            self.rechazar(e)
+        await self.reanudar()
 
-    async def receive(self, text_data):
-        """Recibir mensaje del WebSocket"""
-        pass
+    def grupos_autorizados(self, sesion):
+        """
+        Grupos a los que se une el socket según la sesión (lista vacía: se rechaza).
+        Corre en un hilo: puede leer la sesión y consultar la base de datos.
+        """
+        return []
 
-    async def pedido_actualizado(self, event):
-        """Enviar actualización de pedido al WebSocket"""
-        try:
-            await self.send(text_data=json.dumps({
-                'type': 'pedido_actualizado',
-                'pedido_id': event['pedido_id'],
-                'estado': event['estado'],
-                'codigo_unico': event['codigo_unico']
-            }))
-        except Exception as e:
-            logger.error(f"Error al enviar actualización de pedido: {e}")
+    def parametro_coincide(self, nombre, valor):
+        """Las URLs antiguas traen el id en la ruta: si viene, debe ser el de la sesión"""
+        en_url = self.scope.get('url_route', {}).get('kwargs', {}).get(nombre)
+        return en_url is None or en_url == str(valor)
 
+    def ultimos_seq(self):
+        """
+        Último seq recibido por grupo según `?last_seq=` de la URL: un número
+        (sockets de un solo grupo) o pares grupo:seq separados por comas.
+        """
+        valor = parse_qs(self.scope.get('query_string', b'').decode()).get('last_seq', [''])[0]
+        if valor.isdigit():
+            return {grupo: int(valor) for grupo in self.grupos}
+        ultimos = {}
+        for par in valor.split(','):
+            grupo, _, seq = par.rpartition(':')
+            if grupo in self.grupos and seq.isdigit():
+                ultimos[grupo] = int(seq)
+        return ultimos
 
-class VentasConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        """Conectar al WebSocket para notificaciones de ventas"""
-        try:
-            self.usuario_id = self.scope['url_route']['kwargs']['usuario_id']
-            self.room_group_name = f'ventas_usuario_{self.usuario_id}'
+    async def reanudar(self):
+        """
+        Reenvía los eventos que el socket se perdió mientras estaba desconectado.
+        Si ya no están en el buffer envía 'resincronizar' para que recargue.
+        Los eventos en vivo que lleguen repetidos se descartan en enviar_evento().
+        """
+        for grupo, desde in self.ultimos_seq().items():
+            eventos = await sync_to_async(eventos_desde)(grupo, desde)
+            if eventos is None:
+                await self.send(text_data=json.dumps({'type': 'resincronizar', 'grupo': grupo}))
+                continue
+            self.vistos[grupo] = desde
+            for evento in eventos:
+                await self.dispatch(evento)
+            # Los eventos en vivo hasta este seq pueden llegar repetidos
+            self.reenviados[grupo] = self.vistos[grupo]
+            logger.debug('%s: %s eventos reenviados de %s', type(self).__name__, len(eventos), grupo)
 
-            # Unirse al grupo del usuario
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
+    def personal(self, sesion, *roles):
+        """Usuario del personal en sesión (con uno de los `roles` si se indican), o None"""
+        if 'usuario_id' not in sesion:
+            return None
+        usuario = obtener_personal(sesion['usuario_id'])
+        if usuario is None or (roles and usuario.rol.nombre_rol not in roles):
+            return None
+        return usuario
 
-            await self.accept()
-            logger.info(f"Usuario {self.usuario_id} conectado al WebSocket de ventas")
-        except Exception as e:
-            logger.error(f"Error al conectar WebSocket de ventas: {e}")
-            raise DenyConnection("Error en la conexión")
+    async def unirse(self, *grupos):
+        """Une el socket a los grupos y lo acepta"""
+        self.grupos = list(grupos)
+        # Último seq enviado por grupo, y último reenviado por la reanudación
+        self.vistos = {}
+        self.reenviados = {}
+        for grupo in self.grupos:
+            await self.channel_layer.group_add(grupo, self.channel_name)
+        await self.accept()
+        self.grupos_contados = [metricas.familia_grupo(grupo) for grupo in self.grupos]
+        for familia in self.grupos_contados:
+            metricas.ws_conexiones.inc(familia)
+        logger.debug('%s conectado a %s', type(self).__name__, self.grupos)
+
+    async def agregar_grupo(self, grupo):
+        """Une el socket ya aceptado a un grupo más"""
+        await self.channel_layer.group_add(grupo, self.channel_name)
+        self.grupos.append(grupo)
+        self.grupos_contados.append(metricas.familia_grupo(grupo))
+        metricas.ws_conexiones.inc(metricas.familia_grupo(grupo))
+
+    async def quitar_grupo(self, grupo):
+        """Saca el socket ya aceptado de uno de sus grupos"""
+        await self.channel_layer.group_discard(grupo, self.channel_name)
+        self.grupos.remove(grupo)
+        self.grupos_contados.remove(metricas.familia_grupo(grupo))
+        metricas.ws_conexiones.dec(metricas.familia_grupo(grupo))
+
+    def rechazar(self, error):
+        logger.error(f"Error al conectar WebSocket ({type(self).__name__}): {error}")
+        metricas.ws_conexiones_rechazadas.inc(type(self).__name__)
+        raise DenyConnection("Error en la conexión")
 
     async def disconnect(self, close_code):
         """Desconectar del WebSocket"""
+        for familia in self.grupos_contados:
+            metricas.ws_conexiones.dec(familia)
+        self.grupos_contados = ()
         try:
-            # Salir del grupo
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
-            logger.info(f"Usuario {self.usuario_id} desconectado del WebSocket de ventas")
+            for grupo in self.grupos:
+                await self.channel_layer.group_discard(grupo, self.channel_name)
+            logger.debug('%s desconectado de %s', type(self).__name__, self.grupos)
         except Exception as e:
-            logger.error(f"Error al desconectar WebSocket de ventas: {e}")
+            logger.error(f"Error al desconectar WebSocket ({type(self).__name__}): {e}")
 
     async def receive(self, text_data):
         """Recibir mensaje del WebSocket"""
         pass
 
-    async def venta_realizada(self, event):
-        """Enviar notificación de venta realizada"""
+    async def enviar_evento(self, event, datos):
+        """
+        Envía `datos` (armado desde el mensaje `event` del grupo) al socket,
+        con el grupo y seq del mensaje, midiendo el tiempo; los fallos se
+        cuentan por tipo. Los seq ya enviados por la reanudación se omiten;
+        cualquier otro seq que retrocede significa que el contador del grupo
+        se reinició: se pide 'resincronizar' y se sigue desde el nuevo seq.
+        """
+        seq = event.get('seq')
+        if seq is not None:
+            grupo = event['grupo']
+            if seq <= self.vistos.get(grupo, 0):
+                if seq <= self.reenviados.get(grupo, 0):
+                    return
+                logger.warning('%s: el seq de %s retrocedió (%s -> %s)', type(self).__name__, grupo,
+                               self.vistos[grupo], seq)
+                await self.send(text_data=json.dumps({'type': 'resincronizar', 'grupo': grupo}))
+            else:
+                # Ya pasaron los eventos que podían llegar repetidos
+                self.reenviados.pop(grupo, None)
+            self.vistos[grupo] = seq
+            datos = {**datos, 'grupo': grupo, 'seq': seq}
+        inicio = perf_counter()
         try:
-            await self.send(text_data=json.dumps({
-                'type': 'venta_realizada',
-                'pedido_id': event['pedido_id'],
-                'codigo_unico': event['codigo_unico'],
-                'total': event['total'],
-                'repartidor': event['repartidor']
-            }))
+            await self.send(text_data=json.dumps(datos))
         except Exception as e:
-            logger.error(f"Error al enviar notificación de venta: {e}")
+            metricas.ws_envios_fallidos.inc(datos['type'])
+            logger.error(f"Error al enviar {datos['type']} ({type(self).__name__}): {e}")
+            return
+        metricas.ws_envio_segundos.observar(datos['type'], perf_counter() - inicio)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('%s: %s enviado (pedido %s)', type(self).__name__, datos['type'], datos.get('codigo_unico'))
 
 
-class RepartidorConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        """Conectar al WebSocket para notificaciones de repartidores"""
-        try:
-            # Grupo general para todos los repartidores
-            self.room_group_name = 'repartidores'
+class PedidoConsumer(ConsumerBase):
+    def grupos_autorizados(self, sesion):
+        """El cliente en sesión recibe solo sus pedidos"""
+        cliente_id = sesion.get('cliente_id')
+        if cliente_id is None or not self.parametro_coincide('cliente_id', cliente_id):
+            return []
+        return [f'pedidos_cliente_{cliente_id}']
 
-            # Unirse al grupo de repartidores
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
+    async def pedido_actualizado(self, event):
+        """Enviar actualización de pedido al WebSocket"""
+        await self.enviar_evento(event, {
+            'type': 'pedido_actualizado',
+            'pedido_id': event['pedido_id'],
+            'estado': event['estado'],
+            'codigo_unico': event['codigo_unico'],
+            'pedido': event.get('pedido')
+        })
 
-            await self.accept()
-            logger.info(f"Repartidor conectado al WebSocket")
-        except Exception as e:
-            logger.error(f"Error al conectar WebSocket de repartidor: {e}")
-            raise DenyConnection("Error en la conexión")
 
-    async def disconnect(self, close_code):
-        """Desconectar del WebSocket"""
-        try:
-            # Salir del grupo
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
-            logger.info(f"Repartidor desconectado del WebSocket")
-        except Exception as e:
-            logger.error(f"Error al desconectar WebSocket de repartidor: {e}")
+# Handlers de los eventos del personal, compartidos por los consumers de un
+# solo grupo y por StaffConsumer
+
+class EventosVentas:
+    async def venta_realizada(self, event):
+        """Enviar notificación de venta realizada"""
+        await self.enviar_evento(event, {
+            'type': 'venta_realizada',
+            'pedido_id': event['pedido_id'],
+            'codigo_unico': event['codigo_unico'],
+            'total': event['total'],
+            'repartidor': event['repartidor'],
+            'pedido': event.get('pedido')
+        })
 
-    async def receive(self, text_data):
-        """Recibir mensaje del WebSocket"""
-        pass
 
+class EventosReparto:
     async def pedido_listo(self, event):
         """Enviar notificación de pedido listo para entrega"""
-        try:
-            await self.send(text_data=json.dumps({
-                'type': 'pedido_listo',
-                'pedido_id': event['pedido_id'],
-                'codigo_unico': event['codigo_unico'],
-                'cliente_nombre': event['cliente_nombre'],
-                'total': event['total']
-            }))
-        except Exception as e:
-            logger.error(f"Error al enviar notificación de pedido listo: {e}")
-
-
-class CocinaConsumer(AsyncWebsocketConsumer):
-    async def connect(self):
-        """Conectar al WebSocket para notificaciones de cocina"""
-        try:
-            # Grupo general para todos los cocineros
-            self.room_group_name = 'cocina'
-
-            # Unirse al grupo de cocina
-            await self.channel_layer.group_add(
-                self.room_group_name,
-                self.channel_name
-            )
-
-            await self.accept()
-            logger.info(f"Cocinero conectado al WebSocket")
-        except Exception as e:
-            logger.error(f"Error al conectar WebSocket de cocina: {e}")
-            raise DenyConnection("Error en la conexión")
+        await self.enviar_evento(event, {
+            'type': 'pedido_listo',
+            'pedido_id': event['pedido_id'],
+            'codigo_unico': event['codigo_unico'],
+            'cliente_nombre': event['cliente_nombre'],
+            'total': event['total'],
+            'pedido': event.get('pedido')
+        })
 
-    async def disconnect(self, close_code):
-        """Desconectar del WebSocket"""
-        try:
-            # Salir del grupo
-            await self.channel_layer.group_discard(
-                self.room_group_name,
-                self.channel_name
-            )
-            logger.info(f"Cocinero desconectado del WebSocket")
-        except Exception as e:
-            logger.error(f"Error al desconectar WebSocket de cocina: {e}")
+    async def pedido_tomado(self, event):
+        """Enviar aviso de pedido tomado por un repartidor (sale de la lista de los demás)"""
+        await self.enviar_evento(event, {
+            'type': 'pedido_tomado',
+            'pedido_id': event['pedido_id'],
+            'codigo_unico': event['codigo_unico'],
+            'repartidor': event['repartidor'],
+            'pedido': event.get('pedido')
+        })
 
-    async def receive(self, text_data):
-        """Recibir mensaje del WebSocket"""
-        pass
 
+class EventosCocina:
     async def nuevo_pedido(self, event):
         """Enviar notificación de nuevo pedido"""
-        try:
-            logger.info(f"🔔 CocinaConsumer: Enviando nuevo_pedido a cliente WebSocket: {event['codigo_unico']}")
-            await self.send(text_data=json.dumps({
-                'type': 'nuevo_pedido',
-                'pedido_id': event['pedido_id'],
-                'codigo_unico': event['codigo_unico'],
-                'cliente_nombre': event['cliente_nombre'],
-                'total': event['total']
-            }))
-            logger.info(f"✅ CocinaConsumer: nuevo_pedido enviado exitosamente")
-        except Exception as e:
-            logger.error(f"❌ Error al enviar notificación de nuevo pedido: {e}")
-    
+        await self.enviar_evento(event, {
+            'type': 'nuevo_pedido',
+            'pedido_id': event['pedido_id'],
+            'codigo_unico': event['codigo_unico'],
+            'cliente_nombre': event['cliente_nombre'],
+            'total': event['total'],
+            'pedido': event.get('pedido')
+        })
+
     async def estado_actualizado(self, event):
         """Enviar notificación de cambio de estado"""
+        await self.enviar_evento(event, {
+            'type': 'estado_actualizado',
+            'pedido_id': event['pedido_id'],
+            'codigo_unico': event['codigo_unico'],
+            'estado': event['estado'],
+            'cliente_nombre': event['cliente_nombre'],
+            'pedido': event.get('pedido')
+        })
+
+
+class VentasConsumer(EventosVentas, ConsumerBase):
+    def grupos_autorizados(self, sesion):
+        """
+        Personal con rol de ventas: se une al grupo de su rol (ventas_rol_<rol>),
+        que recibe las ventas con un solo envío por rol.
+        """
+        usuario = self.personal(sesion, *ROLES_VENTAS)
+        if usuario is None or not self.parametro_coincide('usuario_id', usuario.id):
+            return []
+        return [grupo_ventas_rol(usuario.rol.nombre_rol)]
+
+
+class RepartidorConsumer(EventosReparto, ConsumerBase):
+    def grupos_autorizados(self, sesion):
+        """Grupo general para todos los repartidores"""
+        return ['repartidores'] if self.personal(sesion, *ROLES_REPARTO) else []
+
+
+class CocinaConsumer(EventosCocina, ConsumerBase):
+    def grupos_autorizados(self, sesion):
+        """Grupo general de cocina: lo ve todo el personal (como admin_pedidos)"""
+        return ['cocina'] if self.personal(sesion) else []
+
+
+class StaffConsumer(EventosCocina, EventosReparto, EventosVentas, ConsumerBase):
+    """
+    Un solo socket por pantalla del personal (ws/staff/) con todos los
+    eventos que su rol puede ver, distinguidos por 'type'.
+
+    Temas: cocina (todo el personal), repartidores (ROLES_REPARTO) y
+    ventas (ROLES_VENTAS). Al conectar se suscribe a todos los temas
+    permitidos, o solo a los de `?temas=cocina,ventas`. Después el cliente
+    puede cambiar de temas enviando:
+        {"accion": "suscribir", "tema": "ventas"}
+        {"accion": "desuscribir", "tema": "cocina"}
+    y recibe {"type": "suscripcion", "temas": [...]} o {"type": "error", ...}.
+    """
+    # tema -> (roles permitidos (vacío: todo el personal), grupo según el rol)
+    TEMAS = {
+        'cocina': ((), lambda nombre_rol: 'cocina'),
+        'repartidores': (ROLES_REPARTO, lambda nombre_rol: 'repartidores'),
+        'ventas': (ROLES_VENTAS, grupo_ventas_rol),
+    }
+
+    def grupos_del_rol(self, nombre_rol):
+        """Grupo de cada tema que el rol puede ver"""
+        return {
+            tema: grupo_de(nombre_rol)
+            for tema, (roles, grupo_de) in self.TEMAS.items()
+            if not roles or nombre_rol in roles
+        }
+
+    def grupos_autorizados(self, sesion):
+        usuario = self.personal(sesion)
+        if usuario is None:
+            return []
+        self.usuario_id = usuario.id
+        permitidos = self.grupos_del_rol(usuario.rol.nombre_rol)
+        pedidos = parse_qs(self.scope.get('query_string', b'').decode()).get('temas')
+        if pedidos:
+            temas = {tema for valor in pedidos for tema in valor.split(',')}
+            permitidos = {tema: grupo for tema, grupo in permitidos.items() if tema in temas}
+        self.temas = permitidos
+        return list(permitidos.values())
+
+    async def receive(self, text_data):
+        """Suscribir o desuscribir temas"""
         try:
-            logger.info(f"🔄 CocinaConsumer: Enviando estado_actualizado: {event['codigo_unico']} -> {event['estado']}")
-            await self.send(text_data=json.dumps({
-                'type': 'estado_actualizado',
-                'pedido_id': event['pedido_id'],
-                'codigo_unico': event['codigo_unico'],
-                'estado': event['estado'],
-                'cliente_nombre': event['cliente_nombre']
-            }))
-            logger.info(f"✅ CocinaConsumer: estado_actualizado enviado exitosamente")
-        except Exception as e:
-            logger.error(f"❌ Error al enviar notificación de estado actualizado: {e}")
+            mensaje = json.loads(text_data)
+            accion, tema = mensaje['accion'], mensaje['tema']
+        except (ValueError, TypeError, KeyError):
+            return await self.send(text_data=json.dumps({'type': 'error', 'mensaje': 'Mensaje inválido'}))
+        if not isinstance(tema, str):
+            # Una lista o un objeto no se pueden buscar en self.temas (no son hashables)
+            return await self.send(text_data=json.dumps({'type': 'error', 'mensaje': f'Tema no permitido: {tema}'}))
+
+        if accion == 'suscribir' and tema not in self.temas:
+            # El rol se vuelve a comprobar: pudo cambiar desde que se conectó
+            usuario = await database_sync_to_async(obtener_personal)(self.usuario_id)
+            grupo = self.grupos_del_rol(usuario.rol.nombre_rol).get(tema) if usuario else None
+            if grupo is None:
+                return await self.send(text_data=json.dumps({'type': 'error', 'mensaje': f'Tema no permitido: {tema}'}))
+            await self.agregar_grupo(grupo)
+            self.temas[tema] = grupo
+        elif accion == 'desuscribir' and tema in self.temas:
+            await self.quitar_grupo(self.temas.pop(tema))
+        elif accion not in ('suscribir', 'desuscribir'):
+            return await self.send(text_data=json.dumps({'type': 'error', 'mensaje': f'Acción desconocida: {accion}'}))
+
+        await self.send(text_data=json.dumps({'type': 'suscripcion', 'temas': sorted(self.temas)}))
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""
+Context processors
+Variables disponibles en todos los templates.
+"""
+from core.services.carrito import obtener_resumen_carrito
+
+
+def carrito(request):
+    """Contador del carrito para el menú, leído desde la sesión"""
+    resumen = obtener_resumen_carrito(request)
+    return {
+        'cantidad_carrito': resumen['cantidad'],
+        'subtotal_carrito': resumen['subtotal'],
+    }
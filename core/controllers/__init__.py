@@ -14,8 +14,12 @@ from .cliente_controller import (
     ver_carrito,
     actualizar_cantidad_carrito,
     eliminar_del_carrito,
+    carrito_api_agregar,
+    carrito_api_actualizar,
+    carrito_api_eliminar,
     finalizar_compra,
     mis_pedidos,
+    pedido_cliente_fragmento,
     perfil
 )
 
@@ -23,15 +27,19 @@ from .admin_controller import (
     admin_login,
     admin_logout,
     admin_dashboard,
-    admin_mis_entregas
+    admin_mis_entregas,
+    admin_metricas
 )
 
 from .pedido_controller import (
     admin_pedidos,
+    admin_pedido_fragmento,
     admin_cambiar_estado_pedido,
     admin_asignar_repartidor,
+    admin_tomar_pedido,
     admin_eliminar_pedido,
-    admin_reportes_ventas
+    admin_reportes_ventas,
+    admin_exportar_ventas
 )
 
 from .producto_controller import (
@@ -68,8 +76,12 @@ __all__ = [
     'ver_carrito',
     'actualizar_cantidad_carrito',
     'eliminar_del_carrito',
+    'carrito_api_agregar',
+    'carrito_api_actualizar',
+    'carrito_api_eliminar',
     'finalizar_compra',
     'mis_pedidos',
+    'pedido_cliente_fragmento',
     'perfil',
     
     # Admin views
@@ -77,13 +89,17 @@ __all__ = [
     'admin_logout',
     'admin_dashboard',
     'admin_mis_entregas',
+    'admin_metricas',
     
     # Pedido views
     'admin_pedidos',
+    'admin_pedido_fragmento',
     'admin_cambiar_estado_pedido',
     'admin_asignar_repartidor',
+    'admin_tomar_pedido',
     'admin_eliminar_pedido',
     'admin_reportes_ventas',
+    'admin_exportar_ventas',
     
     # Producto views
     'admin_productos',
@@ -3,14 +3,22 @@
 Controllers: Admin Views
 Vistas relacionadas con la gestión interna del restaurante.
 """
+from django.conf import settings
+from django.http import HttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password, check_password
-from django.db.models import Sum
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
 from core.models import Usuario, Rol, Pedido, Producto
+from core.controllers.permisos import personal_requerido
+from core.services.fechas import rango_del_dia
+from core.services.metricas import exportar_prometheus
+from core.services.ventas import totales_ventas
 import os
 
+TIPO_PROMETHEUS = 'text/plain; version=0.0.4; charset=utf-8'
+
 
 def admin_login(request):
     """Vista de login para personal del restaurante"""
@@ -45,26 +53,24 @@ def admin_logout(request):
     return redirect('admin_login')
 
 
+@personal_requerido()
 def admin_dashboard(request):
     """Dashboard principal para el personal"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
+    usuario = request.personal
     
     # Estadísticas generales
     total_pedidos = Pedido.objects.count()
     pedidos_pendientes = Pedido.objects.filter(
         estado__in=['EN_PREPARACION', 'LISTO_ENTREGA', 'EN_RUTA']
     ).count()
+    hoy_desde, hoy_hasta = rango_del_dia(timezone.localdate())
     pedidos_hoy = Pedido.objects.filter(
-        fecha_creacion__date=timezone.now().date()
+        fecha_creacion__gte=hoy_desde,
+        fecha_creacion__lt=hoy_hasta
     ).count()
     
-    # Ventas totales
-    ventas_totales = Pedido.objects.aggregate(
-        total=Sum('total_venta')
-    )['total'] or 0
+    # Ventas totales (pedidos entregados), desde el resumen diario
+    ventas_totales, _ = totales_ventas()
     
     # Pedidos recientes
     pedidos_recientes = Pedido.objects.select_related('cliente', 'repartidor').order_by('-fecha_creacion')[:10]
@@ -81,17 +87,10 @@ def admin_dashboard(request):
     return render(request, 'core/admin/dashboard.html', context)
 
 
+@personal_requerido('Repartidores')
 def admin_mis_entregas(request):
     """Vista para repartidores: ver sus entregas asignadas"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo repartidores pueden ver esta página
-    if usuario.rol.nombre_rol != 'Repartidores':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
+    usuario = request.personal
     
     # Obtener código de búsqueda
     codigo_busqueda = request.GET.get('codigo', '').strip()
@@ -118,3 +117,20 @@ def admin_mis_entregas(request):
     }
     
     return render(request, 'core/admin/mis_entregas.html', context)
+
+
+@personal_requerido('Admin', mensaje='Solo los administradores pueden ver las métricas')
+def _admin_metricas(request):
+    return HttpResponse(exportar_prometheus(), content_type=TIPO_PROMETHEUS)
+
+
+def admin_metricas(request):
+    """
+    Métricas de WebSockets y notificaciones en formato de texto de Prometheus.
+    Son de este proceso: con varios workers, cada uno expone las suyas.
+    Acceso con sesión de Admin o con `Authorization: Bearer <METRICAS_TOKEN>`.
+    """
+    token = settings.METRICAS_TOKEN
+    if token and constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(exportar_prometheus(), content_type=TIPO_PROMETHEUS)
+    return _admin_metricas(request)
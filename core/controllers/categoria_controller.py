@@ -5,26 +5,20 @@ Vistas para gestión de categorías del restaurante (Solo Admin).
 """
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from core.models import Usuario, Categoria, Producto
+from django.db.models import Count, Q
+from core.models import Categoria, Producto
+from core.controllers.permisos import personal_requerido
 
 
+@personal_requerido('Admin', mensaje='Acceso denegado. Solo administradores pueden gestionar categorías.')
 def admin_categorias(request):
     """Vista para gestionar categorías (solo Admin)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
+    usuario = request.personal
     
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin puede gestionar categorías
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado. Solo administradores pueden gestionar categorías.')
-        return redirect('admin_dashboard')
-    
-    categorias = Categoria.objects.all().order_by('nombre')
-    
-    # Contar productos por categoría
-    for categoria in categorias:
-        categoria.total_productos = categoria.productos.filter(eliminado=False).count()
+    # Contar productos por categoría en la misma consulta
+    categorias = Categoria.objects.annotate(
+        total_productos=Count('productos', filter=Q(productos__eliminado=False))
+    ).order_by('nombre')
     
     context = {
         'usuario': usuario,
@@ -34,17 +28,9 @@ def admin_categorias(request):
     return render(request, 'core/admin/categorias.html', context)
 
 
+@personal_requerido('Admin')
 def admin_crear_categoria(request):
     """Vista para crear una nueva categoría (solo Admin)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         nombre = request.POST.get('nombre')
         descripcion = request.POST.get('descripcion', '')
@@ -66,17 +52,9 @@ def admin_crear_categoria(request):
     return redirect('admin_categorias')
 
 
+@personal_requerido('Admin')
 def admin_editar_categoria(request, categoria_id):
     """Vista para editar una categoría (solo Admin)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         categoria = get_object_or_404(Categoria, id=categoria_id)
         
@@ -97,17 +75,9 @@ def admin_editar_categoria(request, categoria_id):
     return redirect('admin_categorias')
 
 
+@personal_requerido('Admin')
 def admin_eliminar_categoria(request, categoria_id):
     """Vista para eliminar una categoría (solo Admin)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     categoria = get_object_or_404(Categoria, id=categoria_id)
     
     # Verificar que no sea la categoría "Todos"
@@ -129,17 +99,9 @@ def admin_eliminar_categoria(request, categoria_id):
     return redirect('admin_categorias')
 
 
+@personal_requerido('Admin')
 def admin_toggle_categoria(request, categoria_id):
     """Vista para activar/desactivar una categoría (solo Admin)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     categoria = get_object_or_404(Categoria, id=categoria_id)
     
     # No permitir desactivar la categoría "Todos"
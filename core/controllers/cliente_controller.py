@@ -6,25 +6,31 @@ Vistas relacionadas con la gestión de clientes (registro, login, carrito, pedid
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password, check_password
-from django.db.models import Sum
-from core.models import Cliente, Categoria, Producto, Carrito, DetalleCarrito, Pedido, DetallePedido
+from django.db import transaction
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from core.models import Cliente, Producto, Carrito, Pedido
+from core.services.carrito import (
+    actualizar_resumen_carrito,
+    agregar_producto,
+    cambiar_cantidad,
+    limpiar_resumen_carrito,
+    linea_carrito,
+    quitar_linea,
+    vaciar_resumen_carrito,
+)
+from core.services.checkout import crear_pedido_desde_carrito
+from core.services.menu import obtener_menu
+from core.services.notificaciones import encolar_notificaciones
+from core.services.pedidos import obtener_snapshot, snapshot_pedido
 from decimal import Decimal
+import uuid
 
 
 def ubicacion(request):
     """Vista de ubicación y contacto"""
-    # Obtener cantidad de items en el carrito si hay sesión
-    cantidad_carrito = 0
-    if 'cliente_id' in request.session:
-        cliente = Cliente.objects.get(id=request.session['cliente_id'])
-        carrito = Carrito.objects.filter(cliente=cliente, activo=True).first()
-        if carrito:
-            cantidad_carrito = carrito.detalles.aggregate(
-                total=Sum('cantidad')
-            )['total'] or 0
-    
+    # cantidad_carrito la agrega el context processor core.context_processors.carrito
     context = {
-        'cantidad_carrito': cantidad_carrito,
         'cliente_autenticado': 'cliente_id' in request.session
     }
     return render(request, 'core/ubicacion.html', context)
@@ -32,34 +38,11 @@ def ubicacion(request):
 
 def index(request):
     """Vista principal: muestra categorías y productos disponibles"""
-    # Obtener categorías activas con sus productos
-    categorias = Categoria.objects.filter(activo=True).prefetch_related(
-        'productos'
-    ).order_by('nombre')
-    
-    # Enriquecer cada categoría con sus productos
-    categorias_con_productos = []
-    for categoria in categorias:
-        productos = categoria.productos.filter(activo=True, eliminado=False).order_by('nombre')
-        if productos.exists():
-            categorias_con_productos.append({
-                'categoria': categoria,
-                'productos': productos
-            })
-    
-    # Obtener cantidad de items en el carrito si hay sesión
-    cantidad_carrito = 0
-    if 'cliente_id' in request.session:
-        cliente = Cliente.objects.get(id=request.session['cliente_id'])
-        carrito = Carrito.objects.filter(cliente=cliente, activo=True).first()
-        if carrito:
-            cantidad_carrito = carrito.detalles.aggregate(
-                total=Sum('cantidad')
-            )['total'] or 0
+    # Menú precalculado (cache); solo consulta la base de datos si cambió
+    categorias_con_productos = obtener_menu()
     
     context = {
         'categorias_con_productos': categorias_con_productos,
-        'cantidad_carrito': cantidad_carrito,
         'cliente_autenticado': 'cliente_id' in request.session
     }
     return render(request, 'core/index.html', context)
@@ -111,6 +94,7 @@ def login(request):
                 # Crear sesión
                 request.session['cliente_id'] = cliente.id
                 request.session['cliente_nombre'] = cliente.nombre
+                actualizar_resumen_carrito(request)
                 messages.success(request, f'¡Bienvenido {cliente.nombre}!')
                 return redirect('index')
             else:
@@ -126,6 +110,7 @@ def logout(request):
     if 'cliente_id' in request.session:
         del request.session['cliente_id']
         del request.session['cliente_nombre']
+        limpiar_resumen_carrito(request)
     messages.success(request, 'Sesión cerrada exitosamente')
     return redirect('index')
 
@@ -136,29 +121,15 @@ def agregar_al_carrito(request, producto_id):
         messages.warning(request, 'Debes iniciar sesión para agregar productos al carrito')
         return redirect('login')
     
-    cliente = Cliente.objects.get(id=request.session['cliente_id'])
     producto = get_object_or_404(Producto, id=producto_id, activo=True, eliminado=False)
     
-    # Obtener o crear carrito activo
-    carrito, created = Carrito.objects.get_or_create(
-        cliente=cliente,
-        activo=True
-    )
-    
-    # Obtener o crear detalle del carrito
-    detalle, created = DetalleCarrito.objects.get_or_create(
-        carrito=carrito,
-        producto=producto,
-        defaults={'cantidad': 1}
-    )
-    
-    if not created:
-        # Si ya existe, incrementar cantidad
-        detalle.cantidad += 1
-        detalle.save()
-        messages.success(request, f'Cantidad de {producto.nombre} actualizada en el carrito')
-    else:
+    # Incremento atómico en la base de datos (ver core/services/carrito.py)
+    if agregar_producto(request.session['cliente_id'], producto):
         messages.success(request, f'{producto.nombre} agregado al carrito')
+    else:
+        messages.success(request, f'Cantidad de {producto.nombre} actualizada en el carrito')
+    
+    actualizar_resumen_carrito(request)
     
     return redirect('index')
 
@@ -187,6 +158,7 @@ def ver_carrito(request):
         'carrito': carrito,
         'detalles': detalles,
         'total': total,
+        'clave_idempotencia': uuid.uuid4().hex,
         'cliente_autenticado': True
     }
     return render(request, 'core/carrito.html', context)
@@ -199,20 +171,18 @@ def actualizar_cantidad_carrito(request, detalle_id):
     
     if request.method == 'POST':
         cantidad = int(request.POST.get('cantidad', 1))
-        detalle = get_object_or_404(DetalleCarrito, id=detalle_id)
         
-        # Verificar que el carrito pertenece al cliente
-        if detalle.carrito.cliente.id != request.session['cliente_id']:
+        # Solo modifica la línea si el carrito pertenece al cliente (misma consulta)
+        if not cambiar_cantidad(request.session['cliente_id'], detalle_id, cantidad):
             messages.error(request, 'Acción no permitida')
             return redirect('ver_carrito')
         
         if cantidad > 0:
-            detalle.cantidad = cantidad
-            detalle.save()
             messages.success(request, 'Cantidad actualizada')
         else:
-            detalle.delete()
             messages.success(request, 'Producto eliminado del carrito')
+        
+        actualizar_resumen_carrito(request)
     
     return redirect('ver_carrito')
 
@@ -222,82 +192,124 @@ def eliminar_del_carrito(request, detalle_id):
     if 'cliente_id' not in request.session:
         return redirect('login')
     
-    detalle = get_object_or_404(DetalleCarrito, id=detalle_id)
-    
-    # Verificar que el carrito pertenece al cliente
-    if detalle.carrito.cliente.id != request.session['cliente_id']:
+    # Solo elimina la línea si el carrito pertenece al cliente
+    producto_nombre = quitar_linea(request.session['cliente_id'], detalle_id)
+    if producto_nombre is None:
         messages.error(request, 'Acción no permitida')
         return redirect('ver_carrito')
     
-    producto_nombre = detalle.producto.nombre
-    detalle.delete()
+    actualizar_resumen_carrito(request)
     messages.success(request, f'{producto_nombre} eliminado del carrito')
     
     return redirect('ver_carrito')
 
 
+def _respuesta_carrito(request, linea, mensaje):
+    """Línea modificada y resumen del carrito (el mismo que muestra el contador del menú)"""
+    return JsonResponse({
+        'linea': linea,
+        'carrito': actualizar_resumen_carrito(request),
+        'mensaje': mensaje,
+    })
+
+
+def _error_carrito(request):
+    """Validaciones comunes de la API del carrito; None si la petición es válida"""
+    if 'cliente_id' not in request.session:
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Método no permitido'}, status=405)
+    return None
+
+
+def carrito_api_agregar(request, producto_id):
+    """API JSON: agrega una unidad del producto sin recargar el menú"""
+    error = _error_carrito(request)
+    if error:
+        return error
+    
+    producto = Producto.objects.filter(id=producto_id, activo=True, eliminado=False).only('id', 'nombre').first()
+    if not producto:
+        return JsonResponse({'error': 'Producto no disponible'}, status=404)
+    
+    cliente_id = request.session['cliente_id']
+    if agregar_producto(cliente_id, producto):
+        mensaje = f'{producto.nombre} agregado al carrito'
+    else:
+        mensaje = f'Cantidad de {producto.nombre} actualizada en el carrito'
+    return _respuesta_carrito(request, linea_carrito(cliente_id, producto_id=producto.id), mensaje)
+
+
+def carrito_api_actualizar(request, detalle_id):
+    """API JSON: fija la cantidad de una línea (0 la elimina)"""
+    error = _error_carrito(request)
+    if error:
+        return error
+    
+    try:
+        cantidad = int(request.POST.get('cantidad', 1))
+    except ValueError:
+        return JsonResponse({'error': 'Cantidad inválida'}, status=400)
+    
+    cliente_id = request.session['cliente_id']
+    if not cambiar_cantidad(cliente_id, detalle_id, cantidad):
+        return JsonResponse({'error': 'Producto no encontrado en tu carrito'}, status=404)
+    
+    if cantidad > 0:
+        return _respuesta_carrito(request, linea_carrito(cliente_id, id=detalle_id), 'Cantidad actualizada')
+    return _respuesta_carrito(request, None, 'Producto eliminado del carrito')
+
+
+def carrito_api_eliminar(request, detalle_id):
+    """API JSON: elimina una línea del carrito"""
+    error = _error_carrito(request)
+    if error:
+        return error
+    
+    producto_nombre = quitar_linea(request.session['cliente_id'], detalle_id)
+    if producto_nombre is None:
+        return JsonResponse({'error': 'Producto no encontrado en tu carrito'}, status=404)
+    return _respuesta_carrito(request, None, f'{producto_nombre} eliminado del carrito')
+
+
 def finalizar_compra(request):
     """Vista para finalizar la compra y crear el pedido"""
     if 'cliente_id' not in request.session:
         return redirect('login')
     
     cliente = Cliente.objects.get(id=request.session['cliente_id'])
-    carrito = Carrito.objects.filter(cliente=cliente, activo=True).first()
     
-    if not carrito or not carrito.detalles.exists():
+    # La clave viene del formulario del carrito; un reintento devuelve el mismo pedido
+    clave_idempotencia = (
+        request.POST.get('clave_idempotencia') or request.headers.get('Idempotency-Key') or ''
+    ).strip()[:64]
+    
+    with transaction.atomic():
+        pedido, creado = crear_pedido_desde_carrito(cliente, clave_idempotencia or None)
+        
+        # Notificar a cocina sobre nuevo pedido; el evento se guarda con el pedido
+        # y se publica al confirmar, sin que la respuesta espere al channel layer
+        if creado:
+            encolar_notificaciones([
+                ('cocina', {
+                    'type': 'nuevo_pedido',
+                    'pedido_id': pedido.id,
+                    'codigo_unico': pedido.codigo_unico,
+                    'cliente_nombre': cliente.nombre,
+                    'total': str(pedido.total_venta),
+                    'pedido': obtener_snapshot(pedido.id)
+                }),
+            ])
+    
+    if not pedido:
         messages.warning(request, 'Tu carrito está vacío')
         return redirect('index')
     
-    # Calcular total
-    total = Decimal('0.00')
-    detalles = carrito.detalles.select_related('producto').all()
-    for detalle in detalles:
-        total += detalle.producto.precio * detalle.cantidad
-    
-    # Crear pedido
-    pedido = Pedido.objects.create(
-        cliente=cliente,
-        total_venta=total,
-        estado='RECIBIDO'  # Estado inicial
-    )
-    
-    # Crear detalles del pedido
-    for detalle in detalles:
-        DetallePedido.objects.create(
-            pedido=pedido,
-            producto=detalle.producto,
-            producto_nombre=detalle.producto.nombre,
-            cantidad=detalle.cantidad,
-            precio_unitario=detalle.producto.precio
-        )
-    
-    # Desactivar carrito
-    carrito.activo = False
-    carrito.save()
-    
-    # Notificar a cocina sobre nuevo pedido
-    from channels.layers import get_channel_layer
-    from asgiref.sync import async_to_sync
-    import logging
+    if not creado:
+        messages.info(request, f'El pedido {pedido.codigo_unico} ya fue registrado')
+        return redirect('mis_pedidos')
     
-    logger = logging.getLogger(__name__)
-    logger.info(f"🍔 Enviando notificación de nuevo pedido {pedido.codigo_unico} a cocina...")
-    
-    try:
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'cocina',
-            {
-                'type': 'nuevo_pedido',
-                'pedido_id': pedido.id,
-                'codigo_unico': pedido.codigo_unico,
-                'cliente_nombre': cliente.nombre,
-                'total': str(total)
-            }
-        )
-        logger.info(f"✅ Notificación enviada exitosamente para pedido {pedido.codigo_unico}")
-    except Exception as e:
-        logger.error(f"❌ Error al enviar notificación: {e}")
+    vaciar_resumen_carrito(request)
     
     messages.success(request, f'¡Pedido {pedido.codigo_unico} realizado exitosamente!')
     return redirect('mis_pedidos')
@@ -309,7 +321,7 @@ def mis_pedidos(request):
         return redirect('login')
     
     cliente = Cliente.objects.get(id=request.session['cliente_id'])
-    pedidos = Pedido.objects.filter(cliente=cliente).prefetch_related('detalles__producto')
+    pedidos = Pedido.objects.filter(cliente=cliente).select_related('repartidor').prefetch_related('detalles__producto')
     
     context = {
         'pedidos': pedidos,
@@ -318,6 +330,24 @@ def mis_pedidos(request):
     return render(request, 'core/mis_pedidos.html', context)
 
 
+def pedido_cliente_fragmento(request, pedido_id):
+    """Devuelve un pedido propio del cliente como JSON (snapshot + HTML)"""
+    if 'cliente_id' not in request.session:
+        return JsonResponse({'error': 'No autenticado'}, status=401)
+    
+    pedido = Pedido.objects.filter(
+        id=pedido_id, cliente_id=request.session['cliente_id']
+    ).select_related('cliente', 'repartidor').prefetch_related('detalles__producto').first()
+    
+    if not pedido:
+        return JsonResponse({'error': 'Pedido no encontrado'}, status=404)
+    
+    return JsonResponse({
+        'pedido': snapshot_pedido(pedido),
+        'html': render_to_string('core/_pedido_cliente.html', {'pedido': pedido}, request=request),
+    })
+
+
 def perfil(request):
     """Vista para ver y actualizar el perfil del cliente"""
     if 'cliente_id' not in request.session:
@@ -369,17 +399,8 @@ def perfil(request):
         else:
             messages.error(request, 'Todos los campos son obligatorios')
     
-    # Obtener cantidad de items en el carrito
-    cantidad_carrito = 0
-    carrito = Carrito.objects.filter(cliente=cliente, activo=True).first()
-    if carrito:
-        cantidad_carrito = carrito.detalles.aggregate(
-            total=Sum('cantidad')
-        )['total'] or 0
-    
     context = {
         'cliente': cliente,
-        'cantidad_carrito': cantidad_carrito,
         'cliente_autenticado': True
     }
     return render(request, 'core/perfil.html', context)
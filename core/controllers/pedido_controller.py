@@ -5,36 +5,63 @@ Vistas para gestión de pedidos del restaurante.
 """
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from django.utils import timezone
-from core.models import Usuario, Pedido
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from django.db import transaction
+from django.http import JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.conf import settings
+from core.models import Usuario, Pedido, VentaDiaria
+from core.controllers.permisos import personal_requerido
+from core.services.exportacion import generar_csv_ventas
+from core.services.fechas import dias_del_rango, rango_desde_texto
+from core.services.notificaciones import ROLES_VENTAS, encolar_notificaciones, grupo_ventas_rol
+from core.services.paginacion import paginar_por_cursor
+from core.services.pedidos import obtener_pedido_completo, obtener_snapshot, snapshot_pedido
+from core.services.reparto import tomar_siguiente_pedido
+from core.services.transiciones import TransicionRechazada, asignar_repartidor, cambiar_estado
+from core.services.ventas import revertir_venta, totales_ventas
 
 
+@personal_requerido()
 def admin_pedidos(request):
-    """Vista para gestionar todos los pedidos"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
+    """
+    Vista para gestionar los pedidos.
+    Por defecto muestra solo los pedidos activos y pagina por cursor sobre
+    (fecha_creacion, id), así el costo no crece con el historial.
+    """
+    usuario = request.personal
     
     # Filtros
     estado_filtro = request.GET.get('estado', '')
     codigo_busqueda = request.GET.get('codigo', '').strip()
+    cursor = request.GET.get('cursor', '')
+    
+    try:
+        por_pagina = int(request.GET.get('por_pagina', settings.PEDIDOS_POR_PAGINA))
+    except ValueError:
+        por_pagina = settings.PEDIDOS_POR_PAGINA
+    por_pagina = max(1, min(por_pagina, 200))
     
     pedidos = Pedido.objects.select_related('cliente', 'repartidor').prefetch_related('detalles__producto')
     
     # Si es Cocina, ver solo pedidos RECIBIDO y EN_PREPARACION
     if usuario.rol.nombre_rol == 'Cocina':
-        pedidos = pedidos.filter(estado__in=['RECIBIDO', 'EN_PREPARACION'])
+        estados_visibles = ['RECIBIDO', 'EN_PREPARACION']
+    elif estado_filtro == 'TODOS':
+        estados_visibles = [codigo for codigo, nombre in Pedido.ESTADOS]
     elif estado_filtro:
-        pedidos = pedidos.filter(estado=estado_filtro)
+        estados_visibles = [estado_filtro]
+    else:
+        # Ventana por defecto: solo pedidos activos
+        estados_visibles = Pedido.ESTADOS_ACTIVOS
+    
+    if estado_filtro != 'TODOS' or usuario.rol.nombre_rol == 'Cocina':
+        pedidos = pedidos.filter(estado__in=estados_visibles)
     
     # Filtrar por código si se proporciona
     if codigo_busqueda:
         pedidos = pedidos.filter(codigo_unico__icontains=codigo_busqueda)
     
-    pedidos = pedidos.order_by('-fecha_creacion')
+    pedidos, siguiente_cursor = paginar_por_cursor(pedidos, cursor=cursor, por_pagina=por_pagina)
     
     # Obtener repartidores para el select
     repartidores = Usuario.objects.filter(rol__nombre_rol='Repartidores')
@@ -46,121 +73,75 @@ def admin_pedidos(request):
         'codigo_busqueda': codigo_busqueda,
         'estados': Pedido.ESTADOS,
         'repartidores': repartidores,
+        'cursor': cursor,
+        'siguiente_cursor': siguiente_cursor,
+        'por_pagina': por_pagina,
+        # Usados por el WebSocket para actualizar el tablero en el lugar
+        'estados_visibles': estados_visibles,
+        'acepta_nuevos': not cursor and not codigo_busqueda,
     }
     
     return render(request, 'core/admin/pedidos.html', context)
 
 
+@personal_requerido(json=True)
+def admin_pedido_fragmento(request, pedido_id):
+    """
+    Devuelve un solo pedido como JSON (snapshot) junto con su tarjeta HTML,
+    para que el tablero lo actualice en el lugar sin recargar la página.
+    """
+    usuario = request.personal
+    
+    try:
+        pedido = obtener_pedido_completo(pedido_id)
+    except Pedido.DoesNotExist:
+        return JsonResponse({'error': 'Pedido no encontrado'}, status=404)
+    
+    # Repartidores usan la tarjeta de "Mis Entregas"; el resto la del tablero
+    if request.GET.get('vista') == 'entregas':
+        template = 'core/admin/_entrega_card.html'
+        context = {'usuario': usuario, 'pedido': pedido}
+    else:
+        template = 'core/admin/_pedido_card.html'
+        context = {
+            'usuario': usuario,
+            'pedido': pedido,
+            'estados': Pedido.ESTADOS,
+            'repartidores': Usuario.objects.filter(rol__nombre_rol='Repartidores'),
+        }
+    
+    return JsonResponse({
+        'pedido': snapshot_pedido(pedido),
+        'html': render_to_string(template, context, request=request),
+    })
+
+
+@personal_requerido()
 def admin_cambiar_estado_pedido(request, pedido_id):
-    """Vista para cambiar el estado de un pedido"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
+    """
+    Vista para cambiar el estado de un pedido.
+    Las reglas por rol y el UPDATE condicional están en core/services/transiciones.py.
+    """
+    usuario = request.personal
     
     if request.method == 'POST':
-        usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-        pedido = get_object_or_404(Pedido, id=pedido_id)
+        pedido = get_object_or_404(Pedido.objects.select_related('cliente', 'repartidor'), id=pedido_id)
         nuevo_estado = request.POST.get('estado')
         
-        # Validar permisos de Cocina
-        if usuario.rol.nombre_rol == 'Cocina':
-            # Cocina puede cambiar: RECIBIDO -> EN_PREPARACION -> LISTO_ENTREGA
-            if pedido.estado == 'RECIBIDO' and nuevo_estado != 'EN_PREPARACION':
-                messages.error(request, 'Solo puedes cambiar el pedido a "En preparación"')
-                return redirect('admin_pedidos')
-            elif pedido.estado == 'EN_PREPARACION' and nuevo_estado != 'LISTO_ENTREGA':
-                messages.error(request, 'Solo puedes marcar el pedido como "Listo para entrega"')
-                return redirect('admin_pedidos')
-            elif pedido.estado not in ['RECIBIDO', 'EN_PREPARACION']:
-                messages.error(request, 'Este pedido ya no puede ser modificado por Cocina')
-                return redirect('admin_pedidos')
-        
-        # Validar permisos de Repartidor
-        if usuario.rol.nombre_rol == 'Repartidores':
-            # Validar transiciones permitidas
-            if pedido.estado == 'LISTO_ENTREGA' and nuevo_estado == 'EN_CAMINO':
-                # Asignar el repartidor automáticamente
-                pedido.repartidor = usuario
-            elif pedido.estado == 'EN_CAMINO' and nuevo_estado in ['ENTREGADO', 'NO_ENTREGADO']:
-                # Verificar que el pedido esté asignado a este repartidor
-                if pedido.repartidor != usuario:
-                    messages.error(request, 'Este pedido no está asignado a ti')
-                    return redirect('admin_mis_entregas')
-            else:
-                messages.error(request, 'Transición de estado no permitida')
-                return redirect('admin_mis_entregas')
+        try:
+            with transaction.atomic():
+                aplicado = cambiar_estado(pedido, nuevo_estado, usuario)
+                if aplicado:
+                    _notificar_cambio_estado(pedido)
+        except TransicionRechazada as e:
+            messages.error(request, str(e))
+            aplicado = None
         
-        if nuevo_estado in dict(Pedido.ESTADOS):
-            pedido.estado = nuevo_estado
-            
-            # Si el estado es ENTREGADO o NO_ENTREGADO, registrar fecha de entrega
-            if nuevo_estado in ['ENTREGADO', 'NO_ENTREGADO']:
-                pedido.fecha_entrega = timezone.now()
-            
-            pedido.save()
-            
-            import logging
-            logger = logging.getLogger(__name__)
-            
-            # Enviar notificación WebSocket al cliente
-            channel_layer = get_channel_layer()
-            async_to_sync(channel_layer.group_send)(
-                f'pedidos_cliente_{pedido.cliente.id}',
-                {
-                    'type': 'pedido_actualizado',
-                    'pedido_id': pedido.id,
-                    'estado': nuevo_estado,
-                    'codigo_unico': pedido.codigo_unico
-                }
-            )
-            
-            # Notificar a cocina sobre CUALQUIER cambio en pedidos
-            # Esto incluye cuando se crea (RECIBIDO) o cuando cambia de estado
-            logger.info(f"🔔 Notificando a cocina cambio en pedido {pedido.codigo_unico} a estado {nuevo_estado}")
-            async_to_sync(channel_layer.group_send)(
-                'cocina',
-                {
-                    'type': 'estado_actualizado',
-                    'pedido_id': pedido.id,
-                    'codigo_unico': pedido.codigo_unico,
-                    'estado': nuevo_estado,
-                    'cliente_nombre': pedido.cliente.nombre
-                }
-            )
-            
-            # Si el pedido está LISTO_ENTREGA, notificar a todos los repartidores
-            if nuevo_estado == 'LISTO_ENTREGA':
-                async_to_sync(channel_layer.group_send)(
-                    'repartidores',
-                    {
-                        'type': 'pedido_listo',
-                        'pedido_id': pedido.id,
-                        'codigo_unico': pedido.codigo_unico,
-                        'cliente_nombre': pedido.cliente.nombre,
-                        'total': str(pedido.total_venta)
-                    }
-                )
-            
-            # Si se marca como entregado, notificar a cajeros y admins
-            if nuevo_estado == 'ENTREGADO':
-                # Notificar a todos los cajeros y admins sobre la entrega
-                cajeros_admins = Usuario.objects.filter(
-                    rol__nombre_rol__in=['Cajeros', 'Admin']
-                )
-                for usuario_notif in cajeros_admins:
-                    async_to_sync(channel_layer.group_send)(
-                        f'ventas_usuario_{usuario_notif.id}',
-                        {
-                            'type': 'venta_realizada',
-                            'pedido_id': pedido.id,
-                            'codigo_unico': pedido.codigo_unico,
-                            'total': str(pedido.total_venta),
-                            'repartidor': pedido.repartidor.nombre if pedido.repartidor else 'N/A'
-                        }
-                    )
-            
+        if aplicado:
             messages.success(request, f'Estado del pedido {pedido.codigo_unico} actualizado')
-        else:
-            messages.error(request, 'Estado inválido')
+        elif aplicado is False:
+            # Otro usuario lo cambió entre la lectura y el UPDATE: no se pisa su cambio
+            messages.warning(request, f'El pedido {pedido.codigo_unico} fue modificado por otro usuario. Revisa su estado actual.')
     
     # Redirigir según el rol del usuario
     if usuario.rol.nombre_rol == 'Repartidores':
@@ -169,141 +150,226 @@ def admin_cambiar_estado_pedido(request, pedido_id):
         return redirect('admin_pedidos')
 
 
+def _notificar_cambio_estado(pedido):
+    """Encola los eventos del cambio de estado; se llama dentro de la transacción del cambio"""
+    nuevo_estado = pedido.estado
+    
+    # Snapshot completo para que las pantallas actualicen sin recargar
+    snapshot = obtener_snapshot(pedido.id)
+    
+    # Notificar al cliente y a cocina sobre CUALQUIER cambio en pedidos
+    eventos = [
+        (f'pedidos_cliente_{pedido.cliente.id}', {
+            'type': 'pedido_actualizado',
+            'pedido_id': pedido.id,
+            'estado': nuevo_estado,
+            'codigo_unico': pedido.codigo_unico,
+            'pedido': snapshot
+        }),
+        ('cocina', {
+            'type': 'estado_actualizado',
+            'pedido_id': pedido.id,
+            'codigo_unico': pedido.codigo_unico,
+            'estado': nuevo_estado,
+            'cliente_nombre': pedido.cliente.nombre,
+            'pedido': snapshot
+        }),
+    ]
+    
+    # Si el pedido está LISTO_ENTREGA, notificar a todos los repartidores
+    if nuevo_estado == 'LISTO_ENTREGA':
+        eventos.append(('repartidores', {
+            'type': 'pedido_listo',
+            'pedido_id': pedido.id,
+            'codigo_unico': pedido.codigo_unico,
+            'cliente_nombre': pedido.cliente.nombre,
+            'total': str(pedido.total_venta),
+            'pedido': snapshot
+        }))
+    
+    # Si un repartidor lo tomó, los demás lo quitan de su lista
+    if nuevo_estado == 'EN_CAMINO':
+        eventos.append(('repartidores', {
+            'type': 'pedido_tomado',
+            'pedido_id': pedido.id,
+            'codigo_unico': pedido.codigo_unico,
+            'repartidor': pedido.repartidor.nombre if pedido.repartidor else 'N/A',
+            'pedido': snapshot
+        }))
+    
+    # Si se marca como entregado, notificar a cajeros y admins
+    if nuevo_estado == 'ENTREGADO':
+        # Un evento por rol: cada grupo ventas_rol_<rol> reúne a todos sus usuarios
+        for nombre_rol in ROLES_VENTAS:
+            eventos.append((grupo_ventas_rol(nombre_rol), {
+                'type': 'venta_realizada',
+                'pedido_id': pedido.id,
+                'codigo_unico': pedido.codigo_unico,
+                'total': str(pedido.total_venta),
+                'repartidor': pedido.repartidor.nombre if pedido.repartidor else 'N/A',
+                'pedido': snapshot
+            }))
+    
+    # Se publican al confirmar la transacción, fuera de esta petición
+    encolar_notificaciones(eventos)
+
+
+@personal_requerido('Repartidores', mensaje='Solo los repartidores pueden tomar pedidos')
+def admin_tomar_pedido(request):
+    """
+    Vista para que un repartidor tome el siguiente pedido listo de la cola
+    (core/services/reparto.py); dos repartidores nunca reciben el mismo.
+    """
+    if request.method == 'POST':
+        with transaction.atomic():
+            pedido = tomar_siguiente_pedido(request.personal)
+            if pedido:
+                _notificar_cambio_estado(pedido)
+        
+        if pedido:
+            messages.success(request, f'Tomaste el pedido {pedido.codigo_unico}')
+        else:
+            messages.info(request, 'No hay pedidos listos para entrega')
+    
+    return redirect('admin_mis_entregas')
+
+
+@personal_requerido()
 def admin_asignar_repartidor(request, pedido_id):
     """Vista para asignar un repartidor a un pedido"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
     if request.method == 'POST':
-        pedido = get_object_or_404(Pedido, id=pedido_id)
+        pedido = get_object_or_404(Pedido.objects.select_related('cliente'), id=pedido_id)
         repartidor_id = request.POST.get('repartidor_id')
         
+        repartidor = None
         if repartidor_id:
             repartidor = get_object_or_404(Usuario, id=repartidor_id, rol__nombre_rol='Repartidores')
-            pedido.repartidor = repartidor
-            pedido.save()
+        
+        with transaction.atomic():
+            aplicado = asignar_repartidor(pedido, repartidor)
+            if aplicado:
+                snapshot = obtener_snapshot(pedido.id)
+                
+                # Notificar al cliente; el tablero también muestra el repartidor asignado
+                encolar_notificaciones([
+                    (f'pedidos_cliente_{pedido.cliente.id}', {
+                        'type': 'pedido_actualizado',
+                        'pedido_id': pedido.id,
+                        'estado': pedido.estado,
+                        'codigo_unico': pedido.codigo_unico,
+                        'pedido': snapshot
+                    }),
+                    ('cocina', {
+                        'type': 'estado_actualizado',
+                        'pedido_id': pedido.id,
+                        'codigo_unico': pedido.codigo_unico,
+                        'estado': pedido.estado,
+                        'cliente_nombre': pedido.cliente.nombre,
+                        'pedido': snapshot
+                    }),
+                ])
+        
+        if not aplicado:
+            messages.warning(request, f'El pedido {pedido.codigo_unico} fue modificado por otro usuario. Revisa su estado actual.')
+        elif repartidor:
             messages.success(request, f'Repartidor {repartidor.nombre} asignado al pedido {pedido.codigo_unico}')
         else:
-            pedido.repartidor = None
-            pedido.save()
             messages.success(request, f'Repartidor removido del pedido {pedido.codigo_unico}')
-        
-        # Enviar notificación WebSocket
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'pedidos_cliente_{pedido.cliente.id}',
-            {
-                'type': 'pedido_actualizado',
-                'pedido_id': pedido.id,
-                'estado': pedido.estado,
-                'codigo_unico': pedido.codigo_unico
-            }
-        )
     
     return redirect('admin_pedidos')
 
 
+@personal_requerido('Admin', mensaje='Solo el Admin puede eliminar pedidos', redireccion='admin_pedidos')
 def admin_eliminar_pedido(request, pedido_id):
     """Vista para eliminar un pedido"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin puede eliminar pedidos
-    if usuario.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Solo el Admin puede eliminar pedidos')
-        return redirect('admin_pedidos')
-    
     pedido = get_object_or_404(Pedido, id=pedido_id)
     codigo = pedido.codigo_unico
-    pedido.delete()
+    
+    with transaction.atomic():
+        if pedido.estado == 'ENTREGADO':
+            revertir_venta(pedido)
+        pedido.delete()
     
     messages.success(request, f'Pedido {codigo} eliminado exitosamente')
     return redirect('admin_pedidos')
 
 
+@personal_requerido('Admin', 'Cajeros', mensaje='No tienes permiso para ver reportes')
 def admin_reportes_ventas(request):
     """Vista para generar reportes de ventas"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Cajeros pueden ver reportes
-    if usuario.rol.nombre_rol not in ['Admin', 'Cajeros']:
-        messages.error(request, 'No tienes permiso para ver reportes')
-        return redirect('admin_dashboard')
+    usuario = request.personal
     
     # Filtros de fecha
     fecha_inicio = request.GET.get('fecha_inicio', '')
     fecha_fin = request.GET.get('fecha_fin', '')
     
+    cursor = request.GET.get('cursor', '')
+    
     # Pedidos entregados
-    from django.db.models import Sum, Count
     ventas = Pedido.objects.filter(estado='ENTREGADO').select_related(
         'cliente', 'repartidor'
-    ).prefetch_related('detalles__producto').order_by('-fecha_entrega')
-    
-    if fecha_inicio:
-        ventas = ventas.filter(fecha_entrega__date__gte=fecha_inicio)
-    if fecha_fin:
-        ventas = ventas.filter(fecha_entrega__date__lte=fecha_fin)
-    
-    # Calcular totales
-    total_ventas = ventas.aggregate(Sum('total_venta'))['total_venta__sum'] or 0
-    cantidad_pedidos = ventas.count()
+    ).prefetch_related('detalles__producto')
+    
+    # Rango semiabierto sobre fecha_entrega (usa el índice de entregados)
+    desde, hasta = rango_desde_texto(fecha_inicio, fecha_fin)
+    if desde:
+        ventas = ventas.filter(fecha_entrega__gte=desde)
+    if hasta:
+        ventas = ventas.filter(fecha_entrega__lt=hasta)
+    
+    # El detalle se muestra por páginas; los totales salen del resumen diario
+    ventas, siguiente_cursor = paginar_por_cursor(
+        ventas, cursor=cursor, por_pagina=settings.PEDIDOS_POR_PAGINA, campo_fecha='fecha_entrega'
+    )
+    
+    # Los mismos días del rango (fechas inválidas ya se descartaron), para el resumen diario
+    dia_inicio, dia_fin = dias_del_rango(desde, hasta)
+    total_ventas, cantidad_pedidos = totales_ventas(dia_inicio, dia_fin)
+    
+    ventas_por_dia = VentaDiaria.objects.all()
+    if dia_inicio:
+        ventas_por_dia = ventas_por_dia.filter(fecha__gte=dia_inicio)
+    if dia_fin:
+        ventas_por_dia = ventas_por_dia.filter(fecha__lte=dia_fin)
     
     context = {
         'usuario': usuario,
         'ventas': ventas,
         'total_ventas': total_ventas,
         'cantidad_pedidos': cantidad_pedidos,
+        'ventas_por_dia': ventas_por_dia[:31],
         'fecha_inicio': fecha_inicio,
         'fecha_fin': fecha_fin,
+        'cursor': cursor,
+        'siguiente_cursor': siguiente_cursor,
     }
     
     return render(request, 'core/admin/reportes_ventas.html', context)
 
 
-def admin_reportes_ventas(request):
-    """Vista para generar reportes de ventas"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Cajeros pueden ver reportes
-    if usuario.rol.nombre_rol not in ['Admin', 'Cajeros']:
-        messages.error(request, 'No tienes permiso para ver reportes')
-        return redirect('admin_dashboard')
-    
-    # Filtros de fecha
+@personal_requerido('Admin', 'Cajeros', mensaje='No tienes permiso para ver reportes')
+def admin_exportar_ventas(request):
+    """
+    Exporta las ventas entregadas a CSV (se abre en Excel).
+    Acepta los mismos filtros fecha_inicio/fecha_fin que el reporte y
+    ?detalle=1 para una fila por producto. La respuesta se genera por
+    bloques, sin cargar todos los pedidos en memoria.
+    """
     fecha_inicio = request.GET.get('fecha_inicio', '')
     fecha_fin = request.GET.get('fecha_fin', '')
-    
-    # Pedidos entregados
-    ventas = Pedido.objects.filter(estado='ENTREGADO').select_related(
-        'cliente', 'repartidor'
-    ).prefetch_related('detalles__producto').order_by('-fecha_entrega')
-    
-    if fecha_inicio:
-        ventas = ventas.filter(fecha_entrega__date__gte=fecha_inicio)
-    if fecha_fin:
-        ventas = ventas.filter(fecha_entrega__date__lte=fecha_fin)
-    
-    # Calcular totales
-    from django.db.models import Sum, Count
-    total_ventas = ventas.aggregate(Sum('total_venta'))['total_venta__sum'] or 0
-    cantidad_pedidos = ventas.count()
-    
-    context = {
-        'usuario': usuario,
-        'ventas': ventas,
-        'total_ventas': total_ventas,
-        'cantidad_pedidos': cantidad_pedidos,
-        'fecha_inicio': fecha_inicio,
-        'fecha_fin': fecha_fin,
-    }
-    
-    return render(request, 'core/admin/reportes_ventas.html', context)
+    detalle = request.GET.get('detalle') == '1'
+    desde, hasta = rango_desde_texto(fecha_inicio, fecha_fin)
+    
+    # El nombre del archivo sale de las fechas ya validadas, no del texto recibido
+    nombre = 'ventas_detalle' if detalle else 'ventas'
+    dia_inicio, dia_fin = dias_del_rango(desde, hasta)
+    if dia_inicio or dia_fin:
+        nombre += f"_{dia_inicio or 'inicio'}_{dia_fin or 'hoy'}"
+    
+    # Generador asíncrono: bajo ASGI se envía bloque a bloque (ver core/services/exportacion.py)
+    response = StreamingHttpResponse(
+        generar_csv_ventas(desde, hasta, detalle=detalle),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.csv"'
+    return response
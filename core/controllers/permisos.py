@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Controllers: Permisos del personal
+Decorador que exige sesión de personal y declara los roles de cada vista.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.http import JsonResponse
+from django.shortcuts import redirect
+from core.services.personal import obtener_personal
+
+CLAVES_SESION_PERSONAL = ['usuario_id', 'usuario_nombre', 'usuario_rol']
+
+
+def personal_requerido(*roles, mensaje='Acceso denegado', redireccion='admin_dashboard', json=False):
+    """
+    Exige un usuario del personal en sesión y, si se indican, uno de los `roles`.
+    El usuario resuelto (con su rol) queda en request.personal.
+
+    Uso:
+        @personal_requerido('Admin', 'Encargados')
+        def admin_productos(request): ...
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            usuario = None
+            if 'usuario_id' in request.session:
+                usuario = obtener_personal(request.session['usuario_id'])
+                if usuario is None:
+                    # El usuario fue eliminado: cerrar su sesión de personal
+                    for clave in CLAVES_SESION_PERSONAL:
+                        request.session.pop(clave, None)
+
+            if usuario is None:
+                if json:
+                    return JsonResponse({'error': 'No autenticado'}, status=401)
+                return redirect('admin_login')
+
+            if roles and usuario.rol.nombre_rol not in roles:
+                if json:
+                    return JsonResponse({'error': mensaje}, status=403)
+                messages.error(request, mensaje)
+                return redirect(redireccion)
+
+            request.personal = usuario
+            return vista(request, *args, **kwargs)
+        return envoltura
+    return decorador
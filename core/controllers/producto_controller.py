@@ -5,20 +5,14 @@ Vistas para gestión de productos del restaurante.
 """
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
-from core.models import Usuario, Categoria, Producto
+from core.models import Categoria, Producto
+from core.controllers.permisos import personal_requerido
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_productos(request):
     """Vista para gestionar productos"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Encargados pueden gestionar productos
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
+    usuario = request.personal
     
     productos = Producto.objects.filter(eliminado=False).select_related('categoria').order_by('-fecha_creacion')
     categorias = Categoria.objects.filter(activo=True).order_by('nombre')
@@ -32,17 +26,9 @@ def admin_productos(request):
     return render(request, 'core/admin/productos.html', context)
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_crear_producto(request):
     """Vista para crear un nuevo producto"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         nombre = request.POST.get('nombre')
         descripcion = request.POST.get('descripcion')
@@ -73,17 +59,9 @@ def admin_crear_producto(request):
     return redirect('admin_productos')
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_editar_producto(request, producto_id):
     """Vista para editar un producto"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         producto = get_object_or_404(Producto, id=producto_id)
         
@@ -109,17 +87,9 @@ def admin_editar_producto(request, producto_id):
     return redirect('admin_productos')
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_eliminar_producto(request, producto_id):
     """Vista para eliminar un producto (soft delete)"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     producto = get_object_or_404(Producto, id=producto_id)
     nombre = producto.nombre
     
@@ -132,11 +102,9 @@ def admin_eliminar_producto(request, producto_id):
     return redirect('admin_productos')
 
 
+@personal_requerido()
 def admin_toggle_producto(request, producto_id):
     """Vista para activar/desactivar un producto"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
     producto = get_object_or_404(Producto, id=producto_id)
     producto.activo = not producto.activo
     producto.save()
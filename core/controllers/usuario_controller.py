@@ -7,19 +7,13 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth.hashers import make_password
 from core.models import Usuario, Rol
+from core.controllers.permisos import personal_requerido
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_usuarios(request):
     """Vista para gestionar usuarios del personal"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Encargados pueden gestionar usuarios
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
+    usuario = request.personal
     
     usuarios = Usuario.objects.select_related('rol').all().order_by('rol__nombre_rol', 'nombre')
     roles = Rol.objects.all()
@@ -33,18 +27,9 @@ def admin_usuarios(request):
     return render(request, 'core/admin/usuarios.html', context)
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_crear_usuario(request):
     """Vista para crear un nuevo usuario del personal"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Encargados pueden crear usuarios
-    if usuario.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         nombre = request.POST.get('nombre')
         email = request.POST.get('email')
@@ -72,18 +57,9 @@ def admin_crear_usuario(request):
     return redirect('admin_usuarios')
 
 
+@personal_requerido('Admin', 'Encargados')
 def admin_editar_usuario(request, usuario_id):
     """Vista para editar un usuario del personal"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario_actual = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin y Encargados pueden editar usuarios
-    if usuario_actual.rol.nombre_rol not in ['Admin', 'Encargados']:
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
-    
     if request.method == 'POST':
         usuario_editar = get_object_or_404(Usuario, id=usuario_id)
         
@@ -107,23 +83,21 @@ def admin_editar_usuario(request, usuario_id):
         
         usuario_editar.save()
         
+        # El snapshot en cache lo invalidan las señales; la sesión propia se actualiza aquí
+        if usuario_editar.id == request.personal.id:
+            request.session['usuario_nombre'] = usuario_editar.nombre
+            request.session['usuario_rol'] = usuario_editar.rol.nombre_rol
+        
         messages.success(request, f'Usuario {usuario_editar.nombre} actualizado exitosamente')
         return redirect('admin_usuarios')
     
     return redirect('admin_usuarios')
 
 
+@personal_requerido('Admin')
 def admin_eliminar_usuario(request, usuario_id):
     """Vista para eliminar un usuario del personal"""
-    if 'usuario_id' not in request.session:
-        return redirect('admin_login')
-    
-    usuario_actual = Usuario.objects.select_related('rol').get(id=request.session['usuario_id'])
-    
-    # Solo Admin puede eliminar usuarios
-    if usuario_actual.rol.nombre_rol != 'Admin':
-        messages.error(request, 'Acceso denegado')
-        return redirect('admin_dashboard')
+    usuario_actual = request.personal
     
     # No puede eliminarse a sí mismo
     if usuario_actual.id == usuario_id:
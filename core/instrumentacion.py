@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Instrumentación por petición
+Acumula el tiempo de base de datos, plantillas y encolado de notificaciones
+(el INSERT en la bandeja de salida, no su envío) de la petición en curso. La activa InstrumentacionMiddleware (core/middleware.py)
+solo en las peticiones muestreadas; fuera de ellas medir() no hace nada.
+"""
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from django.template.backends.django import DjangoTemplates, Template
+
+_medicion_actual = ContextVar('medicion_actual', default=None)
+
+
+class Medicion:
+    """Tiempos (en segundos) y consultas SQL de una petición"""
+
+    def __init__(self):
+        self.inicio = perf_counter()
+        self.tiempos = defaultdict(float)
+        self.consultas = 0
+
+    def envolver_sql(self, execute, sql, params, many, context):
+        """Para connection.execute_wrapper: cronometra cada consulta"""
+        inicio = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.tiempos['bd'] += perf_counter() - inicio
+            self.consultas += 1
+
+    def total(self):
+        return perf_counter() - self.inicio
+
+
+@contextmanager
+def activar(medicion):
+    """Hace de `medicion` la medición de la petición en curso"""
+    token = _medicion_actual.set(medicion)
+    try:
+        yield medicion
+    finally:
+        _medicion_actual.reset(token)
+
+
+@contextmanager
+def medir(nombre):
+    """Suma la duración del bloque a `nombre` si la petición está siendo medida"""
+    medicion = _medicion_actual.get()
+    if medicion is None:
+        yield
+        return
+    inicio = perf_counter()
+    try:
+        yield
+    finally:
+        medicion.tiempos[nombre] += perf_counter() - inicio
+
+
+class PlantillaMedida(Template):
+    """Plantilla cuyo render (incluidos los context processors) se mide como 'plantillas'"""
+
+    def render(self, context=None, request=None):
+        with medir('plantillas'):
+            return super().render(context, request)
+
+
+class DjangoTemplatesMedidos(DjangoTemplates):
+    """Backend de plantillas de Django que devuelve plantillas medidas"""
+
+    def get_template(self, template_name):
+        return PlantillaMedida(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return PlantillaMedida(super().from_string(template_code).template, self)
@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+"""
+Comando: benchmark_pedidos
+Mide las vistas del ciclo de vida del pedido (menú, carrito, checkout,
+tablero y cambio de estado) sobre datos generados de distintos tamaños.
+
+Trabaja en una base de datos de prueba creada para la ocasión (como
+`manage.py test`), nunca sobre la base de datos real. Funciona con SQLite
+o PostgreSQL local y con el channel layer en memoria.
+
+Uso:
+    python manage.py benchmark_pedidos
+    python manage.py benchmark_pedidos --pedidos 1000 10000 50000 --repeticiones 50
+    python manage.py benchmark_pedidos --json resultados.json
+"""
+import json
+import statistics
+import tracemalloc
+import uuid
+from time import perf_counter
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import (
+    CaptureQueriesContext, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+
+from core.models import Carrito, DetalleCarrito, Pedido, DetallePedido
+from core.services.datos_prueba import generar_datos
+from core.services.menu import invalidar_menu
+
+AJUSTES_BENCHMARK = {
+    'CHANNEL_LAYERS': {'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+    # Sin collectstatic: {% static %} no necesita el manifest
+    'STORAGES': {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = 'Mide consultas, latencia (p50/p95) y memoria pico de las vistas principales'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clientes', type=int, default=200, help='Clientes generados (N)')
+        parser.add_argument('--productos', type=int, default=60, help='Productos generados (M)')
+        parser.add_argument(
+            '--pedidos', type=int, nargs='+', default=[1000, 10000],
+            help='Pedidos históricos (K); varios valores miden cómo escala',
+        )
+        parser.add_argument('--repeticiones', type=int, default=30, help='Peticiones medidas por vista')
+        parser.add_argument('--semilla', type=int, default=0, help='Semilla del generador de datos')
+        parser.add_argument('--json', dest='salida_json', help='Guarda los resultados en un archivo JSON')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 2:
+            raise CommandError('--repeticiones debe ser al menos 2')
+
+        setup_test_environment()
+        config_bd = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        resultados = []
+        try:
+            with override_settings(**AJUSTES_BENCHMARK):
+                for pedidos in options['pedidos']:
+                    resultados += self._medir_escala(options, pedidos)
+        finally:
+            teardown_databases(config_bd, verbosity=0)
+            teardown_test_environment()
+
+        if options['salida_json']:
+            with open(options['salida_json'], 'w', encoding='utf-8') as archivo:
+                json.dump(resultados, archivo, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"✓ Resultados guardados en {options['salida_json']}"))
+
+    def _medir_escala(self, options, pedidos):
+        call_command('flush', interactive=False, verbosity=0)
+        cache.clear()
+
+        inicio = perf_counter()
+        datos = generar_datos(
+            clientes=options['clientes'], productos=options['productos'],
+            pedidos=pedidos, semilla=options['semilla'],
+        )
+        self.stdout.write(
+            f"\n{options['clientes']} clientes, {options['productos']} productos, {pedidos} pedidos "
+            f"(generados en {perf_counter() - inicio:.1f} s)"
+        )
+
+        escenarios = self._escenarios(datos)
+        self.stdout.write(f"{'Vista':<32}{'Consultas':>10}{'p50 ms':>10}{'p95 ms':>10}{'Memoria KB':>12}")
+
+        resultados = []
+        for nombre, preparar, peticion in escenarios:
+            medicion = self._medir(nombre, preparar, peticion, options['repeticiones'])
+            medicion.update({
+                'clientes': options['clientes'], 'productos': options['productos'], 'pedidos': pedidos,
+            })
+            resultados.append(medicion)
+            self.stdout.write(
+                f"{nombre:<32}{medicion['consultas']:>10}{medicion['p50_ms']:>10.2f}"
+                f"{medicion['p95_ms']:>10.2f}{medicion['memoria_kb']:>12.1f}"
+            )
+        return resultados
+
+    def _medir(self, nombre, preparar, peticion, repeticiones):
+        """Ejecuta la petición `repeticiones` veces y una más bajo tracemalloc"""
+        tiempos, consultas = [], []
+        for _ in range(repeticiones + 1):
+            argumento = preparar()
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = perf_counter()
+                respuesta = peticion(argumento)
+                tiempos.append((perf_counter() - inicio) * 1000)
+            self._verificar(nombre, respuesta)
+            consultas.append(len(capturadas))
+
+        # La primera petición calienta caches y sesiones: no cuenta para la latencia
+        tiempos, consultas = tiempos[1:], consultas[1:]
+
+        argumento = preparar()
+        tracemalloc.start()
+        try:
+            peticion(argumento)
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        percentiles = statistics.quantiles(tiempos, n=20, method='inclusive')
+        return {
+            'vista': nombre,
+            'consultas': max(consultas),
+            'p50_ms': round(percentiles[9], 3),
+            'p95_ms': round(percentiles[18], 3),
+            'memoria_kb': round(pico / 1024, 1),
+        }
+
+    def _verificar(self, nombre, respuesta):
+        if respuesta.status_code >= 400 or 'login' in respuesta.get('Location', ''):
+            raise CommandError(f'{nombre}: respuesta inesperada {respuesta.status_code} {respuesta.get("Location", "")}')
+
+    def _escenarios(self, datos):
+        """(nombre, preparar, peticion): preparar no se mide y su resultado se pasa a peticion"""
+        anonimo = Client()
+        cliente = self._sesion({'cliente_id': datos['clientes'][0].id, 'cliente_nombre': datos['clientes'][0].nombre})
+        # El checkout usa otro cliente para no mezclar su carrito con el de agregar_al_carrito
+        comprador = self._sesion({'cliente_id': datos['clientes'][1].id, 'cliente_nombre': datos['clientes'][1].nombre})
+        admin = datos['usuarios']['Admin']
+        personal = self._sesion({'usuario_id': admin.id, 'usuario_nombre': admin.nombre, 'usuario_rol': 'Admin'})
+        productos = datos['productos']
+
+        def nada():
+            return None
+
+        def llenar_carrito():
+            carrito, _ = Carrito.objects.get_or_create(cliente_id=datos['clientes'][1].id, activo=True)
+            DetalleCarrito.objects.bulk_create([
+                DetalleCarrito(carrito=carrito, producto=producto, cantidad=2) for producto in productos[:3]
+            ])
+            return uuid.uuid4().hex
+
+        def pedido_recibido():
+            pedido = Pedido.objects.create(cliente=datos['clientes'][2], total_venta=productos[0].precio)
+            DetallePedido.objects.create(
+                pedido=pedido, producto=productos[0], producto_nombre=productos[0].nombre,
+                cantidad=1, precio_unitario=productos[0].precio,
+            )
+            return pedido.id
+
+        return [
+            ('index', nada, lambda _: anonimo.get('/')),
+            ('index (menú sin cache)', invalidar_menu, lambda _: anonimo.get('/')),
+            ('agregar_al_carrito', nada,
+             lambda _: cliente.post(f'/agregar-carrito/{productos[0].id}/', {'cantidad': 1})),
+            ('finalizar_compra', llenar_carrito,
+             lambda clave: comprador.post('/finalizar-compra/', {'clave_idempotencia': clave})),
+            ('admin_pedidos', nada, lambda _: personal.get('/admin/pedidos/')),
+            ('admin_cambiar_estado_pedido', pedido_recibido,
+             lambda pedido_id: personal.post(
+                 f'/admin/pedidos/{pedido_id}/cambiar-estado/', {'estado': 'EN_PREPARACION'})),
+        ]
+
+    def _sesion(self, valores):
+        """Cliente HTTP con una sesión ya iniciada (sin pasar por el login)"""
+        cliente = Client()
+        sesion = cliente.session
+        sesion.update(valores)
+        sesion.save()
+        return cliente
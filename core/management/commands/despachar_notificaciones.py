@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Comando: despachar_notificaciones
+Publica en el channel layer los eventos de la bandeja de salida.
+Se usa con NOTIFICACIONES_DESPACHADOR=comando, como proceso aparte del servidor web.
+
+Uso:
+    python manage.py despachar_notificaciones
+    python manage.py despachar_notificaciones --una-vez
+"""
+import asyncio
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from core.services.notificaciones import despachador
+
+
+class Command(BaseCommand):
+    help = 'Publica las notificaciones WebSocket pendientes (bandeja de salida)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--una-vez', action='store_true',
+            help='Vacía la bandeja y termina en lugar de quedarse escuchando',
+        )
+
+    def handle(self, *args, **options):
+        if 'InMemoryChannelLayer' in settings.CHANNEL_LAYERS['default']['BACKEND']:
+            self.stdout.write(self.style.WARNING(
+                '⚠ El channel layer en memoria no se comparte entre procesos: '
+                'los WebSockets del servidor no recibirán estos eventos. Configura REDIS_URL.'
+            ))
+
+        if options['una_vez']:
+            enviados = asyncio.run(despachador.despachar_pendientes())
+            self.stdout.write(self.style.SUCCESS(f'✓ {enviados} notificación(es) procesada(s)'))
+            return
+
+        self.stdout.write('Despachando notificaciones (Ctrl+C para salir)...')
+        try:
+            asyncio.run(despachador.ejecutar())
+        except KeyboardInterrupt:
+            pass
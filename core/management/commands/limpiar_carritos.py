@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Comando: limpiar_carritos
+Borra por lotes los carritos ya convertidos en pedido y los abandonados
+(activos desde hace más de CARRITO_DIAS_ABANDONO días). Pensado para
+ejecutarse periódicamente (cron o tarea programada).
+
+Uso:
+    python manage.py limpiar_carritos
+    python manage.py limpiar_carritos --dias 15 --lote 500
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from core.services.carrito import limpiar_carritos
+
+
+class Command(BaseCommand):
+    help = 'Borra los carritos inactivos y los abandonados, por lotes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=settings.CARRITO_DIAS_ABANDONO,
+            help='Días sin actividad tras los que un carrito activo se considera abandonado',
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Carritos borrados por transacción')
+
+    def handle(self, *args, **options):
+        if options['dias'] < 1 or options['lote'] < 1:
+            raise CommandError('--dias y --lote deben ser mayores que 0')
+
+        carritos, lineas = limpiar_carritos(options['dias'], options['lote'])
+        self.stdout.write(self.style.SUCCESS(f'✓ {carritos} carrito(s) y {lineas} línea(s) borrados'))
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Comando: reconstruir_ventas_diarias
+Recalcula el resumen diario de ventas (VentaDiaria y desgloses) desde los pedidos.
+
+Uso:
+    python manage.py reconstruir_ventas_diarias
+    python manage.py reconstruir_ventas_diarias --desde 2026-01-01 --hasta 2026-01-31
+"""
+from django.core.management.base import BaseCommand, CommandError
+from core.services.fechas import fecha_desde_texto
+from core.services.ventas import reconstruir_ventas
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el resumen diario de ventas a partir de los pedidos entregados'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a reconstruir (YYYY-MM-DD)')
+        parser.add_argument('--hasta', help='Último día a reconstruir (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        desde = self._fecha(options['desde'], '--desde')
+        hasta = self._fecha(options['hasta'], '--hasta')
+
+        dias = reconstruir_ventas(desde, hasta)
+        self.stdout.write(self.style.SUCCESS(f'✓ Resumen de ventas reconstruido: {dias} día(s) con ventas'))
+
+    def _fecha(self, valor, opcion):
+        if not valor:
+            return None
+        fecha = fecha_desde_texto(valor)
+        if fecha is None:
+            raise CommandError(f'{opcion} debe ser una fecha válida con el formato YYYY-MM-DD')
+        return fecha
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Middleware del proyecto
+"""
+import json
+import logging
+import random
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+from core.instrumentacion import Medicion, activar
+from core.services.notificaciones import despachador
+
+logger = logging.getLogger('core.instrumentacion')
+
+
+class DespachadorNotificacionesMiddleware:
+    """
+    Middleware ASGI que arranca el despachador de notificaciones dentro del
+    event loop del servidor. Atiende el protocolo lifespan cuando el servidor
+    lo usa; Daphne no lo envía, así que también arranca con la primera conexión.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _en_proceso(self):
+        return settings.NOTIFICACIONES_DESPACHADOR == 'proceso'
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if self._en_proceso():
+            despachador.iniciar()
+        return await self.app(scope, receive, send)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            mensaje = await receive()
+            if mensaje['type'] == 'lifespan.startup':
+                if self._en_proceso():
+                    despachador.iniciar()
+                await send({'type': 'lifespan.startup.complete'})
+            elif mensaje['type'] == 'lifespan.shutdown':
+                await despachador.detener()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide una fracción de las peticiones (INSTRUMENTACION_MUESTREO, de 0 a 1):
+    tiempo y cantidad de consultas SQL, render de plantillas y encolado de
+    notificaciones en la bandeja de salida ('encolado'; el envío por group_send
+    ocurre después, en el despachador). Lo devuelve en la cabecera Server-Timing (visible en las
+    herramientas del navegador) y en una línea JSON del logger core.instrumentacion.
+    Con muestreo 0 (por defecto) Django lo descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        self.muestreo = settings.INSTRUMENTACION_MUESTREO
+        if self.muestreo <= 0:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if random.random() >= self.muestreo:
+            return self.get_response(request)
+
+        with activar(Medicion()) as medicion:
+            with connection.execute_wrapper(medicion.envolver_sql):
+                response = self.get_response(request)
+        total = medicion.total()
+
+        ms = {nombre: round(segundos * 1000, 2) for nombre, segundos in medicion.tiempos.items()}
+        metricas = [f'bd;dur={ms.get("bd", 0)};desc="{medicion.consultas} consultas"']
+        metricas += [f'{nombre};dur={duracion}' for nombre, duracion in ms.items() if nombre != 'bd']
+        metricas.append(f'total;dur={round(total * 1000, 2)}')
+        response['Server-Timing'] = ', '.join(metricas)
+
+        vista = request.resolver_match.view_name if request.resolver_match else None
+        logger.info(json.dumps({
+            'evento': 'peticion',
+            'metodo': request.method,
+            'ruta': request.path,
+            'vista': vista,
+            'estado': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'consultas': medicion.consultas,
+            **{f'{nombre}_ms': duracion for nombre, duracion in ms.items()},
+        }))
+        return response
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 18:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_alter_pedido_estado'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+    ]
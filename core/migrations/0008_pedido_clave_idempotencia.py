@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-17 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_pedido_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pedido',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0 on 2026-10-17 18:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_pedido_clave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', '-fecha_creacion', '-id'], name='pedido_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('estado__in', ['RECIBIDO', 'EN_PREPARACION', 'LISTO_ENTREGA', 'EN_CAMINO'])), fields=['-fecha_creacion', '-id'], name='pedido_activos_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['-fecha_creacion', '-id'], name='pedido_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(condition=models.Q(('estado', 'ENTREGADO')), fields=['-fecha_entrega'], name='pedido_entregado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['estado', 'repartidor'], name='pedido_estado_repart_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pedido',
+            index=models.Index(fields=['cliente', '-fecha_creacion'], name='pedido_cliente_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-17 18:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_pedido_indices'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VentaDiaria',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField(unique=True)),
+                ('cantidad_pedidos', models.PositiveIntegerField(default=0)),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria',
+                'verbose_name_plural': 'Ventas Diarias',
+                'db_table': 'ventas_diarias',
+                'ordering': ['-fecha'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaProducto',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('producto_nombre', models.CharField(max_length=100)),
+                ('cantidad', models.PositiveIntegerField(default=0)),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_diarias', to='core.producto')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria por Producto',
+                'verbose_name_plural': 'Ventas Diarias por Producto',
+                'db_table': 'ventas_diarias_producto',
+                'unique_together': {('fecha', 'producto_nombre')},
+            },
+        ),
+        migrations.CreateModel(
+            name='VentaDiariaRepartidor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateField()),
+                ('cantidad_pedidos', models.PositiveIntegerField(default=0)),
+                ('total_ventas', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('repartidor', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='ventas_diarias', to='core.usuario')),
+            ],
+            options={
+                'verbose_name': 'Venta Diaria por Repartidor',
+                'verbose_name_plural': 'Ventas Diarias por Repartidor',
+                'db_table': 'ventas_diarias_repartidor',
+                'unique_together': {('fecha', 'repartidor')},
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:59
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_ventas_diarias'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoNotificacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('grupo', models.CharField(max_length=100)),
+                ('evento', models.JSONField()),
+                ('estado', models.CharField(choices=[('PENDIENTE', 'Pendiente'), ('FALLIDO', 'Fallido')], default='PENDIENTE', max_length=20)),
+                ('intentos', models.PositiveIntegerField(default=0)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('disponible_desde', models.DateTimeField(default=django.utils.timezone.now)),
+                ('fecha_creacion', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Evento de Notificación',
+                'verbose_name_plural': 'Eventos de Notificación',
+                'db_table': 'notificaciones_pendientes',
+                'ordering': ['id'],
+                'indexes': [models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['disponible_desde', 'id'], name='notif_pendientes_idx')],
+            },
+        ),
+    ]
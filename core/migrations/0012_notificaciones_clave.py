@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_notificaciones_pendientes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='eventonotificacion',
+            name='clave',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddIndex(
+            model_name='eventonotificacion',
+            index=models.Index(condition=models.Q(('estado', 'PENDIENTE')), fields=['clave', 'id'], name='notif_pendientes_clave_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:22
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def desactivar_carritos_duplicados(apps, schema_editor):
+    """
+    Deja un solo carrito activo por cliente antes de crear el índice único.
+    Se conserva el de menor id, que es el que las vistas mostraban (.first());
+    los demás quedan inactivos y los borra limpiar_carritos.
+    """
+    Carrito = apps.get_model('core', 'Carrito')
+    duplicados = (
+        Carrito.objects.filter(activo=True)
+        .values('cliente_id')
+        .annotate(primero=Min('id'), total=Count('id'))
+        .filter(total__gt=1)
+    )
+    for fila in duplicados:
+        Carrito.objects.filter(cliente_id=fila['cliente_id'], activo=True).exclude(
+            id=fila['primero']
+        ).update(activo=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_notificaciones_clave'),
+    ]
+
+    operations = [
+        migrations.RunPython(desactivar_carritos_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='carrito',
+            constraint=models.UniqueConstraint(condition=models.Q(('activo', True)), fields=('cliente',), name='carrito_activo_unico'),
+        ),
+    ]
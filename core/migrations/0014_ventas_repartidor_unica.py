@@ -0,0 +1,87 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import TruncDate
+
+
+def reconstruir_resumen(apps, schema_editor):
+    """
+    Rehace el resumen diario una sola vez (antes lo hacía build.sh en cada
+    despliegue, en paralelo con los incrementos en vivo). También elimina
+    las filas duplicadas "sin repartidor" antes de crear los índices únicos.
+    Copia de core.services.ventas.reconstruir_ventas con los modelos
+    históricos, para que cambios futuros del servicio no alteren la migración.
+    """
+    Pedido = apps.get_model('core', 'Pedido')
+    DetallePedido = apps.get_model('core', 'DetallePedido')
+    VentaDiaria = apps.get_model('core', 'VentaDiaria')
+    VentaDiariaProducto = apps.get_model('core', 'VentaDiariaProducto')
+    VentaDiariaRepartidor = apps.get_model('core', 'VentaDiariaRepartidor')
+
+    entregados = Pedido.objects.filter(estado='ENTREGADO', fecha_entrega__isnull=False).annotate(
+        dia=TruncDate('fecha_entrega')
+    )
+    detalles = DetallePedido.objects.filter(
+        pedido__estado='ENTREGADO', pedido__fecha_entrega__isnull=False
+    ).annotate(dia=TruncDate('pedido__fecha_entrega'))
+
+    VentaDiaria.objects.all().delete()
+    VentaDiariaProducto.objects.all().delete()
+    VentaDiariaRepartidor.objects.all().delete()
+
+    VentaDiaria.objects.bulk_create([
+        VentaDiaria(fecha=fila['dia'], cantidad_pedidos=fila['pedidos'], total_ventas=fila['total'])
+        for fila in entregados.values('dia').annotate(pedidos=Count('id'), total=Sum('total_venta')).order_by('dia')
+    ])
+
+    VentaDiariaRepartidor.objects.bulk_create([
+        VentaDiariaRepartidor(
+            fecha=fila['dia'], repartidor_id=fila['repartidor_id'],
+            cantidad_pedidos=fila['pedidos'], total_ventas=fila['total']
+        )
+        for fila in entregados.values('dia', 'repartidor_id').annotate(
+            pedidos=Count('id'), total=Sum('total_venta')
+        ).order_by('dia')
+    ])
+
+    VentaDiariaProducto.objects.bulk_create([
+        VentaDiariaProducto(
+            fecha=fila['dia'], producto_id=fila['producto_ref'], producto_nombre=fila['producto_nombre'],
+            cantidad=fila['unidades'], total_ventas=fila['importe']
+        )
+        for fila in detalles.values('dia', 'producto_nombre').annotate(
+            unidades=Sum('cantidad'),
+            importe=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            producto_ref=Max('producto_id'),
+        ).order_by('dia')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_carrito_activo_unico'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='ventadiariarepartidor',
+            unique_together=set(),
+        ),
+        migrations.AlterField(
+            model_name='ventadiariarepartidor',
+            name='repartidor',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventas_diarias', to='core.usuario'),
+        ),
+        migrations.RunPython(reconstruir_resumen, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ventadiariarepartidor',
+            constraint=models.UniqueConstraint(condition=models.Q(('repartidor__isnull', False)), fields=('fecha', 'repartidor'), name='venta_repartidor_unica'),
+        ),
+        migrations.AddConstraint(
+            model_name='ventadiariarepartidor',
+            constraint=models.UniqueConstraint(condition=models.Q(('repartidor__isnull', True)), fields=('fecha',), name='venta_sin_repartidor_unica'),
+        ),
+    ]
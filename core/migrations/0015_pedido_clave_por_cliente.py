@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_ventas_repartidor_unica'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='pedido',
+            name='clave_idempotencia',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='pedido',
+            constraint=models.UniqueConstraint(fields=('cliente', 'clave_idempotencia'), name='pedido_cliente_clave_unica'),
+        ),
+    ]
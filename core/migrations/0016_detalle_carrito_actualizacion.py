@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 19:35
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_pedido_clave_por_cliente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='detallecarrito',
+            name='fecha_actualizacion',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
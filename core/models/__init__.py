@@ -11,6 +11,8 @@ from .categoria import Categoria
 from .producto import Producto
 from .carrito import Carrito, DetalleCarrito
 from .pedido import Pedido, DetallePedido
+from .venta_diaria import VentaDiaria, VentaDiariaProducto, VentaDiariaRepartidor
+from .notificacion import EventoNotificacion
 
 __all__ = [
     'Rol',
@@ -22,4 +24,8 @@ __all__ = [
     'DetalleCarrito',
     'Pedido',
     'DetallePedido',
+    'VentaDiaria',
+    'VentaDiariaProducto',
+    'VentaDiariaRepartidor',
+    'EventoNotificacion',
 ]
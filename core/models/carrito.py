@@ -22,6 +22,13 @@ class Carrito(models.Model):
         db_table = 'carrito'
         verbose_name = 'Carrito'
         verbose_name_plural = 'Carritos'
+        constraints = [
+            # Un solo carrito activo por cliente: el índice parcial también
+            # resuelve la búsqueda filter(cliente=..., activo=True) en una consulta
+            models.UniqueConstraint(
+                fields=['cliente'], condition=models.Q(activo=True), name='carrito_activo_unico'
+            ),
+        ]
 
     def __str__(self):
         return f"Carrito de {self.cliente.nombre}"
@@ -37,6 +44,8 @@ class DetalleCarrito(models.Model):
     carrito = models.ForeignKey(Carrito, on_delete=models.CASCADE, related_name='detalles')
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE, related_name='en_carritos')
     cantidad = models.PositiveIntegerField(default=1)
+    # Última modificación de la línea: marca la actividad del carrito para la limpieza
+    fecha_actualizacion = models.DateTimeField(default=timezone.now)
 
     class Meta:
         db_table = 'detalle_carrito'
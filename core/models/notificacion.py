@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""
+Modelo: EventoNotificacion
+Bandeja de salida (outbox) de notificaciones WebSocket.
+Los controllers guardan el evento en la misma transacción que el cambio del
+pedido y el despachador de core/services/notificaciones.py lo publica en el
+channel layer fuera del ciclo de la petición HTTP.
+"""
+from django.db import models
+from django.utils import timezone
+
+
+class EventoNotificacion(models.Model):
+    """
+    Evento pendiente de enviar a un grupo del channel layer.
+    Al enviarse se elimina; los que agotan sus reintentos quedan como FALLIDO.
+    """
+    PENDIENTE = 'PENDIENTE'
+    FALLIDO = 'FALLIDO'
+    ESTADOS = [
+        (PENDIENTE, 'Pendiente'),
+        (FALLIDO, 'Fallido'),
+    ]
+
+    grupo = models.CharField(max_length=100)
+    evento = models.JSONField()
+    # grupo:tipo:pedido_id; un evento más nuevo con la misma clave reemplaza
+    # al pendiente (ver NOTIFICACIONES_VENTANA)
+    clave = models.CharField(max_length=150, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default=PENDIENTE)
+    intentos = models.PositiveIntegerField(default=0)
+    ultimo_error = models.TextField(blank=True)
+    disponible_desde = models.DateTimeField(default=timezone.now)
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'notificaciones_pendientes'
+        verbose_name = 'Evento de Notificación'
+        verbose_name_plural = 'Eventos de Notificación'
+        ordering = ['id']
+        indexes = [
+            # Lote del despachador: pendientes listos, en orden de llegada
+            models.Index(
+                fields=['disponible_desde', 'id'],
+                name='notif_pendientes_idx',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+            # Último pendiente de cada clave, para combinar eventos del mismo pedido
+            models.Index(
+                fields=['clave', 'id'],
+                name='notif_pendientes_clave_idx',
+                condition=models.Q(estado='PENDIENTE'),
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.grupo} - {self.evento.get('type')} ({self.estado})"
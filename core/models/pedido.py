@@ -39,6 +39,9 @@ class Pedido(models.Model):
         ('NO_ENTREGADO', 'No entregado'),
     ]
 
+    # Estados que aún requieren atención del personal (tablero de pedidos)
+    ESTADOS_ACTIVOS = ['RECIBIDO', 'EN_PREPARACION', 'LISTO_ENTREGA', 'EN_CAMINO']
+
     codigo_unico = models.CharField(max_length=50, unique=True, editable=False)
     cliente = models.ForeignKey(Cliente, on_delete=models.PROTECT, related_name='pedidos')
     repartidor = models.ForeignKey(
@@ -53,12 +56,42 @@ class Pedido(models.Model):
     fecha_creacion = models.DateTimeField(default=timezone.now)
     fecha_entrega = models.DateTimeField(null=True, blank=True)
     total_venta = models.DecimalField(max_digits=10, decimal_places=2)
+    # Se incrementa en cada cambio para que los clientes descarten snapshots viejos
+    version = models.PositiveIntegerField(default=1)
+    # Clave enviada por el formulario de checkout: un POST reintentado devuelve el mismo pedido.
+    # Es única por cliente (la cabecera Idempotency-Key la elige quien llama)
+    clave_idempotencia = models.CharField(max_length=64, null=True, blank=True, editable=False)
 
     class Meta:
         db_table = 'pedidos'
         verbose_name = 'Pedido'
         verbose_name_plural = 'Pedidos'
         ordering = ['-fecha_creacion']
+        indexes = [
+            # Tablero y dashboard: filtro por estado, orden por fecha (keyset con id)
+            models.Index(fields=['estado', '-fecha_creacion', '-id'], name='pedido_estado_fecha_idx'),
+            # Ventana por defecto del tablero: solo pedidos activos
+            models.Index(
+                fields=['-fecha_creacion', '-id'],
+                name='pedido_activos_fecha_idx',
+                condition=models.Q(estado__in=['RECIBIDO', 'EN_PREPARACION', 'LISTO_ENTREGA', 'EN_CAMINO']),
+            ),
+            # Historial completo, pedidos de hoy y pedidos recientes
+            models.Index(fields=['-fecha_creacion', '-id'], name='pedido_fecha_idx'),
+            # Reportes de ventas: entregados por rango de fecha de entrega
+            models.Index(
+                fields=['-fecha_entrega'],
+                name='pedido_entregado_fecha_idx',
+                condition=models.Q(estado='ENTREGADO'),
+            ),
+            # Mis entregas: (estado, repartidor)
+            models.Index(fields=['estado', 'repartidor'], name='pedido_estado_repart_idx'),
+            # Mis pedidos del cliente, más recientes primero
+            models.Index(fields=['cliente', '-fecha_creacion'], name='pedido_cliente_fecha_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'clave_idempotencia'], name='pedido_cliente_clave_unica'),
+        ]
 
     def save(self, *args, **kwargs):
         # Generar código único si no existe
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Modelos: VentaDiaria, VentaDiariaProducto y VentaDiariaRepartidor
+Resumen precalculado de ventas entregadas por día, para que reportes y
+dashboard no tengan que recorrer todos los pedidos.
+Se mantienen en core/services/ventas.py y se reconstruyen con
+`python manage.py reconstruir_ventas_diarias`.
+"""
+from django.db import models
+from .producto import Producto
+from .usuario import Usuario
+
+
+class VentaDiaria(models.Model):
+    """
+    Totales de pedidos ENTREGADOS por día (según fecha_entrega).
+    """
+    fecha = models.DateField(unique=True)
+    cantidad_pedidos = models.PositiveIntegerField(default=0)
+    total_ventas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'ventas_diarias'
+        verbose_name = 'Venta Diaria'
+        verbose_name_plural = 'Ventas Diarias'
+        ordering = ['-fecha']
+
+    def __str__(self):
+        return f"{self.fecha}: {self.cantidad_pedidos} pedidos - S/ {self.total_ventas}"
+
+
+class VentaDiariaProducto(models.Model):
+    """
+    Unidades vendidas e ingresos por producto y día.
+    Se agrupa por producto_nombre (histórico), igual que DetallePedido.
+    """
+    fecha = models.DateField()
+    producto = models.ForeignKey(Producto, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas_diarias')
+    producto_nombre = models.CharField(max_length=100)
+    cantidad = models.PositiveIntegerField(default=0)
+    total_ventas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'ventas_diarias_producto'
+        verbose_name = 'Venta Diaria por Producto'
+        verbose_name_plural = 'Ventas Diarias por Producto'
+        unique_together = ['fecha', 'producto_nombre']
+
+    def __str__(self):
+        return f"{self.fecha}: {self.cantidad}x {self.producto_nombre}"
+
+
+class VentaDiariaRepartidor(models.Model):
+    """
+    Pedidos entregados e ingresos por repartidor y día.
+    repartidor NULL agrupa las entregas sin repartidor asignado (igual que
+    Pedido.repartidor, que queda en NULL al eliminar al repartidor; sus filas
+    se suman antes a las de NULL, ver core/signals.py).
+    """
+    fecha = models.DateField()
+    repartidor = models.ForeignKey(Usuario, on_delete=models.SET_NULL, null=True, blank=True, related_name='ventas_diarias')
+    cantidad_pedidos = models.PositiveIntegerField(default=0)
+    total_ventas = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'ventas_diarias_repartidor'
+        verbose_name = 'Venta Diaria por Repartidor'
+        verbose_name_plural = 'Ventas Diarias por Repartidor'
+        constraints = [
+            # Un unique (fecha, repartidor) no impide dos filas con repartidor NULL
+            models.UniqueConstraint(
+                fields=['fecha', 'repartidor'], condition=models.Q(repartidor__isnull=False),
+                name='venta_repartidor_unica',
+            ),
+            models.UniqueConstraint(
+                fields=['fecha'], condition=models.Q(repartidor__isnull=True),
+                name='venta_sin_repartidor_unica',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha}: {self.repartidor} - {self.cantidad_pedidos} pedidos"
@@ -5,9 +5,13 @@ WebSocket URL Configuration
 from django.urls import re_path
 from . import consumers
 
+# Los grupos se resuelven desde la sesión; el id en la ruta es opcional
+# (compatibilidad con páginas abiertas antes del cambio) y debe coincidir con ella
 websocket_urlpatterns = [
-    re_path(r'ws/pedidos/(?P<cliente_id>\w+)/$', consumers.PedidoConsumer.as_asgi()),
-    re_path(r'ws/ventas/(?P<usuario_id>\w+)/$', consumers.VentasConsumer.as_asgi()),
+    re_path(r'ws/pedidos/(?:(?P<cliente_id>\w+)/)?$', consumers.PedidoConsumer.as_asgi()),
+    re_path(r'ws/ventas/(?:(?P<usuario_id>\w+)/)?$', consumers.VentasConsumer.as_asgi()),
     re_path(r'ws/repartidores/$', consumers.RepartidorConsumer.as_asgi()),
     re_path(r'ws/cocina/$', consumers.CocinaConsumer.as_asgi()),
+    # Socket único del personal con todos los temas de su rol
+    re_path(r'ws/staff/$', consumers.StaffConsumer.as_asgi()),
 ]
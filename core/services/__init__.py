@@ -0,0 +1,5 @@
+# -*- coding: utf-8 -*-
+"""
+Services Package - MVC Architecture
+Lógica de negocio reutilizable por los controllers (consultas, cachés, procesos).
+"""
@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Carrito
+Resumen del carrito (cantidad de items y subtotal) guardado en la sesión,
+para que el contador del menú no consulte la base de datos en cada página.
+Las vistas que modifican el carrito deben llamar a actualizar_resumen_carrito().
+
+Las modificaciones del carrito también viven aquí: cada una es un UPDATE o
+DELETE filtrado por el cliente dueño (la propiedad se verifica en la misma
+consulta) y las cantidades se incrementan en la base de datos con
+F('cantidad') + 1, así dos clics seguidos no pierden unidades.
+limpiar_carritos() borra los carritos que ya no se usan
+(`python manage.py limpiar_carritos`).
+"""
+from datetime import timedelta
+from decimal import Decimal
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, F, Q, Sum
+from django.utils import timezone
+from core.models import Carrito, DetalleCarrito
+
+CLAVE_RESUMEN = 'carrito_resumen'
+RESUMEN_VACIO = {'cantidad': 0, 'subtotal': '0.00'}
+
+
+def calcular_resumen(cliente_id):
+    """Calcula cantidad y subtotal del carrito activo en una sola consulta"""
+    totales = DetalleCarrito.objects.filter(
+        carrito__cliente_id=cliente_id,
+        carrito__activo=True
+    ).aggregate(
+        total_items=Sum('cantidad'),
+        total_subtotal=Sum(
+            F('cantidad') * F('producto__precio'),
+            output_field=DecimalField(max_digits=10, decimal_places=2)
+        )
+    )
+    return {
+        'cantidad': totales['total_items'] or 0,
+        'subtotal': str((totales['total_subtotal'] or Decimal('0')).quantize(Decimal('0.01'))),
+    }
+
+
+def _lineas_del_cliente(cliente_id):
+    """Líneas del carrito activo del cliente; filtrar sobre ellas verifica la propiedad"""
+    return DetalleCarrito.objects.filter(carrito__cliente_id=cliente_id, carrito__activo=True)
+
+
+def agregar_producto(cliente_id, producto, intentos=3):
+    """
+    Suma una unidad de `producto` al carrito activo del cliente.
+    Si el producto ya está en el carrito es un solo UPDATE, sin leer la línea.
+    Si no, se inserta; cuando otro request la insertó al mismo tiempo, el
+    unique (carrito, producto) lo detecta y se vuelve al UPDATE. Si la
+    inserción falla porque la limpieza borró el carrito entre medio, el UPDATE
+    no encuentra nada y se repite con un carrito nuevo.
+    Retorna True si la línea es nueva.
+    """
+    for intento in range(intentos):
+        if _lineas_del_cliente(cliente_id).filter(producto=producto).update(
+            cantidad=F('cantidad') + 1, fecha_actualizacion=timezone.now()
+        ):
+            return False
+
+        # El índice único de carrito activo hace seguro el get_or_create concurrente
+        carrito, _ = Carrito.objects.get_or_create(cliente_id=cliente_id, activo=True)
+        try:
+            with transaction.atomic():
+                DetalleCarrito.objects.create(carrito=carrito, producto=producto, cantidad=1)
+            return True
+        except IntegrityError:
+            if intento == intentos - 1:
+                raise
+
+
+def cambiar_cantidad(cliente_id, detalle_id, cantidad):
+    """
+    Fija la cantidad de una línea del cliente (o la elimina si es 0 o menos).
+    Retorna False si la línea no existe o no es del cliente.
+    """
+    lineas = _lineas_del_cliente(cliente_id).filter(id=detalle_id)
+    if cantidad > 0:
+        return lineas.update(cantidad=cantidad, fecha_actualizacion=timezone.now()) > 0
+    return lineas.delete()[0] > 0
+
+
+def quitar_linea(cliente_id, detalle_id):
+    """
+    Elimina una línea del carrito del cliente.
+    Retorna el nombre del producto, o None si la línea no existe o no es del cliente.
+    """
+    nombre = _lineas_del_cliente(cliente_id).filter(id=detalle_id).values_list(
+        'producto__nombre', flat=True
+    ).first()
+    if nombre is not None:
+        DetalleCarrito.objects.filter(id=detalle_id).delete()
+    return nombre
+
+
+def linea_carrito(cliente_id, **filtro):
+    """Línea del carrito del cliente para las respuestas JSON (None si ya no está)"""
+    linea = _lineas_del_cliente(cliente_id).filter(**filtro).values(
+        'id', 'producto_id', 'cantidad', precio=F('producto__precio')
+    ).first()
+    if linea is not None:
+        linea['subtotal'] = str(linea['cantidad'] * linea.pop('precio'))
+    return linea
+
+
+def _guardar_resumen(request, resumen):
+    """Asignar marca la sesión como modificada: solo se hace si el resumen cambió"""
+    if request.session.get(CLAVE_RESUMEN) != resumen:
+        request.session[CLAVE_RESUMEN] = resumen
+
+
+def actualizar_resumen_carrito(request):
+    """Recalcula el resumen y lo guarda en la sesión del cliente"""
+    resumen = calcular_resumen(request.session['cliente_id'])
+    _guardar_resumen(request, resumen)
+    return resumen
+
+
+def obtener_resumen_carrito(request):
+    """Devuelve el resumen de la sesión; lo calcula solo si aún no existe"""
+    if 'cliente_id' not in request.session:
+        return RESUMEN_VACIO
+    resumen = request.session.get(CLAVE_RESUMEN)
+    if resumen is None:
+        resumen = actualizar_resumen_carrito(request)
+    return resumen
+
+
+def vaciar_resumen_carrito(request):
+    """El carrito se convirtió en pedido: el contador vuelve a cero sin consultar"""
+    _guardar_resumen(request, dict(RESUMEN_VACIO))
+
+
+def limpiar_resumen_carrito(request):
+    """Elimina el resumen de la sesión (logout)"""
+    request.session.pop(CLAVE_RESUMEN, None)
+
+
+def limpiar_carritos(dias_abandono, lote=1000):
+    """
+    Borra, por lotes de `lote` carritos, los inactivos (ya se convirtieron en
+    pedido: el pedido guarda su propia copia de los productos) y los activos
+    sin actividad en los últimos `dias_abandono` días (abandonados): creados
+    antes del límite y sin líneas modificadas después. Cada lote va en su
+    propia transacción para no bloquear las tablas mucho tiempo, y el DELETE
+    vuelve a aplicar el filtro por si el cliente tocó el carrito entre medio.
+    Retorna (carritos, líneas) borrados.
+    """
+    limite = timezone.now() - timedelta(days=dias_abandono)
+    viejos = Carrito.objects.filter(
+        Q(activo=False)
+        | Q(fecha_creacion__lt=limite) & ~Q(detalles__fecha_actualizacion__gte=limite)
+    ).order_by('id')
+    carritos = lineas = 0
+    while True:
+        with transaction.atomic():
+            ids = list(viejos.values_list('id', flat=True)[:lote])
+            if not ids:
+                return carritos, lineas
+            _, borrados = viejos.filter(id__in=ids).delete()
+        carritos += borrados.get('core.Carrito', 0)
+        lineas += borrados.get('core.DetalleCarrito', 0)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Checkout
+Convierte el carrito activo de un cliente en un pedido dentro de una sola
+transacción, bloqueando el carrito para evitar pedidos duplicados.
+"""
+from django.db import transaction
+from django.db.models import DecimalField, F, Sum
+from core.models import Carrito, Pedido, DetallePedido
+
+
+def crear_pedido_desde_carrito(cliente, clave_idempotencia=None):
+    """
+    Crea el pedido a partir del carrito activo del cliente.
+    Retorna (pedido, creado):
+    - (pedido, True) si se creó un pedido nuevo
+    - (pedido, False) si la clave de idempotencia ya generó un pedido antes
+    - (None, False) si no hay carrito activo o está vacío
+    """
+    with transaction.atomic():
+        # Bloquear el carrito: un segundo POST concurrente espera aquí y,
+        # al continuar, ya no encuentra el carrito activo
+        carrito = Carrito.objects.select_for_update().filter(cliente=cliente, activo=True).first()
+
+        if clave_idempotencia:
+            existente = Pedido.objects.filter(
+                clave_idempotencia=clave_idempotencia, cliente=cliente
+            ).first()
+            if existente:
+                return existente, False
+
+        if not carrito:
+            return None, False
+
+        detalles = list(carrito.detalles.select_related('producto'))
+        if not detalles:
+            return None, False
+
+        # Total calculado en la base de datos
+        total = carrito.detalles.aggregate(
+            total=Sum(
+                F('cantidad') * F('producto__precio'),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )['total']
+
+        pedido = Pedido.objects.create(
+            cliente=cliente,
+            total_venta=total,
+            estado='RECIBIDO',  # Estado inicial
+            clave_idempotencia=clave_idempotencia or None
+        )
+
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto=detalle.producto,
+                producto_nombre=detalle.producto.nombre,
+                cantidad=detalle.cantidad,
+                precio_unitario=detalle.producto.precio
+            )
+            for detalle in detalles
+        ])
+
+        # Desactivar carrito
+        Carrito.objects.filter(id=carrito.id).update(activo=False)
+
+    return pedido, True
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Datos de prueba
+Genera un restaurante con N clientes, M productos y K pedidos históricos
+(con sus detalles) usando bulk_create. Con la misma semilla produce
+siempre los mismos datos; lo usan el benchmark y las pruebas.
+"""
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import (
+    Rol, Usuario, Cliente, Categoria, Producto, Pedido, DetallePedido,
+)
+from core.services.ventas import reconstruir_ventas
+
+ROLES = ['Admin', 'Cajeros', 'Cocina', 'Repartidores', 'Encargados']
+PASSWORD_PRUEBA = 'prueba123'
+
+# Proporción de pedidos históricos que siguen activos (tablero de pedidos)
+PROPORCION_ACTIVOS = 0.03
+
+
+@transaction.atomic
+def generar_datos(clientes=100, productos=50, pedidos=1000, repartidores=5, dias=180, semilla=0, lote=2000):
+    """
+    Crea roles, un usuario por rol (más `repartidores`), categorías, productos,
+    clientes y pedidos repartidos en los últimos `dias` días.
+    Devuelve un diccionario con los usuarios por rol, clientes y productos creados.
+    """
+    rng = random.Random(semilla)
+    ahora = timezone.now()
+    # Un solo hash para todos: make_password es deliberadamente lento
+    password = make_password(PASSWORD_PRUEBA)
+
+    roles = {nombre: Rol.objects.get_or_create(nombre_rol=nombre)[0] for nombre in ROLES}
+    usuarios = {
+        nombre: Usuario.objects.create(
+            nombre=f'{nombre} Prueba', email=f'{nombre.lower()}@prueba.local', password=password, rol=rol
+        )
+        for nombre, rol in roles.items()
+    }
+    lista_repartidores = [usuarios['Repartidores']] + Usuario.objects.bulk_create([
+        Usuario(nombre=f'Repartidor {i}', email=f'repartidor{i}@prueba.local', password=password,
+                rol=roles['Repartidores'])
+        for i in range(1, repartidores)
+    ])
+
+    categorias = [Categoria.objects.get_or_create(nombre='Todos', defaults={'activo': True})[0]]
+    categorias += Categoria.objects.bulk_create([
+        Categoria(nombre=f'Categoría {i}', descripcion='Generada para pruebas') for i in range(1, 6)
+    ])
+
+    lista_productos = Producto.objects.bulk_create([
+        Producto(
+            nombre=f'Producto {i}',
+            descripcion='Generado para pruebas',
+            precio=Decimal(rng.randint(500, 4500)) / 100,
+            categoria=rng.choice(categorias),
+        )
+        for i in range(productos)
+    ], batch_size=lote)
+
+    lista_clientes = Cliente.objects.bulk_create([
+        Cliente(
+            nombre=f'Cliente {i}',
+            telefono=f'9{i:08d}',
+            direccion=f'Calle {i}',
+            email=f'cliente{i}@prueba.local',
+            password=password,
+        )
+        for i in range(clientes)
+    ], batch_size=lote)
+
+    for inicio in range(0, pedidos, lote):
+        nuevos, lineas = [], []
+        for i in range(inicio, min(inicio + lote, pedidos)):
+            fecha = ahora - timedelta(seconds=rng.randint(0, dias * 86400))
+            if rng.random() < PROPORCION_ACTIVOS:
+                estado, fecha_entrega, repartidor = rng.choice(Pedido.ESTADOS_ACTIVOS), None, None
+            else:
+                estado = 'ENTREGADO' if rng.random() < 0.95 else 'NO_ENTREGADO'
+                fecha_entrega = min(fecha + timedelta(minutes=rng.randint(20, 90)), ahora)
+                repartidor = rng.choice(lista_repartidores)
+
+            elegidos = rng.sample(lista_productos, min(len(lista_productos), rng.randint(1, 4)))
+            detalle = [(producto, rng.randint(1, 3)) for producto in elegidos]
+            nuevos.append(Pedido(
+                codigo_unico=f'PED-P{i:07d}',
+                cliente=rng.choice(lista_clientes),
+                repartidor=repartidor,
+                estado=estado,
+                fecha_creacion=fecha,
+                fecha_entrega=fecha_entrega,
+                total_venta=sum(producto.precio * cantidad for producto, cantidad in detalle),
+            ))
+            lineas.append(detalle)
+
+        Pedido.objects.bulk_create(nuevos)
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto=producto,
+                producto_nombre=producto.nombre,
+                cantidad=cantidad,
+                precio_unitario=producto.precio,
+            )
+            for pedido, detalle in zip(nuevos, lineas)
+            for producto, cantidad in detalle
+        ], batch_size=lote)
+
+    # El resumen diario debe coincidir con los pedidos generados
+    reconstruir_ventas()
+
+    return {
+        'usuarios': usuarios,
+        'repartidores': lista_repartidores,
+        'clientes': lista_clientes,
+        'productos': lista_productos,
+    }
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Exportación de ventas
+Genera el CSV de ventas por bloques de filas, leyendo la base de datos por
+bloques (iterator + values_list), para que la memoria no dependa del rango
+de fechas.
+
+El generador es asíncrono: bajo ASGI (daphne), Django consume un generador
+síncrono entero con sync_to_async(list) antes de enviar nada, con lo que el
+CSV completo acabaría en memoria. Cada bloque se lee con sync_to_async y se
+envía antes de pedir el siguiente.
+"""
+import csv
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+from core.models import Pedido, DetallePedido
+
+TAMANO_BLOQUE = 2000
+
+ENCABEZADO_PEDIDOS = ['Código', 'Fecha entrega', 'Cliente', 'Teléfono', 'Repartidor', 'Total']
+ENCABEZADO_DETALLE = [
+    'Código', 'Fecha entrega', 'Cliente', 'Repartidor',
+    'Producto', 'Cantidad', 'Precio unitario', 'Subtotal'
+]
+
+
+class _Eco:
+    """Buffer mínimo para csv.writer: devuelve la línea en vez de guardarla"""
+    def write(self, valor):
+        return valor
+
+
+def _fecha_local(fecha):
+    return timezone.localtime(fecha).strftime('%d/%m/%Y %H:%M') if fecha else ''
+
+
+def _filas_pedidos(desde, hasta):
+    pedidos = Pedido.objects.filter(estado='ENTREGADO')
+    if desde:
+        pedidos = pedidos.filter(fecha_entrega__gte=desde)
+    if hasta:
+        pedidos = pedidos.filter(fecha_entrega__lt=hasta)
+
+    filas = pedidos.order_by('fecha_entrega', 'id').values_list(
+        'codigo_unico', 'fecha_entrega', 'cliente__nombre', 'cliente__telefono',
+        'repartidor__nombre', 'total_venta'
+    )
+    for codigo, fecha, cliente, telefono, repartidor, total in filas.iterator(chunk_size=TAMANO_BLOQUE):
+        yield [codigo, _fecha_local(fecha), cliente, telefono, repartidor or 'N/A', total]
+
+
+def _filas_detalle(desde, hasta):
+    detalles = DetallePedido.objects.filter(pedido__estado='ENTREGADO')
+    if desde:
+        detalles = detalles.filter(pedido__fecha_entrega__gte=desde)
+    if hasta:
+        detalles = detalles.filter(pedido__fecha_entrega__lt=hasta)
+
+    filas = detalles.order_by('pedido__fecha_entrega', 'pedido_id', 'id').values_list(
+        'pedido__codigo_unico', 'pedido__fecha_entrega', 'pedido__cliente__nombre',
+        'pedido__repartidor__nombre', 'producto_nombre', 'cantidad', 'precio_unitario'
+    )
+    for codigo, fecha, cliente, repartidor, producto, cantidad, precio in filas.iterator(chunk_size=TAMANO_BLOQUE):
+        yield [codigo, _fecha_local(fecha), cliente, repartidor or 'N/A', producto, cantidad, precio, cantidad * precio]
+
+
+async def generar_csv_ventas(desde=None, hasta=None, detalle=False):
+    """
+    Generador asíncrono del CSV de pedidos ENTREGADOS en [desde, hasta):
+    entrega un texto por bloque de TAMANO_BLOQUE filas.
+    detalle=True exporta una fila por producto vendido en lugar de una por pedido.
+    """
+    writer = csv.writer(_Eco())
+
+    # BOM para que Excel reconozca UTF-8 (tildes y ñ)
+    yield '\ufeff' + writer.writerow(ENCABEZADO_DETALLE if detalle else ENCABEZADO_PEDIDOS)
+
+    filas = _filas_detalle(desde, hasta) if detalle else _filas_pedidos(desde, hasta)
+    # El cursor de iterator() se usa siempre desde el mismo hilo (thread_sensitive)
+    siguiente_bloque = sync_to_async(lambda: list(islice(filas, TAMANO_BLOQUE)), thread_sensitive=True)
+    while bloque := await siguiente_bloque():
+        yield ''.join(writer.writerow(fila) for fila in bloque)
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Rangos de fechas
+Convierte filtros por día en rangos semiabiertos [desde, hasta) sobre la
+columna DateTime, para que la base de datos pueda usar los índices
+(un filtro __date aplica una función a la columna y obliga a recorrerla).
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+
+def inicio_del_dia(fecha):
+    """Medianoche (zona horaria actual) del día indicado"""
+    return timezone.make_aware(datetime.combine(fecha, time.min))
+
+
+def rango_del_dia(fecha):
+    """Rango [inicio del día, inicio del día siguiente)"""
+    desde = inicio_del_dia(fecha)
+    return desde, desde + timedelta(days=1)
+
+
+def fecha_desde_texto(texto):
+    """
+    Fecha 'YYYY-MM-DD' de un formulario, o None si viene vacía o es inválida
+    (parse_date lanza ValueError con fechas bien formadas pero imposibles, como 2026-02-30)
+    """
+    if not texto:
+        return None
+    try:
+        return parse_date(texto)
+    except ValueError:
+        return None
+
+
+def rango_desde_texto(fecha_inicio, fecha_fin):
+    """
+    Recibe las fechas 'YYYY-MM-DD' de un formulario (pueden venir vacías)
+    y devuelve (desde, hasta) para filtrar con __gte / __lt.
+    Fechas vacías o inválidas se devuelven como None (sin límite).
+    """
+    inicio = fecha_desde_texto(fecha_inicio)
+    fin = fecha_desde_texto(fecha_fin)
+    desde = inicio_del_dia(inicio) if inicio else None
+    hasta = inicio_del_dia(fin) + timedelta(days=1) if fin else None
+    return desde, hasta
+
+
+def dias_del_rango(desde, hasta):
+    """Primer y último día (date) de un rango de rango_desde_texto(), o None si no tiene límite"""
+    dia_inicio = desde.date() if desde else None
+    dia_fin = (hasta - timedelta(days=1)).date() if hasta else None
+    return dia_inicio, dia_fin
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Menú público
+Construye el árbol categoría -> productos activos en una sola consulta y lo
+guarda en el cache de Django. Se invalida con señales (ver core/signals.py)
+cada vez que se guarda o elimina un Producto o una Categoria.
+"""
+from itertools import groupby
+from django.conf import settings
+from django.core.cache import cache
+from core.models import Producto
+
+CLAVE_MENU = 'menu_publico'
+
+
+def construir_menu():
+    """Arma la lista de categorías activas con sus productos visibles (1 consulta)"""
+    productos = Producto.objects.filter(
+        activo=True,
+        eliminado=False,
+        categoria__activo=True
+    ).select_related('categoria').order_by('categoria__nombre', 'categoria_id', 'nombre')
+
+    return [
+        {
+            'categoria': categoria,
+            'productos': list(productos_categoria),
+        }
+        for categoria, productos_categoria in groupby(productos, key=lambda producto: producto.categoria)
+    ]
+
+
+def obtener_menu():
+    """Retorna el menú desde el cache; lo reconstruye solo si no está"""
+    menu = cache.get(CLAVE_MENU)
+    if menu is None:
+        menu = construir_menu()
+        cache.set(CLAVE_MENU, menu, settings.MENU_CACHE_TIMEOUT)
+    return menu
+
+
+def invalidar_menu():
+    """Elimina el menú del cache para que la próxima visita lo reconstruya"""
+    cache.delete(CLAVE_MENU)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Métricas de WebSockets y notificaciones
+Contadores, medidores e histogramas en memoria del proceso, exportados en
+formato de texto de Prometheus por la vista admin_metricas.
+Las etiquetas de grupos por cliente o usuario se agrupan (pedidos_cliente_*)
+para que la cantidad de series no crezca con los usuarios.
+"""
+import re
+import threading
+from collections import defaultdict
+
+_candado = threading.Lock()
+_registro = []
+
+# Límites (en segundos) de los histogramas de envío
+BUCKETS_SEGUNDOS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0]
+
+
+def familia_grupo(grupo):
+    """pedidos_cliente_12 -> pedidos_cliente_*; cocina y ventas_rol_Admin se mantienen"""
+    return re.sub(r'_\d+$', '_*', grupo)
+
+
+def _etiqueta(nombre, valor, extra=''):
+    etiquetas = [f'{nombre}="{valor}"'] if valor is not None else []
+    if extra:
+        etiquetas.append(extra)
+    return '{' + ','.join(etiquetas) + '}' if etiquetas else ''
+
+
+class _Metrica:
+    tipo = None
+
+    def __init__(self, nombre, ayuda, etiqueta=None):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiqueta = etiqueta
+        self.valores = defaultdict(float)
+        _registro.append(self)
+
+    def exportar(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        for valor_etiqueta, valor in sorted(self.valores.items(), key=lambda item: str(item[0])):
+            lineas.append(f'{self.nombre}{_etiqueta(self.etiqueta, valor_etiqueta)} {valor:g}')
+        return lineas
+
+
+class Contador(_Metrica):
+    """Valor que solo crece (envíos, fallos)"""
+    tipo = 'counter'
+
+    def inc(self, valor_etiqueta=None, cantidad=1):
+        with _candado:
+            self.valores[valor_etiqueta] += cantidad
+
+
+class Medidor(_Metrica):
+    """Valor que sube y baja (conexiones abiertas)"""
+    tipo = 'gauge'
+
+    def inc(self, valor_etiqueta=None, cantidad=1):
+        with _candado:
+            self.valores[valor_etiqueta] += cantidad
+
+    def dec(self, valor_etiqueta=None, cantidad=1):
+        self.inc(valor_etiqueta, -cantidad)
+
+
+class Histograma(_Metrica):
+    """Distribución de duraciones en buckets acumulados"""
+    tipo = 'histogram'
+
+    def __init__(self, nombre, ayuda, etiqueta=None, buckets=BUCKETS_SEGUNDOS):
+        super().__init__(nombre, ayuda, etiqueta)
+        self.buckets = buckets
+        self.conteos = defaultdict(lambda: [0] * len(self.buckets))
+        self.sumas = defaultdict(float)
+        self.totales = defaultdict(int)
+
+    def observar(self, valor_etiqueta, segundos):
+        with _candado:
+            conteos = self.conteos[valor_etiqueta]
+            for i, limite in enumerate(self.buckets):
+                if segundos <= limite:
+                    conteos[i] += 1
+            self.sumas[valor_etiqueta] += segundos
+            self.totales[valor_etiqueta] += 1
+
+    def exportar(self):
+        lineas = [f'# HELP {self.nombre} {self.ayuda}', f'# TYPE {self.nombre} {self.tipo}']
+        for valor_etiqueta in sorted(self.totales, key=str):
+            for limite, conteo in zip(self.buckets, self.conteos[valor_etiqueta]):
+                etiquetas = _etiqueta(self.etiqueta, valor_etiqueta, f'le="{limite:g}"')
+                lineas.append(f'{self.nombre}_bucket{etiquetas} {conteo}')
+            etiquetas = _etiqueta(self.etiqueta, valor_etiqueta, 'le="+Inf"')
+            lineas.append(f'{self.nombre}_bucket{etiquetas} {self.totales[valor_etiqueta]}')
+            etiquetas = _etiqueta(self.etiqueta, valor_etiqueta)
+            lineas.append(f'{self.nombre}_sum{etiquetas} {self.sumas[valor_etiqueta]:g}')
+            lineas.append(f'{self.nombre}_count{etiquetas} {self.totales[valor_etiqueta]}')
+        return lineas
+
+
+def exportar_prometheus():
+    """Todas las métricas en formato de texto de Prometheus"""
+    with _candado:
+        lineas = [linea for metrica in _registro for linea in metrica.exportar()]
+    return '\n'.join(lineas) + '\n'
+
+
+# --- WebSockets (core/consumers.py) ---------------------------------------
+
+ws_conexiones = Medidor(
+    'ws_conexiones', 'Conexiones WebSocket abiertas por grupo', 'grupo')
+ws_conexiones_rechazadas = Contador(
+    'ws_conexiones_rechazadas_total', 'Conexiones WebSocket rechazadas o con error al conectar', 'consumer')
+ws_envio_segundos = Histograma(
+    'ws_envio_segundos', 'Tiempo de envío de un evento al socket en los handlers', 'tipo')
+ws_envios_fallidos = Contador(
+    'ws_envios_fallidos_total', 'Eventos que no se pudieron enviar al socket', 'tipo')
+
+# --- Despachador de notificaciones (core/services/notificaciones.py) ------
+
+notificaciones_group_send_segundos = Histograma(
+    'notificaciones_group_send_segundos', 'Tiempo de group_send por evento publicado', 'grupo')
+notificaciones_enviadas = Contador(
+    'notificaciones_enviadas_total', 'Eventos publicados en el channel layer', 'grupo')
+notificaciones_fallidas = Contador(
+    'notificaciones_fallidas_total', 'Intentos de group_send fallidos (se reintentan)', 'grupo')
+notificaciones_combinadas = Contador(
+    'notificaciones_combinadas_total', 'Eventos reemplazados por uno más nuevo del mismo pedido sin enviarse', 'grupo')
+notificaciones_descartadas = Contador(
+    'notificaciones_descartadas_total', 'Eventos que agotaron sus reintentos (quedan como FALLIDO)', 'grupo')
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Notificaciones WebSocket
+Nombres de grupos del channel layer compartidos por los controllers
+(que envían) y core/consumers.py (que se suscriben), y la bandeja de
+salida de eventos.
+
+Los controllers no llaman a group_send: guardan el evento con
+encolar_notificaciones() dentro de la misma transacción que el cambio del
+pedido. El despachador lo publica después en el channel layer, desde una
+tarea del servidor ASGI o desde `python manage.py despachar_notificaciones`,
+así la respuesta HTTP nunca espera a Redis.
+"""
+import asyncio
+import logging
+import re
+from datetime import timedelta
+from time import perf_counter
+
+from asgiref.sync import sync_to_async
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from core.instrumentacion import medir
+from core.models import EventoNotificacion
+from core.services import metricas
+from core.services.reanudacion import numerar
+
+logger = logging.getLogger(__name__)
+
+# Roles que reciben la notificación de venta realizada
+ROLES_VENTAS = ['Cajeros', 'Admin']
+
+# Roles que reciben los pedidos listos para entrega
+ROLES_REPARTO = ['Repartidores']
+
+# Segundos que un lote queda reservado mientras se envía; si el proceso
+# muere a mitad de envío, otro despachador lo retoma al vencer
+ARRIENDO_LOTE = 30
+
+# Tope de espera entre reintentos de un evento (segundos)
+ESPERA_MAXIMA = 300
+
+
+def grupo_ventas_rol(nombre_rol):
+    """Grupo de ventas de un rol: un solo group_send llega a todo el personal del rol"""
+    # Los nombres de grupo solo admiten letras, números, guiones, guiones bajos y puntos
+    return 'ventas_rol_' + re.sub(r'[^A-Za-z0-9_.-]', '_', nombre_rol)
+
+
+def clave_combinacion(grupo, evento):
+    """Eventos con la misma clave se combinan: solo se envía el último"""
+    if 'pedido_id' not in evento:
+        return ''
+    return f"{grupo}:{evento['type']}:{evento['pedido_id']}"
+
+
+def encolar_notificaciones(eventos):
+    """
+    Guarda eventos [(grupo, evento), ...] en la bandeja de salida con un solo INSERT.
+    Debe llamarse dentro de la transacción del cambio que notifican: si esta
+    se revierte, los eventos también. Al confirmarse se despierta al despachador.
+    El tiempo se mide como 'encolado' en Server-Timing: la petición solo paga el
+    INSERT, el group_send lo hace el despachador fuera de ella.
+    """
+    with medir('encolado'):
+        EventoNotificacion.objects.bulk_create([
+            EventoNotificacion(grupo=grupo, evento=evento, clave=clave_combinacion(grupo, evento))
+            for grupo, evento in eventos
+        ])
+        transaction.on_commit(despachador.despertar)
+
+
+def _tomar_lote(tamano):
+    """
+    Reserva hasta `tamano` eventos listos; SKIP LOCKED permite varios despachadores.
+    Un evento está listo cuando pasó la ventana de combinación
+    (NOTIFICACIONES_VENTANA) desde que se encoló. Los que ya tienen un evento
+    más nuevo con la misma clave (el mismo pedido cambió otra vez) se borran
+    sin enviarse: el cliente recibe solo el último estado.
+    Devuelve (eventos a enviar, cantidad combinada).
+    """
+    ahora = timezone.now()
+    with transaction.atomic():
+        eventos = list(
+            EventoNotificacion.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                estado=EventoNotificacion.PENDIENTE,
+                disponible_desde__lte=ahora - timedelta(seconds=settings.NOTIFICACIONES_VENTANA),
+            )
+            .order_by('id')
+            .only('id', 'grupo', 'evento', 'intentos', 'clave')[:tamano]
+        )
+
+        claves = {evento.clave for evento in eventos if evento.clave}
+        ultimos = dict(
+            EventoNotificacion.objects
+            .filter(estado=EventoNotificacion.PENDIENTE, clave__in=claves)
+            .values('clave')
+            .annotate(ultimo=Max('id'))
+            .values_list('clave', 'ultimo')
+        ) if claves else {}
+        combinados = [evento for evento in eventos if evento.clave and evento.id < ultimos[evento.clave]]
+        if combinados:
+            EventoNotificacion.objects.filter(id__in=[e.id for e in combinados]).delete()
+            for evento in combinados:
+                metricas.notificaciones_combinadas.inc(metricas.familia_grupo(evento.grupo))
+            eventos = [evento for evento in eventos if evento not in combinados]
+
+        if eventos:
+            EventoNotificacion.objects.filter(id__in=[e.id for e in eventos]).update(
+                disponible_desde=ahora + timedelta(seconds=ARRIENDO_LOTE)
+            )
+    return eventos, len(combinados)
+
+
+def _cerrar_lote(enviados, fallidos):
+    """Borra los enviados y reprograma (o da por fallidos) los que dieron error"""
+    if enviados:
+        EventoNotificacion.objects.filter(id__in=enviados).delete()
+
+    ahora = timezone.now()
+    for evento, error in fallidos:
+        intentos = evento.intentos + 1
+        cambios = {'intentos': intentos, 'ultimo_error': error[:1000]}
+        if intentos >= settings.NOTIFICACIONES_MAX_INTENTOS:
+            cambios['estado'] = EventoNotificacion.FALLIDO
+            metricas.notificaciones_descartadas.inc(metricas.familia_grupo(evento.grupo))
+        else:
+            # Espera exponencial: 2, 4, 8... segundos
+            cambios['disponible_desde'] = ahora + timedelta(seconds=min(2 ** intentos, ESPERA_MAXIMA))
+        EventoNotificacion.objects.filter(id=evento.id).update(**cambios)
+
+
+class Despachador:
+    """
+    Publica en el channel layer los eventos de la bandeja de salida.
+    Hay una instancia por proceso (`despachador`); ejecutar() corre como
+    tarea del event loop y despertar() puede llamarse desde cualquier hilo.
+    """
+
+    def __init__(self):
+        self._loop = None
+        self._aviso = None
+        self._tarea = None
+
+    def iniciar(self):
+        """Arranca ejecutar() en el event loop actual si aún no está corriendo"""
+        if self._tarea is None or self._tarea.done():
+            self._tarea = asyncio.get_running_loop().create_task(self.ejecutar())
+
+    async def detener(self):
+        if self._tarea is not None and not self._tarea.done():
+            self._tarea.cancel()
+            try:
+                await self._tarea
+            except asyncio.CancelledError:
+                pass
+        self._tarea = None
+
+    def despertar(self):
+        """Avisa que hay eventos nuevos; sin despachador en este proceso no hace nada"""
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._aviso.set)
+
+    async def ejecutar(self):
+        """Bucle del despachador: vacía la bandeja y espera un aviso o el intervalo"""
+        self._loop = asyncio.get_running_loop()
+        self._aviso = asyncio.Event()
+        tamano = settings.NOTIFICACIONES_LOTE
+        try:
+            while True:
+                try:
+                    procesados = await self.despachar_lote(tamano)
+                except Exception:
+                    logger.exception('Error al despachar notificaciones')
+                    procesados = 0
+                if procesados < tamano:
+                    try:
+                        await asyncio.wait_for(self._aviso.wait(), settings.NOTIFICACIONES_INTERVALO)
+                    except asyncio.TimeoutError:
+                        continue
+                    self._aviso.clear()
+                    # Dejar pasar la ventana de combinación: si el pedido vuelve
+                    # a cambiar en ella, solo se envía el último evento
+                    await asyncio.sleep(settings.NOTIFICACIONES_VENTANA)
+        finally:
+            self._loop = None
+
+    async def despachar_lote(self, tamano=None):
+        """Envía un lote de eventos y devuelve cuántos se procesaron (enviados o combinados)"""
+        eventos, combinados = await database_sync_to_async(_tomar_lote)(tamano or settings.NOTIFICACIONES_LOTE)
+        if not eventos:
+            return combinados
+
+        channel_layer = get_channel_layer()
+        enviados, fallidos = [], []
+        # Número de secuencia por grupo y copia en el buffer de reanudación
+        numerados = await sync_to_async(numerar)([(evento.grupo, evento.evento) for evento in eventos])
+        # En orden de id, para que cada grupo reciba los eventos en el orden en que ocurrieron
+        for evento, mensaje in zip(eventos, numerados):
+            familia = metricas.familia_grupo(evento.grupo)
+            inicio = perf_counter()
+            try:
+                await channel_layer.group_send(evento.grupo, mensaje)
+                enviados.append(evento.id)
+                metricas.notificaciones_enviadas.inc(familia)
+            except Exception as e:
+                logger.warning('No se pudo enviar el evento %s a %s: %s', evento.id, evento.grupo, e)
+                fallidos.append((evento, str(e)))
+                metricas.notificaciones_fallidas.inc(familia)
+            metricas.notificaciones_group_send_segundos.observar(familia, perf_counter() - inicio)
+
+        await database_sync_to_async(_cerrar_lote)(enviados, fallidos)
+        return len(eventos) + combinados
+
+    async def despachar_pendientes(self):
+        """Vacía la bandeja una vez (los eventos en espera de reintento quedan para después)"""
+        total = 0
+        while True:
+            procesados = await self.despachar_lote()
+            total += procesados
+            if not procesados:
+                return total
+
+
+despachador = Despachador()
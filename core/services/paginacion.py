@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Paginación por cursor (keyset)
+Pagina querysets ordenados por (fecha_creacion, id) sin usar OFFSET,
+de modo que el costo de cada página no depende del tamaño del historial.
+"""
+import base64
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def codificar_cursor(fecha, pk):
+    """Convierte (fecha, id) del último elemento en un cursor opaco para la URL"""
+    valor = f"{fecha.isoformat()}|{pk}"
+    return base64.urlsafe_b64encode(valor.encode()).decode()
+
+
+def decodificar_cursor(cursor):
+    """Devuelve (fecha, id) a partir de un cursor, o None si es inválido"""
+    try:
+        valor = base64.urlsafe_b64decode(cursor.encode()).decode()
+        fecha_texto, pk = valor.rsplit('|', 1)
+        fecha = parse_datetime(fecha_texto)
+        if fecha is None:
+            return None
+        return fecha, int(pk)
+    except (ValueError, UnicodeError):
+        return None
+
+
+def paginar_por_cursor(queryset, cursor=None, por_pagina=50, campo_fecha='fecha_creacion'):
+    """
+    Retorna (elementos, siguiente_cursor) ordenando de más reciente a más antiguo.
+    Se pide un elemento extra para saber si existe una página siguiente.
+    """
+    queryset = queryset.order_by(f'-{campo_fecha}', '-id')
+
+    posicion = decodificar_cursor(cursor) if cursor else None
+    if posicion:
+        fecha, pk = posicion
+        queryset = queryset.filter(
+            Q(**{f'{campo_fecha}__lt': fecha}) | Q(**{campo_fecha: fecha, 'id__lt': pk})
+        )
+
+    elementos = list(queryset[:por_pagina + 1])
+    siguiente_cursor = None
+    if len(elementos) > por_pagina:
+        elementos = elementos[:por_pagina]
+        ultimo = elementos[-1]
+        siguiente_cursor = codificar_cursor(getattr(ultimo, campo_fecha), ultimo.id)
+
+    return elementos, siguiente_cursor
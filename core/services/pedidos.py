@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Snapshots de pedidos
+Representación completa y serializable de un pedido, usada tanto en los
+eventos WebSocket como en el endpoint JSON de un solo pedido.
+"""
+from core.models import Pedido
+
+
+def snapshot_pedido(pedido):
+    """
+    Convierte un pedido (con cliente, repartidor y detalles ya cargados)
+    en un diccionario listo para json.dumps.
+    """
+    detalles = [
+        {
+            'producto_id': detalle.producto_id,
+            'producto_nombre': detalle.producto.nombre if detalle.producto else detalle.producto_nombre,
+            'cantidad': detalle.cantidad,
+            'precio_unitario': str(detalle.precio_unitario),
+            'subtotal': str(detalle.subtotal()),
+        }
+        for detalle in pedido.detalles.all()
+    ]
+
+    return {
+        'id': pedido.id,
+        'codigo_unico': pedido.codigo_unico,
+        'estado': pedido.estado,
+        'estado_display': pedido.get_estado_display(),
+        'version': pedido.version,
+        'total': str(pedido.total_venta),
+        'fecha_creacion': pedido.fecha_creacion.isoformat(),
+        'fecha_entrega': pedido.fecha_entrega.isoformat() if pedido.fecha_entrega else None,
+        'cliente': {
+            'id': pedido.cliente.id,
+            'nombre': pedido.cliente.nombre,
+            'telefono': pedido.cliente.telefono,
+            'direccion': pedido.cliente.direccion,
+        },
+        'repartidor': {
+            'id': pedido.repartidor.id,
+            'nombre': pedido.repartidor.nombre,
+        } if pedido.repartidor else None,
+        'detalles': detalles,
+    }
+
+
+def obtener_pedido_completo(pedido_id):
+    """Carga un pedido con todas sus relaciones en dos consultas"""
+    return Pedido.objects.select_related('cliente', 'repartidor').prefetch_related(
+        'detalles__producto'
+    ).get(id=pedido_id)
+
+
+def obtener_snapshot(pedido_id):
+    """Atajo: carga el pedido y devuelve su snapshot"""
+    return snapshot_pedido(obtener_pedido_completo(pedido_id))
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Personal en sesión
+Resuelve el usuario del personal (con su rol) desde un snapshot en cache,
+así comprobar permisos no consulta la base de datos en cada petición.
+Las señales de core/signals.py lo invalidan al editar usuarios o roles.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from core.models import Usuario, Rol
+
+# Subir al cambiar el contenido del snapshot: las entradas viejas se ignoran
+VERSION_SNAPSHOT = 1
+
+CAMPOS_USUARIO = ['id', 'nombre', 'email', 'rol_id']
+
+
+def _clave(usuario_id):
+    return f'personal_usuario_{usuario_id}'
+
+
+def obtener_personal(usuario_id):
+    """
+    Devuelve el Usuario con su rol ya cargado, o None si no existe.
+    La instancia sirve para comparar, filtrar y asignar como repartidor;
+    el resto de campos (password, fecha_registro) se cargan solo si se piden.
+    """
+    datos = cache.get(_clave(usuario_id), version=VERSION_SNAPSHOT)
+    if datos is None:
+        datos = (
+            Usuario.objects.filter(id=usuario_id)
+            .values_list(*CAMPOS_USUARIO, 'rol__nombre_rol')
+            .first()
+        )
+        if datos is None:
+            return None
+        cache.set(_clave(usuario_id), datos, settings.PERSONAL_CACHE_TIMEOUT, version=VERSION_SNAPSHOT)
+
+    *valores, nombre_rol = datos
+    usuario = Usuario.from_db(DEFAULT_DB_ALIAS, CAMPOS_USUARIO, valores)
+    usuario.rol = Rol.from_db(DEFAULT_DB_ALIAS, ['id', 'nombre_rol'], [usuario.rol_id, nombre_rol])
+    return usuario
+
+
+def invalidar_personal(*usuario_ids):
+    """Descarta el snapshot de los usuarios indicados"""
+    if usuario_ids:
+        cache.delete_many([_clave(usuario_id) for usuario_id in usuario_ids], version=VERSION_SNAPSHOT)
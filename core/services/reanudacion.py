@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Reanudación de sockets
+Cada evento publicado en un grupo lleva un número de secuencia creciente
+por grupo ('seq') y queda guardado en un buffer circular del cache (los
+últimos NOTIFICACIONES_REPETICION eventos del grupo). Un socket que se
+reconecta indica el último seq que recibió y el consumer le reenvía solo
+los que se perdió, en lugar de que la página se recargue entera.
+
+El buffer usa una clave por posición (seq % tamaño), así varios
+despachadores escriben sin leer ni bloquear una lista compartida.
+Con Redis como cache lo comparten todos los procesos.
+
+El contador vive en el cache y puede perderse (LocMem lo desaloja al
+llenarse, Redis se vacía o reinicia). Un contador nuevo no empieza en 1
+sino en el instante actual en microsegundos: queda por encima de todos los
+seq ya enviados, así un seq nunca se repite con otro evento y los clientes
+que se reconectan con un seq anterior reciben 'resincronizar'.
+"""
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _clave_seq(grupo):
+    return f'ws_seq_{grupo}'
+
+
+def _clave_posicion(grupo, seq):
+    return f'ws_repeticion_{grupo}_{seq % settings.NOTIFICACIONES_REPETICION}'
+
+
+def _inicio_contador():
+    """Primer valor de un contador nuevo, mayor que cualquier seq de un contador perdido"""
+    return time.time_ns() // 1000
+
+
+def numerar(eventos):
+    """
+    Asigna seq a cada (grupo, evento) de la lista, en orden, y los guarda en
+    el buffer de su grupo. Devuelve los eventos con 'seq' y 'grupo' añadidos.
+    """
+    por_grupo = Counter(grupo for grupo, _ in eventos)
+    siguiente = {}
+    for grupo, cantidad in por_grupo.items():
+        cache.add(_clave_seq(grupo), _inicio_contador(), timeout=None)
+        siguiente[grupo] = cache.incr(_clave_seq(grupo), cantidad) - cantidad + 1
+
+    numerados, posiciones = [], {}
+    for grupo, evento in eventos:
+        evento = {**evento, 'grupo': grupo, 'seq': siguiente[grupo]}
+        siguiente[grupo] += 1
+        numerados.append(evento)
+        posiciones[_clave_posicion(grupo, evento['seq'])] = evento
+    cache.set_many(posiciones, settings.NOTIFICACIONES_REPETICION_TIMEOUT)
+    return numerados
+
+
+def ultimo_seq(grupo):
+    return cache.get(_clave_seq(grupo), 0)
+
+
+def eventos_desde(grupo, desde_seq):
+    """
+    Eventos del grupo con seq mayor que `desde_seq`, en orden. Devuelve None
+    si alguno ya salió del buffer (o el cache se vació): el cliente debe
+    recargar sus datos.
+    """
+    actual = ultimo_seq(grupo)
+    if desde_seq == actual:
+        return []
+    if desde_seq > actual or actual - desde_seq > settings.NOTIFICACIONES_REPETICION:
+        return None
+
+    secuencias = range(desde_seq + 1, actual + 1)
+    guardados = cache.get_many([_clave_posicion(grupo, seq) for seq in secuencias])
+    eventos = [guardados.get(_clave_posicion(grupo, seq)) for seq in secuencias]
+    if any(evento is None or evento['seq'] != seq for evento, seq in zip(eventos, secuencias)):
+        return None
+    return eventos
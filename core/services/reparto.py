@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Cola de reparto
+Entrega a cada repartidor el siguiente pedido LISTO_ENTREGA según una
+política de orden. SELECT ... FOR UPDATE SKIP LOCKED hace que dos
+repartidores que piden al mismo tiempo reciban pedidos distintos, sin
+esperar uno al otro ni reintentar sobre el mismo pedido.
+"""
+from django.conf import settings
+from django.db import transaction
+from core.models import Pedido
+from core.services.transiciones import cambiar_estado
+
+# Política -> orden en que se reparten los pedidos listos. Las claves son las
+# que acepta settings.REPARTO_POLITICAS; "el más cercano primero" no existe
+# porque haría falta la ubicación del cliente (hoy solo hay dirección en texto).
+POLITICAS_REPARTO = {
+    'fifo': ['fecha_creacion', 'id'],
+}
+
+
+def tomar_siguiente_pedido(repartidor, politica=None):
+    """
+    Asigna al repartidor el siguiente pedido listo y lo pasa a EN_CAMINO.
+    Retorna el pedido tomado, o None si no hay pedidos disponibles.
+    Lanza ValueError si `politica` no es una de POLITICAS_REPARTO.
+    """
+    politica = politica or settings.REPARTO_POLITICA
+    if politica not in POLITICAS_REPARTO:
+        raise ValueError(f'Política de reparto desconocida: {politica}')
+    orden = POLITICAS_REPARTO[politica]
+    with transaction.atomic():
+        pedido = (
+            Pedido.objects
+            .select_related('cliente')
+            # Solo se bloquea la fila del pedido, no la del cliente
+            .select_for_update(skip_locked=True, of=('self',))
+            .filter(estado='LISTO_ENTREGA')
+            .order_by(*orden)
+            .first()
+        )
+        # Con la fila bloqueada el UPDATE condicional siempre se aplica
+        if pedido is None or not cambiar_estado(pedido, 'EN_CAMINO', repartidor):
+            return None
+    return pedido
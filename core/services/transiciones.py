@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Transiciones de estado de pedidos
+Reglas de qué rol puede mover un pedido de qué estado a cuál, y aplicación
+de cada cambio con concurrencia optimista: un solo UPDATE condicionado al
+estado y la versión que se leyeron. Si otro usuario cambió el pedido
+entre la lectura y la escritura (dos repartidores tomando el mismo pedido),
+el UPDATE no afecta filas y el cambio se informa como no aplicado, sin
+bloqueos y sin pisar el cambio del otro.
+"""
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from core.models import Pedido
+from core.services.ventas import registrar_venta, revertir_venta
+
+# Estado actual -> estados a los que puede pasar cada rol.
+# Los roles que no aparecen (Admin, Encargados, Cajeros) corrigen pedidos
+# desde el tablero y pueden pasar de cualquier estado a cualquier otro.
+TRANSICIONES = {
+    'Cocina': {
+        'RECIBIDO': ['EN_PREPARACION'],
+        'EN_PREPARACION': ['LISTO_ENTREGA'],
+    },
+    'Repartidores': {
+        'LISTO_ENTREGA': ['EN_CAMINO'],
+        'EN_CAMINO': ['ENTREGADO', 'NO_ENTREGADO'],
+    },
+}
+
+# Estados desde los que un repartidor solo mueve pedidos asignados a él
+# (y el estado al que los toma, asignándoselos)
+ESTADOS_DEL_REPARTIDOR = ['EN_CAMINO']
+ESTADO_TOMADO = 'EN_CAMINO'
+
+ESTADOS_FINALES = ['ENTREGADO', 'NO_ENTREGADO']
+
+
+class TransicionRechazada(Exception):
+    """El rol no puede hacer la transición pedida; el mensaje es para el usuario"""
+
+
+def estados_permitidos(nombre_rol, estado_actual):
+    """Estados a los que el rol puede mover un pedido en `estado_actual`"""
+    if nombre_rol not in TRANSICIONES:
+        return [codigo for codigo, _ in Pedido.ESTADOS]
+    return TRANSICIONES[nombre_rol].get(estado_actual, [])
+
+
+def validar_transicion(pedido, nuevo_estado, usuario):
+    """Lanza TransicionRechazada si `usuario` no puede llevar `pedido` a `nuevo_estado`"""
+    if nuevo_estado not in dict(Pedido.ESTADOS):
+        raise TransicionRechazada('Estado inválido')
+
+    nombre_rol = usuario.rol.nombre_rol
+    permitidos = estados_permitidos(nombre_rol, pedido.estado)
+    if nuevo_estado not in permitidos:
+        if not permitidos:
+            raise TransicionRechazada(f'Este pedido ya no puede ser modificado por {nombre_rol}')
+        nombres = ', '.join(f'"{dict(Pedido.ESTADOS)[estado]}"' for estado in permitidos)
+        raise TransicionRechazada(f'Solo puedes cambiar el pedido a {nombres}')
+
+    if (nombre_rol == 'Repartidores' and pedido.estado in ESTADOS_DEL_REPARTIDOR
+            and pedido.repartidor_id != usuario.id):
+        raise TransicionRechazada('Este pedido no está asignado a ti')
+
+
+def cambiar_estado(pedido, nuevo_estado, usuario):
+    """
+    Lleva `pedido` (tal como se leyó) a `nuevo_estado` con un UPDATE
+    ... WHERE id = ? AND estado = ? AND version = ? que escribe solo las
+    columnas que cambian. Mantiene el resumen diario de ventas.
+    Retorna True si se aplicó (y actualiza `pedido` en memoria) o False si
+    el pedido cambió mientras tanto. Lanza TransicionRechazada si el rol no
+    puede hacer la transición.
+    """
+    validar_transicion(pedido, nuevo_estado, usuario)
+
+    cambios = {'estado': nuevo_estado, 'version': F('version') + 1}
+    if nuevo_estado in ESTADOS_FINALES:
+        cambios['fecha_entrega'] = timezone.now()
+    if usuario.rol.nombre_rol == 'Repartidores' and nuevo_estado == ESTADO_TOMADO:
+        # Al tomar el pedido queda asignado al repartidor
+        cambios['repartidor'] = usuario
+
+    with transaction.atomic():
+        aplicado = Pedido.objects.filter(
+            id=pedido.id, estado=pedido.estado, version=pedido.version
+        ).update(**cambios)
+        if not aplicado:
+            return False
+
+        # Resumen diario: quitar la venta anterior si ya estaba entregado
+        if pedido.estado == 'ENTREGADO':
+            revertir_venta(pedido)
+
+        cambios['version'] = pedido.version + 1
+        for campo, valor in cambios.items():
+            setattr(pedido, campo, valor)
+
+        if nuevo_estado == 'ENTREGADO':
+            registrar_venta(pedido)
+    return True
+
+
+def asignar_repartidor(pedido, repartidor):
+    """
+    Cambia el repartidor de `pedido` con el mismo UPDATE condicional.
+    Retorna True si se aplicó o False si el pedido cambió mientras tanto.
+    """
+    with transaction.atomic():
+        aplicado = Pedido.objects.filter(
+            id=pedido.id, estado=pedido.estado, version=pedido.version
+        ).update(repartidor=repartidor, version=F('version') + 1)
+        if not aplicado:
+            return False
+
+        # En pedidos entregados, mover la venta al nuevo repartidor en el resumen diario
+        if pedido.estado == 'ENTREGADO':
+            revertir_venta(pedido)
+        pedido.repartidor = repartidor
+        pedido.version += 1
+        if pedido.estado == 'ENTREGADO':
+            registrar_venta(pedido)
+    return True
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+Servicio: Resumen diario de ventas
+Mantiene VentaDiaria (y sus desgloses por producto y repartidor) de forma
+incremental cuando un pedido entra o sale del estado ENTREGADO, y permite
+reconstruirlos desde los pedidos.
+"""
+from decimal import Decimal
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, Max, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from core.models import (
+    Pedido, DetallePedido, VentaDiaria, VentaDiariaProducto, VentaDiariaRepartidor
+)
+
+
+def _incrementar(modelo, filtros, extra=None, **incrementos):
+    """Suma (o resta) valores a la fila del resumen con un UPDATE atómico"""
+    defaults = {campo: 0 for campo in incrementos}
+    defaults.update(extra or {})
+    fila, creada = modelo.objects.get_or_create(**filtros, defaults=defaults)
+    modelo.objects.filter(pk=fila.pk).update(
+        **{campo: F(campo) + valor for campo, valor in incrementos.items()}
+    )
+
+
+def _aplicar_venta(pedido, signo):
+    fecha = timezone.localdate(pedido.fecha_entrega)
+    total = pedido.total_venta * signo
+
+    with transaction.atomic():
+        _incrementar(
+            VentaDiaria, {'fecha': fecha},
+            cantidad_pedidos=signo, total_ventas=total
+        )
+        _incrementar(
+            VentaDiariaRepartidor, {'fecha': fecha, 'repartidor_id': pedido.repartidor_id},
+            cantidad_pedidos=signo, total_ventas=total
+        )
+        lineas = DetallePedido.objects.filter(pedido=pedido).values('producto_nombre').annotate(
+            unidades=Sum('cantidad'),
+            importe=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+            producto_ref=Max('producto_id'),
+        ).order_by()
+        for linea in lineas:
+            _incrementar(
+                VentaDiariaProducto, {'fecha': fecha, 'producto_nombre': linea['producto_nombre']},
+                extra={'producto_id': linea['producto_ref']},
+                cantidad=linea['unidades'] * signo, total_ventas=linea['importe'] * signo
+            )
+
+
+def registrar_venta(pedido):
+    """Suma un pedido recién ENTREGADO al resumen de su día de entrega"""
+    if pedido.fecha_entrega:
+        _aplicar_venta(pedido, 1)
+
+
+def revertir_venta(pedido):
+    """Resta un pedido que deja de estar ENTREGADO (o se elimina) del resumen"""
+    if pedido.fecha_entrega:
+        _aplicar_venta(pedido, -1)
+
+
+def transferir_ventas_repartidor(repartidor_id):
+    """
+    Pasa las filas del resumen de un repartidor que se va a eliminar a las
+    de "sin repartidor", como quedan sus pedidos (Pedido.repartidor es SET_NULL)
+    """
+    with transaction.atomic():
+        filas = VentaDiariaRepartidor.objects.select_for_update().filter(repartidor_id=repartidor_id)
+        for fila in filas:
+            _incrementar(
+                VentaDiariaRepartidor, {'fecha': fila.fecha, 'repartidor_id': None},
+                cantidad_pedidos=fila.cantidad_pedidos, total_ventas=fila.total_ventas
+            )
+        filas.delete()
+
+
+def totales_ventas(desde=None, hasta=None):
+    """
+    Total vendido y cantidad de pedidos entregados entre dos fechas (inclusive).
+    Recorre una fila por día en lugar de todos los pedidos.
+    """
+    resumen = VentaDiaria.objects.all()
+    if desde:
+        resumen = resumen.filter(fecha__gte=desde)
+    if hasta:
+        resumen = resumen.filter(fecha__lte=hasta)
+    totales = resumen.aggregate(total=Sum('total_ventas'), pedidos=Sum('cantidad_pedidos'))
+    return totales['total'] or Decimal('0.00'), totales['pedidos'] or 0
+
+
+def reconstruir_ventas(desde=None, hasta=None):
+    """
+    Recalcula el resumen a partir de los pedidos ENTREGADOS.
+    desde/hasta (date) limitan los días recalculados; sin ellos se rehace todo.
+    Retorna la cantidad de días reconstruidos.
+    """
+    entregados = Pedido.objects.filter(estado='ENTREGADO', fecha_entrega__isnull=False).annotate(
+        dia=TruncDate('fecha_entrega')
+    )
+    detalles = DetallePedido.objects.filter(
+        pedido__estado='ENTREGADO', pedido__fecha_entrega__isnull=False
+    ).annotate(dia=TruncDate('pedido__fecha_entrega'))
+
+    resumenes = [VentaDiaria.objects.all(), VentaDiariaProducto.objects.all(), VentaDiariaRepartidor.objects.all()]
+    if desde:
+        entregados = entregados.filter(dia__gte=desde)
+        detalles = detalles.filter(dia__gte=desde)
+        resumenes = [qs.filter(fecha__gte=desde) for qs in resumenes]
+    if hasta:
+        entregados = entregados.filter(dia__lte=hasta)
+        detalles = detalles.filter(dia__lte=hasta)
+        resumenes = [qs.filter(fecha__lte=hasta) for qs in resumenes]
+
+    with transaction.atomic():
+        for qs in resumenes:
+            qs.delete()
+
+        dias = VentaDiaria.objects.bulk_create([
+            VentaDiaria(fecha=fila['dia'], cantidad_pedidos=fila['pedidos'], total_ventas=fila['total'])
+            for fila in entregados.values('dia').annotate(pedidos=Count('id'), total=Sum('total_venta')).order_by('dia')
+        ])
+
+        VentaDiariaRepartidor.objects.bulk_create([
+            VentaDiariaRepartidor(
+                fecha=fila['dia'], repartidor_id=fila['repartidor_id'],
+                cantidad_pedidos=fila['pedidos'], total_ventas=fila['total']
+            )
+            for fila in entregados.values('dia', 'repartidor_id').annotate(
+                pedidos=Count('id'), total=Sum('total_venta')
+            ).order_by('dia')
+        ])
+
+        VentaDiariaProducto.objects.bulk_create([
+            VentaDiariaProducto(
+                fecha=fila['dia'], producto_id=fila['producto_ref'], producto_nombre=fila['producto_nombre'],
+                cantidad=fila['unidades'], total_ventas=fila['importe']
+            )
+            for fila in detalles.values('dia', 'producto_nombre').annotate(
+                unidades=Sum('cantidad'),
+                importe=Sum(F('cantidad') * F('precio_unitario'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                producto_ref=Max('producto_id'),
+            ).order_by('dia')
+        ])
+
+    return len(dias)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Señales del modelo
+Mantienen los caches derivados sincronizados con la base de datos.
+"""
+from django.db.models.signals import post_save, post_delete, pre_delete
+from django.dispatch import receiver
+from core.models import Categoria, Producto, Rol, Usuario
+from core.services.menu import invalidar_menu
+from core.services.personal import invalidar_personal
+from core.services.ventas import transferir_ventas_repartidor
+
+
+@receiver(post_save, sender=Producto)
+@receiver(post_delete, sender=Producto)
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+def invalidar_menu_publico(sender, **kwargs):
+    """Crear, editar, activar/desactivar o eliminar productos y categorías cambia el menú"""
+    invalidar_menu()
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_usuario_personal(sender, instance, **kwargs):
+    """Editar o eliminar un usuario (p. ej. en admin_editar_usuario) cambia sus permisos"""
+    invalidar_personal(instance.id)
+
+
+@receiver(pre_delete, sender=Usuario)
+def transferir_ventas_usuario(sender, instance, **kwargs):
+    """Las ventas del repartidor eliminado pasan a "sin repartidor" en el resumen diario"""
+    transferir_ventas_repartidor(instance.id)
+
+
+@receiver(post_save, sender=Rol)
+def invalidar_rol_personal(sender, instance, **kwargs):
+    """Renombrar un rol cambia los permisos de todos sus usuarios"""
+    invalidar_personal(*instance.usuarios.values_list('id', flat=True))
@@ -0,0 +1,16 @@
+// Reanudación de WebSockets (core/services/reanudacion.py)
+// Último seq recibido por grupo: al reconectar se piden solo los eventos perdidos
+const ultimosSeq = {};
+
+function urlReanudacion(url) {
+    const pares = Object.entries(ultimosSeq).map(([grupo, seq]) => `${grupo}:${seq}`);
+    return pares.length ? `${url}${url.includes('?') ? '&' : '?'}last_seq=${pares.join(',')}` : url;
+}
+
+// Guarda el seq de cada evento; devuelve false si la página debe recargarse
+function registrarSeq(data) {
+    // Los eventos que ya no se pueden reenviar obligan a recargar
+    if (data.type === 'resincronizar') { window.location.reload(); return false; }
+    if (data.seq) ultimosSeq[data.grupo] = data.seq;
+    return true;
+}
@@ -0,0 +1,60 @@
+// Tarjetas de pedido actualizadas en sitio desde el snapshot del evento (clave 'pedido'),
+// sin pedir el fragmento al servidor. Las plantillas marcan las partes que cambian:
+//   data-estados="A B"          visible solo si el pedido está en alguno de esos estados
+//   data-con-repartidor="si|no" visible solo si el pedido tiene (o no) repartidor
+//   data-campo="..."            valor del snapshot: estado, repartidor_id, repartidor_nombre, fecha_entrega
+//   data-paso="ESTADO"          paso del progreso, completado o activo según el estado
+const ORDEN_ESTADOS = ['RECIBIDO', 'EN_PREPARACION', 'LISTO_ENTREGA', 'EN_CAMINO', 'ENTREGADO'];
+
+function fechaLocal(iso) {
+    const fecha = new Date(iso);
+    const dia = fecha.toLocaleDateString('es-PE', { day: '2-digit', month: '2-digit', year: 'numeric' });
+    const hora = fecha.toLocaleTimeString('es-PE', { hour: '2-digit', minute: '2-digit', hour12: false });
+    return `${dia} ${hora}`;
+}
+
+// Aplica el snapshot a la tarjeta. Devuelve false si no se puede: la tarjeta no
+// está en la página o faltan versiones intermedias (la página pide el fragmento)
+function actualizarTarjeta(tarjeta, pedido) {
+    if (!tarjeta || !pedido || pedido.version !== parseInt(tarjeta.dataset.version) + 1) return false;
+
+    const valores = {
+        estado: pedido.estado,
+        repartidor_id: pedido.repartidor ? String(pedido.repartidor.id) : '',
+        repartidor_nombre: pedido.repartidor ? pedido.repartidor.nombre : '',
+        fecha_entrega: pedido.fecha_entrega || '',
+    };
+    tarjeta.querySelectorAll('[data-campo]').forEach(elemento => {
+        const valor = valores[elemento.dataset.campo];
+        if (elemento.tagName === 'SELECT') {
+            elemento.value = valor;
+        } else if (elemento.classList.contains('date-local')) {
+            elemento.dataset.utc = valor;
+            elemento.textContent = valor ? fechaLocal(valor) : '';
+        } else {
+            elemento.textContent = valor;
+        }
+    });
+
+    tarjeta.querySelectorAll('[data-estados]').forEach(elemento => {
+        elemento.classList.toggle('d-none', !elemento.dataset.estados.split(' ').includes(pedido.estado));
+    });
+    tarjeta.querySelectorAll('[data-con-repartidor]').forEach(elemento => {
+        elemento.classList.toggle('d-none', (elemento.dataset.conRepartidor === 'si') !== Boolean(pedido.repartidor));
+    });
+
+    // NO_ENTREGADO no completa ningún paso y marca el último como fallido
+    const actual = ORDEN_ESTADOS.indexOf(pedido.estado);
+    tarjeta.querySelectorAll('[data-paso]').forEach(paso => {
+        const indice = ORDEN_ESTADOS.indexOf(paso.dataset.paso);
+        const ultimo = indice === ORDEN_ESTADOS.length - 1;
+        const noEntregado = ultimo && pedido.estado === 'NO_ENTREGADO';
+        paso.classList.toggle('completed', indice < actual || (ultimo && pedido.estado === 'ENTREGADO'));
+        paso.classList.toggle('active', indice === actual || noEntregado);
+        paso.classList.toggle('no-entregado', noEntregado);
+    });
+
+    tarjeta.dataset.version = pedido.version;
+    tarjeta.dataset.pedidoEstado = pedido.estado;
+    return true;
+}
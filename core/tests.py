@@ -1,3 +1,1552 @@
-from django.test import TestCase
+# -*- coding: utf-8 -*-
+"""
+Tests del core
+"""
+import asyncio
+import base64
+import json
+import os
+import re
+import runpy
+import uuid
+from collections import Counter
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from core import urls as core_urls
+from core.instrumentacion import Medicion, activar
+from core.models import (
+    Rol, Usuario, Cliente, Categoria, Producto, Carrito, DetalleCarrito, Pedido, DetallePedido,
+    EventoNotificacion, VentaDiaria, VentaDiariaProducto, VentaDiariaRepartidor,
+)
+from core.services.carrito import agregar_producto, cambiar_cantidad, limpiar_carritos, quitar_linea
+from core.services.checkout import crear_pedido_desde_carrito
+from core.services.datos_prueba import generar_datos
+from core.routing import websocket_urlpatterns
+from core.services import exportacion, metricas
+from core.services.fechas import rango_del_dia, rango_desde_texto
+from core.services.menu import obtener_menu
+from core.services.notificaciones import despachador, encolar_notificaciones, grupo_ventas_rol
+from core.services.paginacion import codificar_cursor, paginar_por_cursor
+from core.services.personal import obtener_personal
+from core.services.reanudacion import numerar
+from core.services.reparto import POLITICAS_REPARTO, tomar_siguiente_pedido
+from core.services.transiciones import TransicionRechazada, asignar_repartidor, cambiar_estado
+from core.services.ventas import reconstruir_ventas, registrar_venta, revertir_venta
 
-# Create your tests here.
+
+def iniciar_sesion(http, usuario=None, **datos):
+    """
+    Inicia sesión en el cliente de pruebas `http` (Client o AsyncClient) sin pasar
+    por el login: la del personal `usuario` y/o los `datos` dados (p. ej. cliente_id).
+    Retorna el mismo cliente.
+    """
+    if usuario is not None:
+        datos = {'usuario_id': usuario.id, 'usuario_nombre': usuario.nombre,
+                 'usuario_rol': usuario.rol.nombre_rol, **datos}
+    sesion = http.session
+    sesion.update(datos)
+    sesion.save()
+    http.cookies[settings.SESSION_COOKIE_NAME] = sesion.session_key
+    return http
+
+
+class IndicesPedidoTest(TestCase):
+    """
+    Verifica con EXPLAIN que las consultas más usadas sobre pedidos
+    se resuelven con un índice y no recorriendo toda la tabla.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='Repartidores')
+        cls.repartidor = Usuario.objects.create(nombre='R', email='r@test.com', password='x', rol=rol)
+        cls.cliente = Cliente.objects.create(
+            nombre='C', telefono='1', direccion='D', email='c@test.com', password='x'
+        )
+        ahora = timezone.now()
+        estados = [codigo for codigo, nombre in Pedido.ESTADOS]
+        Pedido.objects.bulk_create([
+            Pedido(
+                codigo_unico=f'PED-{i:08d}',
+                cliente=cls.cliente,
+                repartidor=cls.repartidor if i % 2 else None,
+                estado=estados[i % len(estados)],
+                fecha_creacion=ahora - timedelta(hours=i),
+                fecha_entrega=ahora - timedelta(hours=i) if estados[i % len(estados)] == 'ENTREGADO' else None,
+                total_venta=10,
+            )
+            for i in range(200)
+        ])
+
+    def assertUsaIndice(self, queryset):
+        if connection.vendor == 'postgresql':
+            # Con pocas filas el planificador prefiere Seq Scan; se desactiva solo en esta transacción
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            plan = queryset.explain()
+            self.assertNotIn('Seq Scan on pedidos', plan, plan)
+            self.assertRegex(plan, r'Index (Only )?Scan|Bitmap Index Scan', plan)
+        elif connection.vendor == 'sqlite':
+            plan = queryset.explain()
+            self.assertIsNone(re.search(r'SCAN pedidos(?! USING)', plan), plan)
+            self.assertRegex(plan, r'(SEARCH|SCAN) pedidos USING (COVERING )?INDEX', plan)
+        else:
+            self.skipTest(f'EXPLAIN no verificado para {connection.vendor}')
+
+    def test_tablero_pedidos_activos(self):
+        self.assertUsaIndice(
+            Pedido.objects.filter(estado__in=Pedido.ESTADOS_ACTIVOS).order_by('-fecha_creacion', '-id')[:50]
+        )
+
+    def test_tablero_cocina(self):
+        self.assertUsaIndice(
+            Pedido.objects.filter(estado__in=['RECIBIDO', 'EN_PREPARACION']).order_by('-fecha_creacion', '-id')[:50]
+        )
+
+    def test_tablero_historial_completo(self):
+        self.assertUsaIndice(Pedido.objects.order_by('-fecha_creacion', '-id')[:50])
+
+    def test_pedidos_de_hoy(self):
+        desde, hasta = rango_del_dia(timezone.localdate())
+        self.assertUsaIndice(Pedido.objects.filter(fecha_creacion__gte=desde, fecha_creacion__lt=hasta))
+
+    def test_reporte_ventas_por_rango(self):
+        desde, hasta = rango_desde_texto('2026-01-01', '2026-01-31')
+        self.assertUsaIndice(
+            Pedido.objects.filter(
+                estado='ENTREGADO', fecha_entrega__gte=desde, fecha_entrega__lt=hasta
+            ).order_by('-fecha_entrega')
+        )
+
+    def test_mis_entregas(self):
+        self.assertUsaIndice(
+            Pedido.objects.filter(
+                Q(estado='LISTO_ENTREGA') | Q(estado='EN_CAMINO', repartidor=self.repartidor)
+            )
+        )
+
+    def test_mis_pedidos_cliente(self):
+        self.assertUsaIndice(Pedido.objects.filter(cliente=self.cliente).order_by('-fecha_creacion'))
+
+
+# Las plantillas usan {% static %}; en pruebas no existe el manifiesto de collectstatic
+ALMACENAMIENTO_SIN_MANIFIESTO = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+
+class RangoFechasTest(TestCase):
+    """Los filtros por día se convierten en rangos semiabiertos"""
+
+    def test_rango_incluye_todo_el_ultimo_dia(self):
+        desde, hasta = rango_desde_texto('2026-01-01', '2026-01-31')
+        self.assertEqual(desde.date(), date(2026, 1, 1))
+        self.assertEqual(hasta.date(), date(2026, 2, 1))
+        self.assertEqual(hasta.time(), desde.time())
+
+    def test_fechas_vacias_o_invalidas_no_filtran(self):
+        self.assertEqual(rango_desde_texto('', 'no-es-fecha'), (None, None))
+
+    def test_fechas_imposibles_no_filtran(self):
+        self.assertEqual(rango_desde_texto('2026-02-30', '2026-13-01'), (None, None))
+
+    @override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+    def test_reportes_con_fecha_imposible(self):
+        rol = Rol.objects.create(nombre_rol='Admin')
+        usuario = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=rol)
+        http = iniciar_sesion(Client(), usuario)
+        for nombre in ['admin_reportes_ventas', 'admin_exportar_ventas']:
+            respuesta = http.get(reverse(nombre), {'fecha_inicio': '2026-02-30', 'fecha_fin': '2026-02-31'})
+            self.assertEqual(respuesta.status_code, 200, nombre)
+
+
+class PaginacionCursorTest(TestCase):
+    """La paginación por cursor recorre todo sin repetir ni saltar, aunque las fechas empaten"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cliente = Cliente.objects.create(nombre='C', telefono='1', direccion='D', email='c@test.com', password='x')
+        ahora = timezone.now()
+        # Cinco pedidos por fecha: cada página corta en medio de un empate
+        Pedido.objects.bulk_create([
+            Pedido(codigo_unico=f'PED-{i:08d}', cliente=cliente, fecha_creacion=ahora - timedelta(hours=i // 5), total_venta=10)
+            for i in range(23)
+        ])
+
+    def _recorrer(self, por_pagina):
+        vistos, cursor = [], None
+        while True:
+            pagina, cursor = paginar_por_cursor(Pedido.objects.all(), cursor=cursor, por_pagina=por_pagina)
+            vistos += [(pedido.fecha_creacion, pedido.id) for pedido in pagina]
+            if cursor is None:
+                return vistos
+
+    def test_paginas_estables_con_fechas_iguales(self):
+        esperado = list(Pedido.objects.order_by('-fecha_creacion', '-id').values_list('fecha_creacion', 'id'))
+        for por_pagina in [1, 3, 5, 7, 23, 50]:
+            self.assertEqual(self._recorrer(por_pagina), esperado, por_pagina)
+
+    def test_cursor_invalido_empieza_desde_el_principio(self):
+        primera, _ = paginar_por_cursor(Pedido.objects.all(), por_pagina=5)
+        invalidos = [
+            'basura', '%%%', 'ñandú',
+            codificar_cursor(timezone.now().replace(microsecond=1), 1)[:-4],
+            base64.urlsafe_b64encode(b'no-es-fecha|1').decode(),
+            base64.urlsafe_b64encode(b'2026-01-01T00:00:00|uno').decode(),
+            base64.urlsafe_b64encode(b'\xff\xfe').decode(),
+        ]
+        for cursor in invalidos:
+            pagina, _ = paginar_por_cursor(Pedido.objects.all(), cursor=cursor, por_pagina=5)
+            self.assertEqual(pagina, primera, cursor)
+
+    @override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+    def test_tablero_con_cursor_invalido(self):
+        rol = Rol.objects.create(nombre_rol='Admin')
+        usuario = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=rol)
+        http = iniciar_sesion(Client(), usuario)
+        respuesta = http.get(reverse('admin_pedidos'), {'estado': 'TODOS', 'cursor': 'basura', 'por_pagina': 5})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['pedidos']), 5)
+
+
+async def leer_streaming(respuesta):
+    """Partes de una respuesta streaming asíncrona (como las envía el servidor ASGI)"""
+    return [parte async for parte in respuesta.streaming_content]
+
+
+def normalizar_sql(sql):
+    """Reemplaza literales por ? para agrupar la misma consulta con distintos parámetros"""
+    sql = re.sub(r"'(?:[^']|'')*'", '?', sql)
+    sql = re.sub(r'\b\d+(?:\.\d+)?\b', '?', sql)
+    return re.sub(r'\(\?(?:, \?)*\)', '(?)', sql)
+
+
+@override_settings(
+    # Sesión en cookie firmada: las consultas medidas son solo las de la vista
+    SESSION_ENGINE='django.contrib.sessions.backends.signed_cookies',
+    STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO,
+)
+class PresupuestoConsultasTest(TestCase):
+    """
+    Cada URL de core/urls.py tiene un presupuesto de consultas SQL que no
+    depende del tamaño de los datos: se mide con pocos datos, se multiplican
+    categorías, productos, pedidos, usuarios y carrito, y se vuelve a medir.
+    Un N+1 hace fallar la prueba mostrando la consulta repetida.
+    Las caches se vacían antes de cada petición (se mide el peor caso).
+    """
+    PRESUPUESTOS = {
+        # URLs públicas (clientes)
+        'index': 1,
+        'ubicacion': 0,
+        'registro': 0,
+        'login': 0,
+        'logout': 0,
+        'agregar_al_carrito': 5,
+        'ver_carrito': 4,
+        'actualizar_cantidad_carrito': 2,
+        'eliminar_del_carrito': 3,
+        'carrito_api_agregar': 4,
+        'carrito_api_actualizar': 3,
+        'carrito_api_eliminar': 3,
+        'finalizar_compra': 12,
+        'mis_pedidos': 5,
+        'pedido_cliente_fragmento': 4,
+        'perfil': 2,
+        # URLs de gestión interna (personal)
+        'admin_login': 0,
+        'admin_logout': 0,
+        'admin_dashboard': 6,
+        'admin_pedidos': 5,
+        'admin_pedido_fragmento': 5,
+        'admin_cambiar_estado_pedido': 7,
+        'admin_asignar_repartidor': 8,
+        'admin_eliminar_pedido': 4,
+        'admin_reportes_ventas': 6,
+        'admin_exportar_ventas': 2,
+        'admin_productos': 3,
+        'admin_crear_producto': 3,
+        'admin_editar_producto': 3,
+        'admin_eliminar_producto': 3,
+        'admin_toggle_producto': 3,
+        'admin_mis_entregas': 4,
+        'admin_tomar_pedido': 7,
+        'admin_metricas': 1,
+        'admin_usuarios': 3,
+        'admin_crear_usuario': 4,
+        'admin_editar_usuario': 5,
+        'admin_eliminar_usuario': 7,
+        'admin_categorias': 2,
+        'admin_crear_categoria': 3,
+        'admin_editar_categoria': 4,
+        'admin_eliminar_categoria': 5,
+        'admin_toggle_categoria': 3,
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.datos = generar_datos(clientes=3, productos=6, pedidos=12, repartidores=2, semilla=1)
+
+    def test_todas_las_urls_tienen_presupuesto(self):
+        nombres = {patron.name for patron in core_urls.urlpatterns}
+        self.assertEqual(nombres - set(self.PRESUPUESTOS), set(), 'URLs sin presupuesto de consultas')
+
+    def test_consultas_no_dependen_del_tamano_de_los_datos(self):
+        pocos = {nombre: self._medir(nombre) for nombre in self.PRESUPUESTOS}
+        self._ampliar_datos()
+        for nombre, presupuesto in self.PRESUPUESTOS.items():
+            with self.subTest(url=nombre):
+                muchos = self._medir(nombre)
+                self.assertConsultas(nombre, pocos[nombre], muchos, presupuesto)
+
+    def assertConsultas(self, nombre, pocos, muchos, presupuesto):
+        if len(muchos) <= presupuesto and len(muchos) == len(pocos):
+            return
+        repetidas = [
+            f'  {veces}x {sql}'
+            for sql, veces in Counter(normalizar_sql(sql) for sql in muchos).most_common()
+            if veces > 1
+        ]
+        self.fail(
+            f'{nombre}: {len(pocos)} consultas con pocos datos, {len(muchos)} con más datos '
+            f'(presupuesto {presupuesto}).\n'
+            + ('Consultas repetidas:\n' + '\n'.join(repetidas) if repetidas else 'Consultas:\n' + '\n'.join(muchos))
+        )
+
+    def _medir(self, nombre):
+        """SQL ejecutado por una petición a la URL (sin contar savepoints)"""
+        http, metodo, url, datos = getattr(self, f'_escenario_{nombre}')()
+        cache.clear()
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = getattr(http, metodo)(url, datos)
+            if respuesta.streaming:
+                async_to_sync(leer_streaming)(respuesta)
+        self.assertLess(respuesta.status_code, 400, nombre)
+        if not nombre.endswith('logout'):
+            # Una redirección al login significa que el escenario no inició sesión
+            self.assertNotIn('login', respuesta.get('Location', ''), nombre)
+        return [
+            consulta['sql'] for consulta in capturadas.captured_queries
+            if not re.match(r'(RELEASE |ROLLBACK TO )?SAVEPOINT', consulta['sql'])
+        ]
+
+    # --- Datos -------------------------------------------------------------
+
+    def _ampliar_datos(self):
+        """Multiplica cada colección que las vistas recorren"""
+        cliente = self.datos['clientes'][0]
+        repartidor = self.datos['usuarios']['Repartidores']
+        rol_repartidores = repartidor.rol
+
+        categorias = Categoria.objects.bulk_create([Categoria(nombre=f'Extra {i}') for i in range(8)])
+        productos = Producto.objects.bulk_create([
+            Producto(nombre=f'Extra {i}', descripcion='d', precio=10 + i, categoria=categorias[i % 8])
+            for i in range(24)
+        ])
+        Usuario.objects.bulk_create([
+            Usuario(nombre=f'Extra {i}', email=f'extra{i}@prueba.local', password='x', rol=rol_repartidores)
+            for i in range(6)
+        ])
+
+        ahora = timezone.now()
+        pedidos = Pedido.objects.bulk_create([
+            Pedido(
+                codigo_unico=f'PED-X{i:06d}',
+                cliente=cliente,
+                repartidor=repartidor,
+                estado=Pedido.ESTADOS[i % len(Pedido.ESTADOS)][0],
+                fecha_creacion=ahora - timedelta(days=i % 10, hours=1),
+                fecha_entrega=ahora - timedelta(days=i % 10),
+                total_venta=30,
+            )
+            for i in range(36)
+        ])
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido, producto=producto, producto_nombre=producto.nombre,
+                cantidad=1, precio_unitario=producto.precio,
+            )
+            for pedido in pedidos
+            for producto in productos[:3]
+        ])
+        reconstruir_ventas()
+
+        carrito, _ = Carrito.objects.get_or_create(cliente=cliente, activo=True)
+        DetalleCarrito.objects.bulk_create([
+            DetalleCarrito(carrito=carrito, producto=producto, cantidad=1) for producto in productos[:8]
+        ])
+
+    def _cliente(self, indice=0):
+        cliente = self.datos['clientes'][indice]
+        return iniciar_sesion(Client(), cliente_id=cliente.id, cliente_nombre=cliente.nombre)
+
+    def _personal(self, rol='Admin'):
+        return iniciar_sesion(Client(), self.datos['usuarios'][rol])
+
+    def _producto(self):
+        return Producto.objects.filter(activo=True, eliminado=False).first()
+
+    def _linea_carrito(self):
+        carrito, _ = Carrito.objects.get_or_create(cliente=self.datos['clientes'][0], activo=True)
+        producto = Producto.objects.create(nombre='Nuevo', descripcion='d', precio=12)
+        return DetalleCarrito.objects.create(carrito=carrito, producto=producto, cantidad=1)
+
+    def _pedido(self, estado='RECIBIDO'):
+        producto = self._producto()
+        pedido = Pedido.objects.create(cliente=self.datos['clientes'][0], total_venta=producto.precio, estado=estado)
+        DetallePedido.objects.create(
+            pedido=pedido, producto=producto, producto_nombre=producto.nombre,
+            cantidad=1, precio_unitario=producto.precio,
+        )
+        return pedido
+
+    def _usuario(self):
+        return Usuario.objects.create(
+            nombre='Nuevo', email=f'{uuid.uuid4().hex}@prueba.local', password='x',
+            rol=self.datos['usuarios']['Cajeros'].rol,
+        )
+
+    # --- Escenarios: (cliente HTTP, método, url, datos) ----------------------
+
+    def _escenario_index(self):
+        return Client(), 'get', reverse('index'), {}
+
+    def _escenario_ubicacion(self):
+        return Client(), 'get', reverse('ubicacion'), {}
+
+    def _escenario_registro(self):
+        return Client(), 'get', reverse('registro'), {}
+
+    def _escenario_login(self):
+        return Client(), 'get', reverse('login'), {}
+
+    def _escenario_logout(self):
+        return self._cliente(), 'get', reverse('logout'), {}
+
+    def _escenario_agregar_al_carrito(self):
+        Carrito.objects.get_or_create(cliente=self.datos['clientes'][0], activo=True)
+        return self._cliente(), 'post', reverse('agregar_al_carrito', args=[self._producto().id]), {}
+
+    def _escenario_ver_carrito(self):
+        return self._cliente(), 'get', reverse('ver_carrito'), {}
+
+    def _escenario_actualizar_cantidad_carrito(self):
+        linea = self._linea_carrito()
+        return self._cliente(), 'post', reverse('actualizar_cantidad_carrito', args=[linea.id]), {'cantidad': 3}
+
+    def _escenario_eliminar_del_carrito(self):
+        linea = self._linea_carrito()
+        return self._cliente(), 'post', reverse('eliminar_del_carrito', args=[linea.id]), {}
+
+    def _escenario_carrito_api_agregar(self):
+        return self._cliente(), 'post', reverse('carrito_api_agregar', args=[self._producto().id]), {}
+
+    def _escenario_carrito_api_actualizar(self):
+        linea = self._linea_carrito()
+        return self._cliente(), 'post', reverse('carrito_api_actualizar', args=[linea.id]), {'cantidad': 3}
+
+    def _escenario_carrito_api_eliminar(self):
+        linea = self._linea_carrito()
+        return self._cliente(), 'post', reverse('carrito_api_eliminar', args=[linea.id]), {}
+
+    def _escenario_finalizar_compra(self):
+        comprador = self.datos['clientes'][1]
+        carrito, _ = Carrito.objects.get_or_create(cliente=comprador, activo=True)
+        DetalleCarrito.objects.bulk_create([
+            DetalleCarrito(carrito=carrito, producto=producto, cantidad=2)
+            for producto in Producto.objects.filter(activo=True, eliminado=False)
+        ])
+        return self._cliente(1), 'post', reverse('finalizar_compra'), {'clave_idempotencia': uuid.uuid4().hex}
+
+    def _escenario_mis_pedidos(self):
+        return self._cliente(), 'get', reverse('mis_pedidos'), {}
+
+    def _escenario_pedido_cliente_fragmento(self):
+        return self._cliente(), 'get', reverse('pedido_cliente_fragmento', args=[self._pedido().id]), {}
+
+    def _escenario_perfil(self):
+        return self._cliente(), 'get', reverse('perfil'), {}
+
+    def _escenario_admin_login(self):
+        return Client(), 'get', reverse('admin_login'), {}
+
+    def _escenario_admin_logout(self):
+        return self._personal(), 'get', reverse('admin_logout'), {}
+
+    def _escenario_admin_dashboard(self):
+        return self._personal(), 'get', reverse('admin_dashboard'), {}
+
+    def _escenario_admin_pedidos(self):
+        return self._personal(), 'get', reverse('admin_pedidos'), {}
+
+    def _escenario_admin_pedido_fragmento(self):
+        return self._personal(), 'get', reverse('admin_pedido_fragmento', args=[self._pedido().id]), {}
+
+    def _escenario_admin_cambiar_estado_pedido(self):
+        pedido = self._pedido()
+        return self._personal(), 'post', reverse('admin_cambiar_estado_pedido', args=[pedido.id]), {
+            'estado': 'EN_PREPARACION'
+        }
+
+    def _escenario_admin_asignar_repartidor(self):
+        pedido = self._pedido('LISTO_ENTREGA')
+        return self._personal(), 'post', reverse('admin_asignar_repartidor', args=[pedido.id]), {
+            'repartidor_id': self.datos['usuarios']['Repartidores'].id
+        }
+
+    def _escenario_admin_eliminar_pedido(self):
+        return self._personal(), 'post', reverse('admin_eliminar_pedido', args=[self._pedido('ENTREGADO').id]), {}
+
+    def _escenario_admin_reportes_ventas(self):
+        return self._personal(), 'get', reverse('admin_reportes_ventas'), {}
+
+    def _escenario_admin_exportar_ventas(self):
+        return self._personal(), 'get', reverse('admin_exportar_ventas'), {'detalle': '1'}
+
+    def _escenario_admin_productos(self):
+        return self._personal(), 'get', reverse('admin_productos'), {}
+
+    def _escenario_admin_crear_producto(self):
+        return self._personal(), 'post', reverse('admin_crear_producto'), {
+            'nombre': 'Nuevo', 'descripcion': 'd', 'precio': '15.00'
+        }
+
+    def _escenario_admin_editar_producto(self):
+        return self._personal(), 'post', reverse('admin_editar_producto', args=[self._producto().id]), {
+            'nombre': 'Editado', 'descripcion': 'd', 'precio': '16.00'
+        }
+
+    def _escenario_admin_eliminar_producto(self):
+        producto = Producto.objects.create(nombre='Nuevo', descripcion='d', precio=12)
+        return self._personal(), 'post', reverse('admin_eliminar_producto', args=[producto.id]), {}
+
+    def _escenario_admin_toggle_producto(self):
+        return self._personal(), 'post', reverse('admin_toggle_producto', args=[self._producto().id]), {}
+
+    def _escenario_admin_mis_entregas(self):
+        return self._personal('Repartidores'), 'get', reverse('admin_mis_entregas'), {}
+
+    def _escenario_admin_tomar_pedido(self):
+        self._pedido('LISTO_ENTREGA')
+        return self._personal('Repartidores'), 'post', reverse('admin_tomar_pedido'), {}
+
+    def _escenario_admin_metricas(self):
+        return self._personal(), 'get', reverse('admin_metricas'), {}
+
+    def _escenario_admin_usuarios(self):
+        return self._personal(), 'get', reverse('admin_usuarios'), {}
+
+    def _escenario_admin_crear_usuario(self):
+        return self._personal(), 'post', reverse('admin_crear_usuario'), {
+            'nombre': 'Nuevo', 'email': f'{uuid.uuid4().hex}@prueba.local', 'password': 'x',
+            'rol_id': self.datos['usuarios']['Cajeros'].rol_id,
+        }
+
+    def _escenario_admin_editar_usuario(self):
+        usuario = self._usuario()
+        return self._personal(), 'post', reverse('admin_editar_usuario', args=[usuario.id]), {
+            'nombre': 'Editado', 'email': usuario.email, 'rol_id': usuario.rol_id,
+        }
+
+    def _escenario_admin_eliminar_usuario(self):
+        return self._personal(), 'post', reverse('admin_eliminar_usuario', args=[self._usuario().id]), {}
+
+    def _escenario_admin_categorias(self):
+        return self._personal(), 'get', reverse('admin_categorias'), {}
+
+    def _escenario_admin_crear_categoria(self):
+        return self._personal(), 'post', reverse('admin_crear_categoria'), {'nombre': uuid.uuid4().hex}
+
+    def _escenario_admin_editar_categoria(self):
+        categoria = Categoria.objects.create(nombre=uuid.uuid4().hex)
+        return self._personal(), 'post', reverse('admin_editar_categoria', args=[categoria.id]), {
+            'nombre': uuid.uuid4().hex
+        }
+
+    def _escenario_admin_eliminar_categoria(self):
+        categoria = Categoria.objects.create(nombre=uuid.uuid4().hex)
+        return self._personal(), 'post', reverse('admin_eliminar_categoria', args=[categoria.id]), {}
+
+    def _escenario_admin_toggle_categoria(self):
+        categoria = Categoria.objects.create(nombre=uuid.uuid4().hex)
+        return self._personal(), 'post', reverse('admin_toggle_categoria', args=[categoria.id]), {}
+
+
+@override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+class ServerTimingTest(TestCase):
+    """Las peticiones muestreadas llevan la cabecera Server-Timing con sus tiempos y consultas"""
+
+    METRICA = re.compile(r'(?P<nombre>\w+);dur=(?P<dur>\d+(?:\.\d+)?)(?:;desc="(?P<desc>[^"]*)")?')
+
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Categoria.objects.create(nombre='Platos')
+        Producto.objects.create(nombre='Lomo', descripcion='d', precio=20, categoria=categoria)
+
+    def setUp(self):
+        cache.clear()
+
+    def _metricas(self, cabecera):
+        partes = cabecera.split(', ')
+        coincidencias = [self.METRICA.fullmatch(parte) for parte in partes]
+        self.assertTrue(all(coincidencias), cabecera)
+        return {m['nombre']: (float(m['dur']), m['desc']) for m in coincidencias}
+
+    @override_settings(INSTRUMENTACION_MUESTREO=1)
+    def test_cabecera_con_consultas_plantillas_y_total(self):
+        with CaptureQueriesContext(connection) as consultas, self.assertLogs('core.instrumentacion', 'INFO') as logs:
+            respuesta = Client().get(reverse('index'))
+        cabecera = respuesta['Server-Timing']
+        self.assertRegex(cabecera, r'^bd;dur=[\d.]+;desc="\d+ consultas", .*total;dur=[\d.]+$')
+
+        metricas = self._metricas(cabecera)
+        self.assertEqual(metricas['bd'][1], f'{len(consultas)} consultas')
+        self.assertIn('plantillas', metricas)
+        total = metricas['total'][0]
+        self.assertTrue(all(dur <= total for dur, _ in metricas.values()), cabecera)
+
+        registro = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((registro['vista'], registro['estado']), ('index', 200))
+        self.assertEqual((registro['consultas'], registro['total_ms']), (len(consultas), total))
+
+    @override_settings(INSTRUMENTACION_MUESTREO=1)
+    def test_menu_en_cache_se_refleja_en_las_consultas(self):
+        http = Client()
+        with self.assertLogs('core.instrumentacion', 'INFO'):
+            frio = self._metricas(http.get(reverse('index'))['Server-Timing'])['bd'][1]
+            caliente = self._metricas(http.get(reverse('index'))['Server-Timing'])['bd'][1]
+        self.assertEqual((frio, caliente), ('1 consultas', '0 consultas'))
+
+    def test_encolar_notificaciones_se_mide_como_encolado(self):
+        with activar(Medicion()) as medicion:
+            encolar_notificaciones([('cocina', {'type': 'nuevo_pedido', 'pedido_id': 1})])
+        # Solo el INSERT en la bandeja de salida: el group_send no ocurre durante la petición
+        self.assertEqual(list(medicion.tiempos), ['encolado'])
+
+    @override_settings(INSTRUMENTACION_MUESTREO=0)
+    def test_sin_muestreo_no_hay_cabecera(self):
+        self.assertNotIn('Server-Timing', Client().get(reverse('index')))
+
+
+class MenuCacheTest(TestCase):
+    """El menú público sale del cache y se invalida al editar o eliminar productos y categorías"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='Admin')
+        cls.admin = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=rol)
+        cls.categoria = Categoria.objects.create(nombre='Platos')
+        cls.lomo = Producto.objects.create(nombre='Lomo', descripcion='d', precio=20, categoria=cls.categoria)
+        cls.ceviche = Producto.objects.create(nombre='Ceviche', descripcion='d', precio=15, categoria=cls.categoria)
+
+    def setUp(self):
+        cache.clear()
+        self.http = iniciar_sesion(Client(), self.admin)
+
+    def _productos_del_menu(self):
+        return [
+            (producto.nombre, producto.precio)
+            for seccion in obtener_menu() for producto in seccion['productos']
+        ]
+
+    def test_menu_cacheado_no_consulta_la_base(self):
+        self._productos_del_menu()
+        with self.assertNumQueries(0):
+            self.assertEqual(self._productos_del_menu(), [('Ceviche', 15), ('Lomo', 20)])
+
+    def test_editar_producto_invalida_el_menu(self):
+        self._productos_del_menu()
+        self.http.post(
+            reverse('admin_editar_producto', args=[self.lomo.id]),
+            {'nombre': 'Lomo saltado', 'descripcion': 'd', 'precio': '25.00', 'categoria': self.categoria.id},
+        )
+        self.assertEqual(self._productos_del_menu(), [('Ceviche', 15), ('Lomo saltado', 25)])
+
+    def test_eliminar_producto_invalida_el_menu(self):
+        self._productos_del_menu()
+        self.http.post(reverse('admin_eliminar_producto', args=[self.lomo.id]))
+        self.assertEqual(self._productos_del_menu(), [('Ceviche', 15)])
+
+        self.http.post(reverse('admin_toggle_producto', args=[self.ceviche.id]))
+        self.assertEqual(self._productos_del_menu(), [])
+
+    def test_borrar_producto_o_desactivar_categoria_invalida_el_menu(self):
+        self._productos_del_menu()
+        self.ceviche.delete()
+        self.assertEqual(self._productos_del_menu(), [('Lomo', 20)])
+
+        self.categoria.activo = False
+        self.categoria.save()
+        self.assertEqual(self._productos_del_menu(), [])
+
+
+class PersonalCacheTest(TestCase):
+    """El snapshot del personal en cache se invalida al editar roles o usuarios"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Rol.objects.create(nombre_rol='Admin')
+        cls.cocina = Rol.objects.create(nombre_rol='Cocina')
+        cls.usuario = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=cls.admin)
+
+    def setUp(self):
+        cache.clear()
+        self.http = iniciar_sesion(Client(), self.usuario)
+
+    def test_snapshot_no_consulta_la_base(self):
+        obtener_personal(self.usuario.id)
+        with self.assertNumQueries(0):
+            usuario = obtener_personal(self.usuario.id)
+        self.assertEqual((usuario.id, usuario.nombre, usuario.rol.nombre_rol), (self.usuario.id, 'A', 'Admin'))
+
+    @override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+    def test_editar_el_rol_invalida_a_sus_usuarios(self):
+        url = reverse('admin_categorias')
+        self.assertEqual(self.http.get(url).status_code, 200)
+
+        self.admin.nombre_rol = 'Ex admin'
+        self.admin.save()
+        self.assertEqual(obtener_personal(self.usuario.id).rol.nombre_rol, 'Ex admin')
+        self.assertRedirects(self.http.get(url), reverse('admin_dashboard'), fetch_redirect_response=False)
+
+    @override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+    def test_cambiar_el_rol_del_usuario_invalida_su_snapshot(self):
+        url = reverse('admin_categorias')
+        self.assertEqual(self.http.get(url).status_code, 200)
+
+        usuario = Usuario.objects.get(id=self.usuario.id)
+        usuario.rol = self.cocina
+        usuario.save()
+        self.assertEqual(obtener_personal(self.usuario.id).rol.nombre_rol, 'Cocina')
+        self.assertRedirects(self.http.get(url), reverse('admin_dashboard'), fetch_redirect_response=False)
+
+    def test_eliminar_el_usuario_cierra_su_sesion(self):
+        self.assertIsNotNone(obtener_personal(self.usuario.id))
+        Usuario.objects.filter(id=self.usuario.id).get().delete()
+        self.assertIsNone(obtener_personal(self.usuario.id))
+
+        respuesta = self.http.get(reverse('admin_categorias'))
+        self.assertRedirects(respuesta, reverse('admin_login'), fetch_redirect_response=False)
+        self.assertNotIn('usuario_id', self.http.session)
+        respuesta = self.http.get(reverse('admin_pedido_fragmento', args=[1]))
+        self.assertEqual(respuesta.status_code, 401)
+
+
+class ConsumersAutorizacionTest(TestCase):
+    """Los sockets se unen a los grupos que autoriza la sesión, no la URL"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.roles = {nombre: Rol.objects.create(nombre_rol=nombre) for nombre in ['Cajeros', 'Cocina', 'Repartidores']}
+        cls.personal = {
+            nombre: Usuario.objects.create(nombre=nombre, email=f'{nombre}@test.com', password='x', rol=rol)
+            for nombre, rol in cls.roles.items()
+        }
+        cls.cliente = Cliente.objects.create(
+            nombre='C', telefono='1', direccion='D', email='c@test.com', password='x'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    async def _conectar(self, ruta, sesion):
+        comunicador = WebsocketCommunicator(URLRouter(websocket_urlpatterns), ruta)
+        comunicador.scope['session'] = sesion
+        conectado, _ = await comunicador.connect()
+        return comunicador, conectado
+
+    async def assertRechazado(self, ruta, sesion):
+        comunicador, conectado = await self._conectar(ruta, sesion)
+        self.assertFalse(conectado, f'{ruta} aceptó la sesión {sesion}')
+
+    async def assertRecibe(self, ruta, sesion, grupo, evento):
+        comunicador, conectado = await self._conectar(ruta, sesion)
+        self.assertTrue(conectado, f'{ruta} rechazó la sesión {sesion}')
+        await get_channel_layer().group_send(grupo, evento)
+        self.assertEqual((await comunicador.receive_json_from())['type'], evento['type'])
+        await comunicador.disconnect()
+
+    async def test_cliente_solo_recibe_sus_pedidos(self):
+        sesion = {'cliente_id': self.cliente.id}
+        evento = {'type': 'pedido_actualizado', 'pedido_id': 1, 'estado': 'EN_CAMINO', 'codigo_unico': 'PED-1'}
+        await self.assertRecibe('/ws/pedidos/', sesion, f'pedidos_cliente_{self.cliente.id}', evento)
+        await self.assertRecibe(f'/ws/pedidos/{self.cliente.id}/', sesion, f'pedidos_cliente_{self.cliente.id}', evento)
+        await self.assertRechazado(f'/ws/pedidos/{self.cliente.id + 1}/', sesion)
+        await self.assertRechazado(f'/ws/pedidos/{self.cliente.id}/', {})
+
+    async def test_personal_segun_rol(self):
+        cocina = {'usuario_id': self.personal['Cocina'].id}
+        repartidor = {'usuario_id': self.personal['Repartidores'].id}
+        cajero = {'usuario_id': self.personal['Cajeros'].id}
+        evento = {'type': 'pedido_listo', 'pedido_id': 1, 'codigo_unico': 'PED-1', 'cliente_nombre': 'C', 'total': 10}
+
+        await self.assertRechazado('/ws/cocina/', {})
+        await self.assertRechazado('/ws/cocina/', {'cliente_id': self.cliente.id})
+        await self.assertRecibe('/ws/cocina/', cocina, 'cocina', {**evento, 'type': 'nuevo_pedido'})
+        await self.assertRechazado('/ws/repartidores/', cocina)
+        await self.assertRecibe('/ws/repartidores/', repartidor, 'repartidores', evento)
+        await self.assertRechazado('/ws/ventas/', cocina)
+        await self.assertRechazado(f'/ws/ventas/{self.personal["Cocina"].id}/', cajero)
+        await self.assertRecibe('/ws/ventas/', cajero, grupo_ventas_rol('Cajeros'), {
+            **evento, 'type': 'venta_realizada', 'repartidor': 'R'
+        })
+
+    async def test_socket_de_personal_con_temas(self):
+        cajero = {'usuario_id': self.personal['Cajeros'].id}
+        evento = {'type': 'nuevo_pedido', 'pedido_id': 1, 'codigo_unico': 'PED-1', 'cliente_nombre': 'C', 'total': 10}
+        venta = {**evento, 'type': 'venta_realizada', 'repartidor': 'R'}
+        capa = get_channel_layer()
+
+        comunicador, conectado = await self._conectar('/ws/staff/', cajero)
+        self.assertTrue(conectado)
+        await capa.group_send('cocina', evento)
+        await capa.group_send(grupo_ventas_rol('Cajeros'), venta)
+        self.assertEqual((await comunicador.receive_json_from())['type'], 'nuevo_pedido')
+        self.assertEqual((await comunicador.receive_json_from())['type'], 'venta_realizada')
+
+        await comunicador.send_json_to({'accion': 'suscribir', 'tema': 'repartidores'})
+        self.assertEqual((await comunicador.receive_json_from())['type'], 'error')
+        # Mensajes mal formados: se responde con error y el socket sigue abierto
+        for tema in [['cocina'], {'cocina': 1}]:
+            for accion in ['suscribir', 'desuscribir']:
+                await comunicador.send_json_to({'accion': accion, 'tema': tema})
+                respuesta = await comunicador.receive_json_from()
+                self.assertEqual(respuesta['type'], 'error')
+                self.assertIn('Tema no permitido', respuesta['mensaje'])
+        for texto in ['{no es json', '"cocina"', '[1, 2]']:
+            await comunicador.send_to(text_data=texto)
+            self.assertEqual(await comunicador.receive_json_from(), {'type': 'error', 'mensaje': 'Mensaje inválido'})
+        await comunicador.send_json_to({'accion': 'desuscribir', 'tema': 'cocina'})
+        self.assertEqual(await comunicador.receive_json_from(), {'type': 'suscripcion', 'temas': ['ventas']})
+        await capa.group_send('cocina', evento)
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.disconnect()
+
+        comunicador, conectado = await self._conectar('/ws/staff/?temas=ventas', cajero)
+        self.assertTrue(conectado)
+        await capa.group_send('cocina', evento)
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.send_json_to({'accion': 'suscribir', 'tema': 'cocina'})
+        self.assertEqual(await comunicador.receive_json_from(), {'type': 'suscripcion', 'temas': ['cocina', 'ventas']})
+        await comunicador.disconnect()
+        await self.assertRechazado('/ws/staff/', {'cliente_id': self.cliente.id})
+
+
+class MetricasTest(TestCase):
+    """Los medidores siguen a las conexiones y admin_metricas los expone en formato Prometheus"""
+
+    MUESTRA = re.compile(r'(?P<nombre>[a-z_]+)(?P<etiquetas>\{[^}]*\})? (?P<valor>-?\d+(?:\.\d+)?(?:e[+-]?\d+)?)')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = Usuario.objects.create(
+            nombre='A', email='a@test.com', password='x', rol=Rol.objects.create(nombre_rol='Admin')
+        )
+        cls.cajero = Usuario.objects.create(
+            nombre='J', email='j@test.com', password='x', rol=Rol.objects.create(nombre_rol='Cajeros')
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def _exportado(self, texto):
+        """{(nombre, etiquetas): valor} de un texto de Prometheus, verificando cada línea"""
+        muestras = {}
+        for linea in texto.splitlines():
+            if linea.startswith('#'):
+                self.assertRegex(linea, r'^# (HELP [a-z_]+ .+|TYPE [a-z_]+ (counter|gauge|histogram))$')
+                continue
+            muestra = self.MUESTRA.fullmatch(linea)
+            self.assertIsNotNone(muestra, linea)
+            muestras[muestra['nombre'], muestra['etiquetas'] or ''] = float(muestra['valor'])
+        return muestras
+
+    def test_familia_de_grupo(self):
+        self.assertEqual(metricas.familia_grupo('pedidos_cliente_12'), 'pedidos_cliente_*')
+        self.assertEqual(metricas.familia_grupo('ventas_rol_Admin'), 'ventas_rol_Admin')
+
+    async def test_medidor_de_conexiones_sube_y_baja(self):
+        conexiones = metricas.ws_conexiones.valores
+        ventas = grupo_ventas_rol('Cajeros')
+        antes = {grupo: conexiones.get(grupo, 0) for grupo in ['cocina', ventas]}
+        rechazadas = metricas.ws_conexiones_rechazadas.valores.get('StaffConsumer', 0)
+
+        comunicador = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/staff/')
+        comunicador.scope['session'] = {'usuario_id': self.cajero.id}
+        self.assertTrue((await comunicador.connect())[0])
+        self.assertEqual(conexiones['cocina'], antes['cocina'] + 1)
+        self.assertEqual(conexiones[ventas], antes[ventas] + 1)
+
+        await comunicador.send_json_to({'accion': 'desuscribir', 'tema': 'cocina'})
+        await comunicador.receive_json_from()
+        self.assertEqual(conexiones['cocina'], antes['cocina'])
+
+        await comunicador.disconnect()
+        self.assertEqual({grupo: conexiones.get(grupo, 0) for grupo in antes}, antes)
+
+        comunicador = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/staff/')
+        comunicador.scope['session'] = {}
+        self.assertFalse((await comunicador.connect())[0])
+        self.assertEqual(metricas.ws_conexiones_rechazadas.valores['StaffConsumer'], rechazadas + 1)
+        self.assertEqual({grupo: conexiones.get(grupo, 0) for grupo in antes}, antes)
+
+    def test_histograma_acumulado(self):
+        histograma = metricas.Histograma('prueba_segundos', 'Histograma de prueba', 'tipo', buckets=[0.01, 0.1])
+        self.addCleanup(metricas._registro.remove, histograma)
+        for segundos in [0.005, 0.05, 0.5]:
+            histograma.observar('a', segundos)
+
+        muestras = self._exportado(metricas.exportar_prometheus())
+        self.assertEqual(
+            [muestras['prueba_segundos_bucket', f'{{tipo="a",le="{le}"}}'] for le in ['0.01', '0.1', '+Inf']],
+            [1, 2, 3],
+        )
+        self.assertEqual(muestras['prueba_segundos_count', '{tipo="a"}'], 3)
+        self.assertAlmostEqual(muestras['prueba_segundos_sum', '{tipo="a"}'], 0.555)
+
+    def test_vista_exporta_los_valores_actuales(self):
+        metricas.ws_conexiones.inc('cocina')
+        self.addCleanup(metricas.ws_conexiones.dec, 'cocina')
+
+        respuesta = iniciar_sesion(Client(), self.admin).get(reverse('admin_metricas'))
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta['Content-Type'].startswith('text/plain; version=0.0.4'))
+        texto = respuesta.content.decode()
+        self.assertIn('# TYPE ws_conexiones gauge', texto)
+        self.assertIn('# TYPE notificaciones_enviadas_total counter', texto)
+        muestras = self._exportado(texto)
+        self.assertEqual(muestras['ws_conexiones', '{grupo="cocina"}'], metricas.ws_conexiones.valores['cocina'])
+
+    def test_acceso_solo_admin_o_token(self):
+        url = reverse('admin_metricas')
+        self.assertRedirects(iniciar_sesion(Client(), self.cajero).get(url), reverse('admin_dashboard'), fetch_redirect_response=False)
+        self.assertRedirects(Client().get(url), reverse('admin_login'), fetch_redirect_response=False)
+        with override_settings(METRICAS_TOKEN='secreto'):
+            self.assertEqual(Client().get(url, HTTP_AUTHORIZATION='Bearer secreto').status_code, 200)
+            self.assertEqual(Client().get(url, HTTP_AUTHORIZATION='Bearer otro').status_code, 302)
+
+
+class ReanudacionSocketsTest(TestCase):
+    """Un socket que se reconecta con last_seq recibe solo los eventos que se perdió"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='Cocina')
+        cls.sesion = {'usuario_id': Usuario.objects.create(nombre='K', email='k@test.com', password='x', rol=rol).id}
+
+    def setUp(self):
+        cache.clear()
+
+    def _eventos(self, cantidad):
+        return [
+            ('cocina', {'type': 'estado_actualizado', 'pedido_id': i, 'codigo_unico': f'PED-{i}',
+                        'estado': 'LISTO_ENTREGA', 'cliente_nombre': 'C'})
+            for i in range(cantidad)
+        ]
+
+    async def _conectar(self, ruta):
+        comunicador = WebsocketCommunicator(URLRouter(websocket_urlpatterns), ruta)
+        comunicador.scope['session'] = self.sesion
+        conectado, _ = await comunicador.connect()
+        self.assertTrue(conectado)
+        return comunicador
+
+    async def test_reenvia_los_eventos_perdidos_sin_repetir(self):
+        numerados = await sync_to_async(numerar)(self._eventos(4))
+        base = numerados[0]['seq'] - 1
+        self.assertEqual([evento['seq'] - base for evento in numerados], [1, 2, 3, 4])
+
+        comunicador = await self._conectar(f'/ws/cocina/?last_seq={base + 2}')
+        for seq in (3, 4):
+            mensaje = await comunicador.receive_json_from()
+            self.assertEqual((mensaje['grupo'], mensaje['seq'], mensaje['type']), ('cocina', base + seq, 'estado_actualizado'))
+
+        # Un evento ya reenviado que llega también en vivo no se repite
+        capa = get_channel_layer()
+        await capa.group_send('cocina', numerados[3])
+        self.assertTrue(await comunicador.receive_nothing())
+        siguiente, = await sync_to_async(numerar)(self._eventos(1))
+        await capa.group_send('cocina', siguiente)
+        self.assertEqual((await comunicador.receive_json_from())['seq'], base + 5)
+        await comunicador.disconnect()
+
+        comunicador = await self._conectar(f'/ws/staff/?last_seq=cocina:{base + 5}')
+        self.assertTrue(await comunicador.receive_nothing())
+        await comunicador.disconnect()
+
+    @override_settings(NOTIFICACIONES_REPETICION=3)
+    async def test_pide_resincronizar_si_el_buffer_ya_no_los_tiene(self):
+        base = (await sync_to_async(numerar)(self._eventos(5)))[0]['seq'] - 1
+        comunicador = await self._conectar(f'/ws/cocina/?last_seq={base + 1}')
+        self.assertEqual(await comunicador.receive_json_from(), {'type': 'resincronizar', 'grupo': 'cocina'})
+        await comunicador.disconnect()
+
+        comunicador = await self._conectar(f'/ws/cocina/?last_seq={base + 2}')
+        self.assertEqual([(await comunicador.receive_json_from())['seq'] - base for _ in range(3)], [3, 4, 5])
+        await comunicador.disconnect()
+
+    async def test_contador_perdido_no_repite_seq(self):
+        comunicador = await self._conectar('/ws/cocina/')
+        capa = get_channel_layer()
+        anteriores = await sync_to_async(numerar)(self._eventos(3))
+        for evento in anteriores:
+            await capa.group_send('cocina', evento)
+        for evento in anteriores:
+            self.assertEqual((await comunicador.receive_json_from())['seq'], evento['seq'])
+
+        # El cache pierde el contador (LocMem lo desalojó, Redis se vació)
+        await sync_to_async(cache.clear)()
+        nuevo, = await sync_to_async(numerar)(self._eventos(1))
+        self.assertGreater(nuevo['seq'], anteriores[-1]['seq'])
+        await capa.group_send('cocina', nuevo)
+        self.assertEqual((await comunicador.receive_json_from())['seq'], nuevo['seq'])
+
+        # Un cliente con un seq del contador anterior debe recargar
+        reconectado = await self._conectar(f'/ws/cocina/?last_seq={anteriores[-1]["seq"]}')
+        self.assertEqual(await reconectado.receive_json_from(), {'type': 'resincronizar', 'grupo': 'cocina'})
+        await reconectado.disconnect()
+        await comunicador.disconnect()
+
+    async def test_seq_que_retrocede_pide_resincronizar(self):
+        comunicador = await self._conectar('/ws/cocina/')
+        capa = get_channel_layer()
+        evento = self._eventos(1)[0][1]
+        for seq in (7, 8, 1):
+            await capa.group_send('cocina', {**evento, 'grupo': 'cocina', 'seq': seq})
+        self.assertEqual([(await comunicador.receive_json_from())['seq'] for _ in range(2)], [7, 8])
+        with self.assertLogs('core.consumers', 'WARNING'):
+            self.assertEqual(await comunicador.receive_json_from(), {'type': 'resincronizar', 'grupo': 'cocina'})
+        self.assertEqual((await comunicador.receive_json_from())['seq'], 1)
+        await comunicador.disconnect()
+
+
+class CombinacionNotificacionesTest(TestCase):
+    """Los cambios seguidos de un mismo pedido se envían como un solo evento con el último estado"""
+
+    def setUp(self):
+        cache.clear()
+
+    def _encolar(self):
+        estados = ['EN_PREPARACION', 'LISTO_ENTREGA', 'EN_CAMINO']
+        encolar_notificaciones(
+            [('cocina', {'type': 'estado_actualizado', 'pedido_id': 1, 'estado': estado}) for estado in estados]
+            + [('cocina', {'type': 'nuevo_pedido', 'pedido_id': 1}),
+               ('cocina', {'type': 'estado_actualizado', 'pedido_id': 2, 'estado': 'EN_PREPARACION'})]
+        )
+
+    async def _recibidos(self):
+        capa = get_channel_layer()
+        canal = await capa.new_channel()
+        await capa.group_add('cocina', canal)
+        procesados = await despachador.despachar_pendientes()
+        recibidos = []
+        while True:
+            try:
+                recibidos.append(await asyncio.wait_for(capa.receive(canal), 0.1))
+            except asyncio.TimeoutError:
+                await capa.group_discard('cocina', canal)
+                return procesados, recibidos
+
+    @override_settings(NOTIFICACIONES_VENTANA=0)
+    async def test_envia_solo_el_ultimo_estado_de_cada_pedido(self):
+        await sync_to_async(self._encolar)()
+        procesados, recibidos = await self._recibidos()
+        self.assertEqual(procesados, 5)
+        self.assertEqual(
+            [(evento['type'], evento['pedido_id'], evento.get('estado')) for evento in recibidos],
+            [('estado_actualizado', 1, 'EN_CAMINO'), ('nuevo_pedido', 1, None), ('estado_actualizado', 2, 'EN_PREPARACION')],
+        )
+        self.assertFalse(await EventoNotificacion.objects.aexists())
+
+    @override_settings(NOTIFICACIONES_VENTANA=60)
+    async def test_espera_la_ventana_antes_de_enviar(self):
+        await sync_to_async(self._encolar)()
+        self.assertEqual(await self._recibidos(), (0, []))
+        self.assertEqual(await EventoNotificacion.objects.acount(), 5)
+
+
+class ReintentosNotificacionesTest(TestCase):
+    """Un group_send que falla se reintenta con espera exponencial hasta NOTIFICACIONES_MAX_INTENTOS"""
+
+    def setUp(self):
+        cache.clear()
+
+    @override_settings(NOTIFICACIONES_VENTANA=0, NOTIFICACIONES_MAX_INTENTOS=3)
+    async def test_espera_exponencial_y_fallido_al_limite(self):
+        await sync_to_async(encolar_notificaciones)([('cocina', {'type': 'nuevo_pedido', 'pedido_id': 1})])
+        capa = mock.Mock(group_send=mock.AsyncMock(side_effect=ConnectionError('Redis caído')))
+
+        with mock.patch('core.services.notificaciones.get_channel_layer', return_value=capa), \
+                self.assertLogs('core.services.notificaciones', 'WARNING'):
+            for intentos in [1, 2]:
+                antes = timezone.now()
+                self.assertEqual(await despachador.despachar_lote(), 1)
+                evento = await EventoNotificacion.objects.aget()
+                self.assertEqual((evento.estado, evento.intentos), (EventoNotificacion.PENDIENTE, intentos))
+                self.assertEqual(evento.ultimo_error, 'Redis caído')
+                # 2, 4... segundos desde el intento
+                espera = (evento.disponible_desde - antes).total_seconds()
+                self.assertTrue(2 ** intentos <= espera < 2 ** intentos + 1, espera)
+
+                # Antes de que venza la espera no se reintenta
+                self.assertEqual(await despachador.despachar_lote(), 0)
+                await EventoNotificacion.objects.filter(id=evento.id).aupdate(disponible_desde=antes)
+
+            self.assertEqual(await despachador.despachar_lote(), 1)
+
+        evento = await EventoNotificacion.objects.aget()
+        self.assertEqual((evento.estado, evento.intentos), (EventoNotificacion.FALLIDO, 3))
+        self.assertEqual(capa.group_send.await_count, 3)
+        # Un evento fallido no vuelve a tomarse
+        await EventoNotificacion.objects.filter(id=evento.id).aupdate(disponible_desde=timezone.now() - timedelta(hours=1))
+        self.assertEqual(await despachador.despachar_lote(), 0)
+
+
+class TransicionesPedidoTest(TestCase):
+    """Cambios de estado por rol con UPDATE condicional: el segundo de dos cambios simultáneos no se aplica"""
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = {nombre: Rol.objects.create(nombre_rol=nombre) for nombre in ['Admin', 'Cocina', 'Repartidores']}
+        cls.admin = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=roles['Admin'])
+        cls.cocina = Usuario.objects.create(nombre='K', email='k@test.com', password='x', rol=roles['Cocina'])
+        cls.repartidores = [
+            Usuario.objects.create(nombre=f'R{i}', email=f'r{i}@test.com', password='x', rol=roles['Repartidores'])
+            for i in range(2)
+        ]
+        cls.cliente = Cliente.objects.create(
+            nombre='C', telefono='1', direccion='D', email='c@test.com', password='x'
+        )
+
+    def _pedido(self, estado):
+        return Pedido.objects.create(cliente=self.cliente, estado=estado, total_venta=25)
+
+    def test_reglas_por_rol(self):
+        pedido = self._pedido('RECIBIDO')
+        with self.assertRaisesMessage(TransicionRechazada, 'Solo puedes cambiar el pedido a "En preparación"'):
+            cambiar_estado(pedido, 'LISTO_ENTREGA', self.cocina)
+        with self.assertRaisesMessage(TransicionRechazada, 'Estado inválido'):
+            cambiar_estado(pedido, 'PERDIDO', self.admin)
+        self.assertTrue(cambiar_estado(pedido, 'EN_PREPARACION', self.cocina))
+
+        pedido = self._pedido('EN_CAMINO')
+        pedido.repartidor = self.repartidores[0]
+        pedido.save()
+        with self.assertRaisesMessage(TransicionRechazada, 'Este pedido no está asignado a ti'):
+            cambiar_estado(pedido, 'ENTREGADO', self.repartidores[1])
+        self.assertTrue(cambiar_estado(pedido, 'ENTREGADO', self.repartidores[0]))
+        self.assertEqual(VentaDiaria.objects.get().cantidad_pedidos, 1)
+
+    def test_dos_repartidores_toman_el_mismo_pedido(self):
+        pedido = self._pedido('LISTO_ENTREGA')
+        # Los dos leyeron el pedido antes de que cualquiera escribiera
+        primero, segundo = Pedido.objects.get(id=pedido.id), Pedido.objects.get(id=pedido.id)
+
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertTrue(cambiar_estado(primero, 'EN_CAMINO', self.repartidores[0]))
+        self.assertEqual(len([c for c in consultas if c['sql'].startswith('UPDATE')]), 1)
+        self.assertFalse(cambiar_estado(segundo, 'EN_CAMINO', self.repartidores[1]))
+
+        pedido.refresh_from_db()
+        self.assertEqual((pedido.estado, pedido.repartidor_id, pedido.version), ('EN_CAMINO', self.repartidores[0].id, 2))
+        self.assertEqual((primero.version, primero.repartidor), (2, self.repartidores[0]))
+
+    def test_cola_de_reparto_entrega_el_mas_antiguo_a_cada_repartidor(self):
+        ahora = timezone.now()
+        pedidos = [
+            Pedido.objects.create(cliente=self.cliente, estado='LISTO_ENTREGA', total_venta=25,
+                                  fecha_creacion=ahora - timedelta(minutes=minutos))
+            for minutos in (5, 20, 10)
+        ]
+        self._pedido('EN_PREPARACION')
+
+        tomados = [tomar_siguiente_pedido(repartidor) for repartidor in self.repartidores]
+        self.assertEqual([pedido.id for pedido in tomados], [pedidos[1].id, pedidos[2].id])
+        self.assertEqual(
+            list(Pedido.objects.filter(id__in=[p.id for p in tomados]).order_by('fecha_creacion').values_list('repartidor_id', flat=True)),
+            [repartidor.id for repartidor in self.repartidores],
+        )
+        self.assertEqual(tomar_siguiente_pedido(self.repartidores[0]).id, pedidos[0].id)
+        self.assertIsNone(tomar_siguiente_pedido(self.repartidores[1]))
+
+
+@override_settings(STORAGES=ALMACENAMIENTO_SIN_MANIFIESTO)
+class TarjetasPedidoTest(TestCase):
+    """
+    Las tarjetas traen todas las variantes marcadas con data-estados y
+    data-con-repartidor; tarjetas_pedido.js las alterna desde el snapshot del
+    evento. Renderizadas en el servidor deben mostrar lo mismo que ese cambio.
+    """
+
+    VARIANTE = re.compile(r'<[^>]*class="([^"]*)"[^>]*data-(estados|con-repartidor)="([^"]*)"')
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = {nombre: Rol.objects.create(nombre_rol=nombre) for nombre in ['Admin', 'Cocina', 'Repartidores']}
+        cls.personal = {
+            nombre: Usuario.objects.create(nombre=nombre, email=f'{nombre}@test.com', password='x', rol=rol)
+            for nombre, rol in roles.items()
+        }
+        cls.cliente = Cliente.objects.create(
+            nombre='C', telefono='1', direccion='D', email='c@test.com', password='x'
+        )
+
+    def assertVariantes(self, html, pedido):
+        variantes = self.VARIANTE.findall(html)
+        self.assertTrue(variantes)
+        for clases, marca, valor in variantes:
+            if marca == 'estados':
+                visible = pedido.estado in valor.split()
+            else:
+                visible = (valor == 'si') == (pedido.repartidor is not None)
+            self.assertEqual('d-none' not in clases.split(), visible, (pedido.estado, marca, valor))
+
+    def test_variantes_visibles_segun_estado_y_repartidor(self):
+        urls = [
+            (iniciar_sesion(Client(), cliente_id=self.cliente.id), 'pedido_cliente_fragmento'),
+            *[(iniciar_sesion(Client(), usuario_id=usuario.id), 'admin_pedido_fragmento') for usuario in self.personal.values()],
+        ]
+        for estado, nombre in Pedido.ESTADOS:
+            for repartidor in [None, self.personal['Repartidores']]:
+                pedido = Pedido.objects.create(
+                    cliente=self.cliente, estado=estado, repartidor=repartidor, total_venta=25,
+                    fecha_entrega=timezone.now() if estado in ['ENTREGADO', 'NO_ENTREGADO'] else None,
+                )
+                for http, url in urls:
+                    datos = http.get(reverse(url, args=[pedido.id])).json()
+                    self.assertEqual(datos['pedido']['version'], pedido.version)
+                    self.assertVariantes(datos['html'], pedido)
+
+
+class CarritoOperacionesTest(TestCase):
+    """Modificaciones del carrito: incrementos en la base de datos y propiedad verificada en la misma consulta"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = [
+            Cliente.objects.create(nombre=f'C{i}', telefono='1', direccion='D', email=f'c{i}@test.com', password='x')
+            for i in range(2)
+        ]
+        categoria = Categoria.objects.create(nombre='Platos')
+        cls.producto = Producto.objects.create(nombre='Lomo', descripcion='d', precio=20, categoria=categoria)
+
+    def test_agregar_incrementa_con_un_update(self):
+        cliente = self.clientes[0]
+        self.assertTrue(agregar_producto(cliente.id, self.producto))
+
+        # Ya está en el carrito: un solo UPDATE, sin leer la línea antes
+        with CaptureQueriesContext(connection) as consultas:
+            self.assertFalse(agregar_producto(cliente.id, self.producto))
+        self.assertEqual([c['sql'].split()[0] for c in consultas], ['UPDATE'])
+        self.assertFalse(agregar_producto(cliente.id, self.producto))
+        self.assertEqual(DetalleCarrito.objects.get().cantidad, 3)
+
+    def test_solo_el_dueno_modifica_sus_lineas(self):
+        agregar_producto(self.clientes[0].id, self.producto)
+        linea = DetalleCarrito.objects.get()
+        intruso = self.clientes[1].id
+
+        self.assertFalse(cambiar_cantidad(intruso, linea.id, 9))
+        self.assertIsNone(quitar_linea(intruso, linea.id))
+        linea.refresh_from_db()
+        self.assertEqual(linea.cantidad, 1)
+
+        self.assertTrue(cambiar_cantidad(self.clientes[0].id, linea.id, 4))
+        self.assertEqual(quitar_linea(self.clientes[0].id, linea.id), 'Lomo')
+        self.assertFalse(DetalleCarrito.objects.exists())
+
+    def test_api_devuelve_la_linea_y_el_resumen(self):
+        http = iniciar_sesion(Client(), cliente_id=self.clientes[0].id)
+
+        url = reverse('carrito_api_agregar', args=[self.producto.id])
+        http.post(url)
+        datos = http.post(url).json()
+        self.assertEqual((datos['linea']['cantidad'], datos['linea']['subtotal']), (2, '40.00'))
+        self.assertEqual(datos['carrito'], {'cantidad': 2, 'subtotal': '40.00'})
+
+        linea_id = datos['linea']['id']
+        datos = http.post(reverse('carrito_api_actualizar', args=[linea_id]), {'cantidad': 0}).json()
+        self.assertEqual((datos['linea'], datos['carrito']['cantidad']), (None, 0))
+        self.assertEqual(http.post(reverse('carrito_api_eliminar', args=[linea_id])).status_code, 404)
+        self.assertEqual(http.get(url).status_code, 405)
+        self.assertEqual(Client().post(url).status_code, 401)
+
+    def test_un_solo_carrito_activo_por_cliente(self):
+        Carrito.objects.create(cliente=self.clientes[0])
+        Carrito.objects.create(cliente=self.clientes[0], activo=False)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Carrito.objects.create(cliente=self.clientes[0])
+
+    def test_limpiar_carritos_inactivos_y_abandonados(self):
+        hace_dos_meses = timezone.now() - timedelta(days=60)
+        vigente = Carrito.objects.create(cliente=self.clientes[0], fecha_creacion=hace_dos_meses + timedelta(days=45))
+        abandonado = Carrito.objects.create(cliente=self.clientes[1], fecha_creacion=hace_dos_meses)
+        comprados = [Carrito.objects.create(cliente=self.clientes[0], activo=False) for _ in range(3)]
+        for carrito in [vigente, abandonado, *comprados]:
+            DetalleCarrito.objects.create(carrito=carrito, producto=self.producto, fecha_actualizacion=hace_dos_meses)
+
+        self.assertEqual(limpiar_carritos(dias_abandono=30, lote=2), (4, 4))
+        self.assertEqual(list(Carrito.objects.values_list('id', flat=True)), [vigente.id])
+        self.assertEqual(DetalleCarrito.objects.get().carrito_id, vigente.id)
+
+    def test_carrito_viejo_con_actividad_reciente_se_conserva(self):
+        hace_dos_meses = timezone.now() - timedelta(days=60)
+        cliente = self.clientes[0]
+        carrito = Carrito.objects.create(cliente=cliente, fecha_creacion=hace_dos_meses)
+        linea = DetalleCarrito.objects.create(carrito=carrito, producto=self.producto, fecha_actualizacion=hace_dos_meses)
+        otro = Producto.objects.create(nombre='Ceviche', descripcion='d', precio=15, categoria=self.producto.categoria)
+        DetalleCarrito.objects.create(carrito=carrito, producto=otro, fecha_actualizacion=hace_dos_meses)
+
+        # Cualquier modificación de una línea renueva el carrito completo
+        agregar_producto(cliente.id, self.producto)
+        self.assertEqual(limpiar_carritos(dias_abandono=30), (0, 0))
+
+        DetalleCarrito.objects.update(fecha_actualizacion=hace_dos_meses)
+        cambiar_cantidad(cliente.id, linea.id, 5)
+        self.assertEqual(limpiar_carritos(dias_abandono=30), (0, 0))
+
+        DetalleCarrito.objects.update(fecha_actualizacion=hace_dos_meses)
+        self.assertEqual(limpiar_carritos(dias_abandono=30), (1, 2))
+
+    def test_agregar_reintenta_si_la_limpieza_borra_el_carrito(self):
+        cliente = self.clientes[0]
+        carrito = Carrito.objects.create(cliente=cliente)
+        crear = DetalleCarrito.objects.create
+
+        def borrado_entre_medio(**campos):
+            # La limpieza borra el carrito entre el get_or_create y el INSERT:
+            # el INSERT falla por la clave foránea y el UPDATE no encuentra la línea
+            Carrito.objects.filter(id=carrito.id).delete()
+            raise IntegrityError('FOREIGN KEY constraint failed')
+
+        inserciones = iter([borrado_entre_medio, crear])
+        with mock.patch.object(DetalleCarrito.objects, 'create', side_effect=lambda **c: next(inserciones)(**c)):
+            self.assertTrue(agregar_producto(cliente.id, self.producto))
+
+        linea = DetalleCarrito.objects.get()
+        self.assertEqual(linea.cantidad, 1)
+        self.assertTrue(Carrito.objects.get(id=linea.carrito_id).activo)
+
+
+class ResumenVentasTest(TestCase):
+    """El resumen diario se mantiene al revertir, reasignar o eliminar entregas y coincide con reconstruirlo"""
+
+    @classmethod
+    def setUpTestData(cls):
+        roles = {nombre: Rol.objects.create(nombre_rol=nombre) for nombre in ['Admin', 'Repartidores']}
+        cls.admin = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=roles['Admin'])
+        cls.repartidores = [
+            Usuario.objects.create(nombre=f'R{i}', email=f'r{i}@test.com', password='x', rol=roles['Repartidores'])
+            for i in range(2)
+        ]
+        cls.cliente = Cliente.objects.create(
+            nombre='C', telefono='1', direccion='D', email='c@test.com', password='x'
+        )
+        cls.producto = Producto.objects.create(nombre='Lomo', descripcion='d', precio=20)
+
+    def _entregado(self, repartidor=None):
+        pedido = Pedido.objects.create(
+            cliente=self.cliente, estado='LISTO_ENTREGA', total_venta=40, repartidor=repartidor
+        )
+        DetallePedido.objects.create(
+            pedido=pedido, producto=self.producto, producto_nombre='Lomo', cantidad=2, precio_unitario=20
+        )
+        cambiar_estado(pedido, 'ENTREGADO', self.admin)
+        return pedido
+
+    def _resumen(self):
+        """Filas con ventas (las que quedan en cero tras revertir equivalen a no tener fila)"""
+        return (
+            list(VentaDiaria.objects.filter(cantidad_pedidos__gt=0).values_list(
+                'fecha', 'cantidad_pedidos', 'total_ventas')),
+            sorted(VentaDiariaRepartidor.objects.filter(cantidad_pedidos__gt=0).values_list(
+                'fecha', 'repartidor_id', 'cantidad_pedidos', 'total_ventas'), key=str),
+            list(VentaDiariaProducto.objects.filter(cantidad__gt=0).values_list(
+                'fecha', 'producto_nombre', 'cantidad', 'total_ventas')),
+        )
+
+    def assertResumenReconstruible(self):
+        incremental = self._resumen()
+        reconstruir_ventas()
+        self.assertEqual(incremental, self._resumen())
+
+    def test_revertir_y_reasignar(self):
+        pedido = self._entregado(self.repartidores[0])
+        self._entregado()
+        self.assertTrue(asignar_repartidor(pedido, self.repartidores[1]))
+        self.assertResumenReconstruible()
+
+        self.assertTrue(cambiar_estado(pedido, 'NO_ENTREGADO', self.admin))
+        self.assertEqual(VentaDiaria.objects.get().cantidad_pedidos, 1)
+        self.assertResumenReconstruible()
+
+    def test_eliminar_pedido_entregado(self):
+        pedido = self._entregado(self.repartidores[0])
+        http = iniciar_sesion(Client(), self.admin)
+        http.post(reverse('admin_eliminar_pedido', args=[pedido.id]))
+        self.assertFalse(Pedido.objects.exists())
+        self.assertEqual(VentaDiaria.objects.get().cantidad_pedidos, 0)
+        self.assertResumenReconstruible()
+
+    def test_eliminar_repartidor_conserva_sus_ventas(self):
+        self._entregado(self.repartidores[0])
+        self._entregado()
+        self.repartidores[0].delete()
+        fila = VentaDiariaRepartidor.objects.get()
+        self.assertEqual((fila.repartidor_id, fila.cantidad_pedidos, fila.total_ventas), (None, 2, 80))
+        self.assertResumenReconstruible()
+
+    def test_una_sola_fila_sin_repartidor(self):
+        pedido = self._entregado()
+        registrar_venta(pedido)
+        revertir_venta(pedido)
+        self.assertEqual(VentaDiariaRepartidor.objects.filter(repartidor=None).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            VentaDiariaRepartidor.objects.create(fecha=timezone.localdate(), repartidor=None)
+
+    def test_comando_rechaza_fechas_imposibles(self):
+        with self.assertRaisesMessage(CommandError, '--desde'):
+            call_command('reconstruir_ventas_diarias', desde='2024-02-30')
+
+
+class ExportacionVentasTest(TestCase):
+    """El CSV se genera con un generador asíncrono: bajo ASGI se envía bloque a bloque"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rol = Rol.objects.create(nombre_rol='Admin')
+        cls.admin = Usuario.objects.create(nombre='A', email='a@test.com', password='x', rol=rol)
+        cliente = Cliente.objects.create(nombre='C', telefono='1', direccion='D', email='c@test.com', password='x')
+        entrega = timezone.make_aware(timezone.datetime(2026, 1, 10, 12))
+        for i in range(5):
+            Pedido.objects.create(
+                cliente=cliente, estado='ENTREGADO', total_venta=10, fecha_entrega=entrega + timedelta(minutes=i)
+            )
+
+    async def test_csv_por_bloques(self):
+        await sync_to_async(iniciar_sesion)(self.async_client, self.admin)
+        with mock.patch.object(exportacion, 'TAMANO_BLOQUE', 2):
+            respuesta = await self.async_client.get(
+                reverse('admin_exportar_ventas'), {'fecha_inicio': '2026-01-01', 'fecha_fin': '2026-01-31'}
+            )
+            self.assertTrue(respuesta.is_async)
+            partes = await leer_streaming(respuesta)
+
+        # Encabezado y luego bloques de 2, 2 y 1 pedidos
+        self.assertEqual([parte.decode('utf-8').count('\r\n') for parte in partes], [1, 2, 2, 1])
+        self.assertIn('filename="ventas_2026-01-01_2026-01-31.csv"', respuesta['Content-Disposition'])
+
+    async def test_nombre_de_archivo_sin_fechas_invalidas(self):
+        await sync_to_async(iniciar_sesion)(self.async_client, self.admin)
+        respuesta = await self.async_client.get(
+            reverse('admin_exportar_ventas'), {'fecha_inicio': '2026-02-30', 'fecha_fin': '"x.sh'}
+        )
+        await leer_streaming(respuesta)
+        self.assertEqual(respuesta['Content-Disposition'], 'attachment; filename="ventas.csv"')
+
+
+class CheckoutTest(TestCase):
+    """El carrito se convierte en pedido una sola vez por clave de idempotencia"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.clientes = [
+            Cliente.objects.create(nombre=f'C{i}', telefono='1', direccion='D', email=f'c{i}@test.com', password='x')
+            for i in range(2)
+        ]
+        cls.productos = [
+            Producto.objects.create(nombre=nombre, descripcion='d', precio=precio)
+            for nombre, precio in [('Lomo', '20.50'), ('Chicha', '4.00')]
+        ]
+
+    def _llenar_carrito(self, cliente):
+        carrito = Carrito.objects.create(cliente=cliente)
+        DetalleCarrito.objects.create(carrito=carrito, producto=self.productos[0], cantidad=2)
+        DetalleCarrito.objects.create(carrito=carrito, producto=self.productos[1], cantidad=3)
+        return carrito
+
+    def test_lineas_y_total(self):
+        carrito = self._llenar_carrito(self.clientes[0])
+        pedido, creado = crear_pedido_desde_carrito(self.clientes[0], 'clave-1')
+        self.assertTrue(creado)
+        self.assertEqual(pedido.total_venta, Decimal('53.00'))
+        self.assertEqual(
+            sorted(pedido.detalles.values_list('producto_nombre', 'cantidad', 'precio_unitario')),
+            [('Chicha', 3, Decimal('4.00')), ('Lomo', 2, Decimal('20.50'))],
+        )
+        carrito.refresh_from_db()
+        self.assertFalse(carrito.activo)
+
+    def test_reintento_devuelve_el_mismo_pedido(self):
+        self._llenar_carrito(self.clientes[0])
+        pedido, _ = crear_pedido_desde_carrito(self.clientes[0], 'clave-1')
+        self.assertEqual(crear_pedido_desde_carrito(self.clientes[0], 'clave-1'), (pedido, False))
+        self.assertEqual(Pedido.objects.count(), 1)
+
+    def test_carrito_vacio_o_inexistente(self):
+        self.assertEqual(crear_pedido_desde_carrito(self.clientes[0]), (None, False))
+        Carrito.objects.create(cliente=self.clientes[0])
+        self.assertEqual(crear_pedido_desde_carrito(self.clientes[0], 'clave-1'), (None, False))
+        self.assertFalse(Pedido.objects.exists())
+
+    def test_la_clave_es_por_cliente(self):
+        for cliente in self.clientes:
+            self._llenar_carrito(cliente)
+        primero, _ = crear_pedido_desde_carrito(self.clientes[0], 'misma-clave')
+        segundo, creado = crear_pedido_desde_carrito(self.clientes[1], 'misma-clave')
+        self.assertTrue(creado)
+        self.assertNotEqual(primero.id, segundo.id)
+        self.assertEqual(segundo.cliente_id, self.clientes[1].id)
+
+
+class ConfiguracionTest(TestCase):
+    """Los valores inválidos de las variables de entorno fallan al arrancar, no en la primera petición"""
+
+    def _settings(self, **entorno):
+        """Ejecuta restaurante/settings.py con esas variables de entorno y devuelve sus valores"""
+        with mock.patch.dict(os.environ, entorno):
+            return runpy.run_path(str(settings.BASE_DIR / 'restaurante' / 'settings.py'))
+
+    def test_politica_de_reparto(self):
+        self.assertEqual(self._settings(REPARTO_POLITICA='fifo')['REPARTO_POLITICA'], 'fifo')
+        self.assertEqual(set(settings.REPARTO_POLITICAS), set(POLITICAS_REPARTO))
+        for politica in ['cercania', 'FIFO', '']:
+            with self.assertRaisesMessage(ImproperlyConfigured, 'REPARTO_POLITICA'):
+                self._settings(REPARTO_POLITICA=politica)
+
+        repartidor = Usuario.objects.create(
+            nombre='R', email='r@test.com', password='x', rol=Rol.objects.create(nombre_rol='Repartidores')
+        )
+        with self.assertRaisesMessage(ValueError, 'cercania'):
+            tomar_siguiente_pedido(repartidor, politica='cercania')
+
+    def test_modo_de_sesion(self):
+        for modo, motor in [('cached_db', 'cached_db'), ('db', 'db'), ('file', 'file')]:
+            valores = self._settings(SESSION_MODO=modo, REDIS_URL='')
+            self.assertEqual(valores['SESSION_ENGINE'], f'django.contrib.sessions.backends.{motor}')
+
+        valores = self._settings(SESSION_MODO='cache', REDIS_URL='redis://localhost:6379/0')
+        self.assertEqual(valores['SESSION_ENGINE'], 'django.contrib.sessions.backends.cache')
+        self.assertEqual(valores['CACHES']['default']['BACKEND'], 'django.core.cache.backends.redis.RedisCache')
+
+        # Solo cache en memoria local: cada proceso tendría sus propias sesiones
+        with self.assertRaisesMessage(ImproperlyConfigured, 'REDIS_URL'):
+            self._settings(SESSION_MODO='cache', REDIS_URL='')
+        for modo in ['redis', 'CACHE', '']:
+            with self.assertRaisesMessage(ImproperlyConfigured, 'SESSION_MODO'):
+                self._settings(SESSION_MODO=modo, REDIS_URL='')
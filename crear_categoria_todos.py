@@ -9,6 +9,7 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restaurante.settings')
 django.setup()
 
 from core.models import Categoria, Producto
+from core.services.menu import invalidar_menu
 
 
 def crear_categoria_todos():
@@ -34,6 +35,8 @@ def crear_categoria_todos():
     
     if count > 0:
         productos_sin_categoria.update(categoria=categoria_todos)
+        # update() no dispara señales: invalidar el menú público manualmente
+        invalidar_menu()
         print(f"✓ {count} producto(s) asignado(s) a la categoría 'Todos'")
     else:
         print("✓ Todos los productos ya tienen una categoría asignada")
@@ -20,8 +20,9 @@ from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 from channels.security.websocket import AllowedHostsOriginValidator
 import core.routing
+from core.middleware import DespachadorNotificacionesMiddleware
 
-application = ProtocolTypeRouter({
+application = DespachadorNotificacionesMiddleware(ProtocolTypeRouter({
     "http": django_asgi_app,
     "websocket": AllowedHostsOriginValidator(
         AuthMiddlewareStack(
@@ -30,4 +31,4 @@ application = ProtocolTypeRouter({
             )
         )
     ),
-})
+}))
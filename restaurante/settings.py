@@ -13,6 +13,7 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 from pathlib import Path
 import os
 from decouple import config
+from django.core.exceptions import ImproperlyConfigured
 import dj_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -55,6 +56,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Whitenoise para archivos estáticos
+    'core.middleware.InstrumentacionMiddleware',  # Server-Timing (solo si INSTRUMENTACION_MUESTREO > 0)
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -67,7 +69,8 @@ ROOT_URLCONF = 'restaurante.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates con medición del render para InstrumentacionMiddleware
+        'BACKEND': 'core.instrumentacion.DjangoTemplatesMedidos',
         'DIRS': [BASE_DIR / 'core' / 'views'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -75,12 +78,30 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.context_processors.carrito',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'restaurante.wsgi.application'
+
+# Instrumentación: fracción de peticiones medidas (0 = desactivado, 0.05 = 5%, 1 = todas)
+INSTRUMENTACION_MUESTREO = config('INSTRUMENTACION_MUESTREO', default=0.0, cast=float)
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core': {
+            'handlers': ['console'],
+            'level': config('LOG_LEVEL', default='INFO'),
+        },
+    },
+}
 ASGI_APPLICATION = 'restaurante.asgi.application'
 
 # Channels - Configuración mejorada para producción
@@ -109,6 +130,83 @@ else:
     }
 
 
+# Notificaciones WebSocket (bandeja de salida, ver core/services/notificaciones.py)
+# 'proceso': las publica el propio servidor ASGI; 'comando': las publica
+# `python manage.py despachar_notificaciones` (requiere Redis como channel layer)
+NOTIFICACIONES_DESPACHADOR = config('NOTIFICACIONES_DESPACHADOR', default='proceso')
+NOTIFICACIONES_LOTE = config('NOTIFICACIONES_LOTE', default=100, cast=int)
+NOTIFICACIONES_MAX_INTENTOS = config('NOTIFICACIONES_MAX_INTENTOS', default=5, cast=int)
+# Segundos entre revisiones de la bandeja cuando no llegan avisos
+NOTIFICACIONES_INTERVALO = config('NOTIFICACIONES_INTERVALO', default=1.0, cast=float)
+# Segundos que espera un evento antes de enviarse: si el mismo pedido cambia
+# otra vez en ese tiempo, solo se envía el último estado (0 lo desactiva)
+NOTIFICACIONES_VENTANA = config('NOTIFICACIONES_VENTANA', default=0.25, cast=float)
+# Eventos por grupo que se guardan para reenviar a un socket que se reconecta
+# (core/services/reanudacion.py), y segundos que se conservan
+NOTIFICACIONES_REPETICION = config('NOTIFICACIONES_REPETICION', default=200, cast=int)
+NOTIFICACIONES_REPETICION_TIMEOUT = config('NOTIFICACIONES_REPETICION_TIMEOUT', default=600, cast=int)
+
+# Métricas de WebSockets en /admin/metricas/ (formato Prometheus). Las ve el
+# rol Admin con su sesión; con un token, también un scraper con
+# `Authorization: Bearer <token>`
+METRICAS_TOKEN = config('METRICAS_TOKEN', default='')
+
+
+# Cache - Redis en producción (compartido entre procesos), memoria local en desarrollo
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# Sesiones (SESSION_MODO):
+#   cached_db - se leen desde cache y se guardan también en la BD (por defecto);
+#               sin REDIS_URL la cache es local a cada proceso, pero la BD sigue
+#               siendo la fuente de verdad
+#   cache     - solo cache; ninguna petición toca django_session. Requiere
+#               REDIS_URL: en memoria local se perderían al reiniciar y cada
+#               proceso tendría sus propias sesiones
+#   db        - solo base de datos (motor por defecto de Django)
+#   file      - archivos locales, para pruebas sin Redis ni tabla de sesiones
+SESSION_MODO = config('SESSION_MODO', default='cached_db')
+SESSION_ENGINES = {
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'db': 'django.contrib.sessions.backends.db',
+    'file': 'django.contrib.sessions.backends.file',
+}
+if SESSION_MODO not in SESSION_ENGINES:
+    raise ImproperlyConfigured(f"SESSION_MODO debe ser uno de: {', '.join(SESSION_ENGINES)}")
+if SESSION_MODO == 'cache' and not REDIS_URL:
+    raise ImproperlyConfigured("SESSION_MODO='cache' requiere REDIS_URL")
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODO]
+
+# Menú público: segundos que vive en cache (las señales lo invalidan antes si cambia)
+MENU_CACHE_TIMEOUT = config('MENU_CACHE_TIMEOUT', default=3600, cast=int)
+
+# Usuario del personal y su rol: segundos que vive en cache (las señales lo invalidan al editarlo)
+PERSONAL_CACHE_TIMEOUT = config('PERSONAL_CACHE_TIMEOUT', default=600, cast=int)
+
+# Orden en que la cola de reparto entrega los pedidos listos (core/services/reparto.py).
+# Solo 'fifo': "el más cercano primero" necesita la ubicación del cliente y
+# hoy solo se guarda su dirección en texto.
+REPARTO_POLITICAS = ['fifo']
+REPARTO_POLITICA = config('REPARTO_POLITICA', default='fifo')
+if REPARTO_POLITICA not in REPARTO_POLITICAS:
+    raise ImproperlyConfigured(f"REPARTO_POLITICA debe ser uno de: {', '.join(REPARTO_POLITICAS)}")
+
+# Días tras los que un carrito activo se considera abandonado (python manage.py limpiar_carritos)
+CARRITO_DIAS_ABANDONO = config('CARRITO_DIAS_ABANDONO', default=30, cast=int)
+
+
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
@@ -134,6 +232,10 @@ else:
     }
 
 
+# Tablero de pedidos: cantidad de pedidos por página (paginación por cursor)
+PEDIDOS_POR_PAGINA = config('PEDIDOS_POR_PAGINA', default=50, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
 